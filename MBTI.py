@@ -1,1358 +1,4869 @@
-import sys, os, cv2, time
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, pyqtSlot, QTimer, QRectF, QEvent
-from PyQt5.QtGui import QImage, QPixmap, QPainter, QColor, QFont, QKeySequence, QTransform
-from PyQt5.QtWidgets import (
-     QApplication, QMainWindow, QWidget, QFileDialog, QSizePolicy,
-     QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QListWidgetItem,
-     QPushButton, QLineEdit, QLabel, QCheckBox, QSpinBox, QDoubleSpinBox, QSlider,
-    QListWidget, QMessageBox, QGridLayout, QVBoxLayout, QHBoxLayout,
-    QGroupBox, QComboBox, QDialog, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
- )
-
-# ------------------------------ Video Playback Thread ------------------------------
-class VideoThread(QThread):
-    frameReady = pyqtSignal(QImage, int)
-    finished = pyqtSignal()
-
-    def __init__(self, video_path: str, parent=None):
-        super().__init__(parent)
-        self.video_path = video_path
-        self.cap = None
-        self.fps = 0.0
-        self.total_frames = 0
-        self.current_index = 0
-        self.playing = False
-        self.stopped = False
-        self.seek_frame = None
-        self.speed = 1.0
-        self._eof_emitted = False
-
-    def open_video(self):
-        self.cap = cv2.VideoCapture(self.video_path)
-        if not self.cap.isOpened():
-            raise RuntimeError(f"Failed to open video: {self.video_path}")
-        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
-        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
-        self.current_index = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) or 0
-
-    def run(self):
-        try:
-            self.open_video()
-        except Exception as e:
-            print("Video open error:", e)
-            return
-        while not self.stopped:
-            if self.seek_frame is not None:
-                target = max(0, min(self.seek_frame, self.total_frames - 1))
-                self.seek_frame = None
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
-                self.current_index = target
-                ret, frame = self.cap.read()
-                if ret:
-                    self.current_index = target + 1
-                    self.frameReady.emit(self._to_qimage(frame), target)
-            if self.playing:
-                ret, frame = self.cap.read()
-                if not ret:
-                    self.playing = False
-                    if not self._eof_emitted:
-                        self.finished.emit()
-                        self._eof_emitted = True
-                    # 현재 위치를 끝으로 클램프
-                    self.current_index = self.total_frames
-                    QThread.msleep(20)
-                    continue
-                idx = self.current_index
-                self.current_index += 1
-                self.frameReady.emit(self._to_qimage(frame), idx)
-                if self.fps > 0:
-                    QThread.msleep(max(0, int((1000 / self.fps) / self.speed)))
-            else:
-                QThread.msleep(20)
-        self.cap.release()
-
-    def _to_qimage(self, cv_frame):
-        rgb = cv2.cvtColor(cv_frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        return QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888).copy()
-
-    @pyqtSlot()
-    def stop(self):
-        self.stopped = True
-        self.playing = False
-
-    @pyqtSlot()
-    def play(self):
-        self.playing = True
-        if self.total_frames > 0 and self.current_index >= self.total_frames - 1:
-            self.seek(0)
-        self.playing = True
-
-    @pyqtSlot()
-    def pause(self):
-        self.playing = False
-
-    @pyqtSlot(int)
-    def seek(self, frame_index: int):
-        self.seek_frame = frame_index
-        self._eof_emitted = False
-
-    @pyqtSlot(float)
-    def set_speed(self, speed: float):
-        self.speed = max(0.1, float(speed))
-
-
-# ------------------------------ Video Viewer (zoom/pan) ------------------------------
-class VideoViewer(QGraphicsView):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setScene(QGraphicsScene(self))
-        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
-        self.setDragMode(QGraphicsView.NoDrag)
-        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        self._panning = False
-        self._last = None
-        self._base = 1.0
-        self._zoom = 1.0
-        self._content_w = 0
-        self._content_h = 0
-
-    def wheelEvent(self, e):
-        # 기준 배율(_base) 아래로는 내려가지 않음(= fit-to-view 이하로 축소 금지)
-        step_up, step_dn = 1.25, 0.8
-        factor = step_up if e.angleDelta().y() > 0 else step_dn
-        self._zoom = max(1.0, self._zoom * factor)
-        self._apply_transform()
-        e.accept()
-
-    def reset_to_100(self):
-        self._zoom = 1.0
-        self.update_fit_base()
-        self._apply_transform()
-
-    def set_content_size(self, w: int, h: int):
-        """콘텐츠(비디오 프레임) 픽셀 크기 설정 → 기준 배율 갱신."""
-        self._content_w, self._content_h = int(w), int(h)
-        self.update_fit_base()
-        self._apply_transform()
-
-    def update_fit_base(self):
-        """현재 뷰포트에 콘텐츠가 '꽉 차게' 보이도록 기준 배율 계산(비율 유지)."""
-        vw, vh = self.viewport().width(), self.viewport().height()
-        if self._content_w > 0 and self._content_h > 0 and vw > 0 and vh > 0:
-            sx = vw / self._content_w
-            sy = vh / self._content_h
-            self._base = min(sx, sy)  # 비율 유지
-        else:
-            self._base = 1.0
-
-    def _apply_transform(self):
-        t = QTransform()
-        scale = self._base * self._zoom
-        t.scale(scale, scale)
-        self.setTransform(t)
-
-    def resizeEvent(self, e):
-        super().resizeEvent(e)
-        # 창 크기 변할 때도 기준 배율 갱신(상대 배율은 유지)
-        self.update_fit_base()
-        self._apply_transform()
-
-    def mousePressEvent(self, e):
-        if e.button() == Qt.MiddleButton or (e.button() == Qt.LeftButton and (e.modifiers() & Qt.ControlModifier)):
-            self.setCursor(Qt.ClosedHandCursor)
-            self._panning, self._last = True, e.pos()
-            e.accept()
-        else:
-            super().mousePressEvent(e)
-
-    def mouseMoveEvent(self, e):
-        if self._panning and (e.buttons() & (Qt.MiddleButton | Qt.LeftButton)):
-            d = e.pos() - self._last
-            self._last = e.pos()
-            self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() - d.x())
-            self.verticalScrollBar().setValue(self.verticalScrollBar().value() - d.y())
-            e.accept()
-        else:
-            super().mouseMoveEvent(e)
-
-    def mouseReleaseEvent(self, e):
-        if self._panning and (e.button() in (Qt.MiddleButton, Qt.LeftButton)):
-            self._panning = False
-            self.setCursor(Qt.ArrowCursor)
-            e.accept()
-        else:
-            super().mouseReleaseEvent(e)
-
-
-# ------------------------------ Main Window ------------------------------
-class MainWindow(QMainWindow):
-    SLOTS = 4  # up to 4 keys
-
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("MBTI Manual Behavior Tracking Interface (2.0.0)")
-        self.setMinimumSize(1200, 800)
-        w = QWidget(self); self.setCentralWidget(w)
-        root = QVBoxLayout(w)
-        top = QWidget(self)
-        top_layout = QHBoxLayout(top)
-        root.addWidget(top, 1)  # 상단 영역이 가변적으로 늘어나도록
-
-        # Left: Video
-        self.view = VideoViewer()
-        top_layout.addWidget(self.view, 10)
-        self.scene = self.view.scene()
-        self.pix_item = QGraphicsPixmapItem()
-        self.scene.addItem(self.pix_item)
-
-        # Right: Control Panel
-        right = QWidget(); top_layout.addWidget(right, 3)
-        r = QVBoxLayout(right); r.setContentsMargins(6,6,6,6)
-
-        # Group: File
-        self.g_file = QGroupBox("Video File"); r.addWidget(self.g_file)
-        f = QVBoxLayout(self.g_file)
-        self.btn_open_folder = QPushButton("Open Folder")
-        self.list_videos = QListWidget()
-        self.btn_load_video = QPushButton("Load Video")
-        f.addWidget(self.btn_open_folder); f.addWidget(self.list_videos); f.addWidget(self.btn_load_video)
-
-        # Group: Behaviors (input line -> set)
-        self.g_beh = QGroupBox("Behaviors"); r.addWidget(self.g_beh)
-        b = QVBoxLayout(self.g_beh)
-        hl = QHBoxLayout()
-        self.edit_behaviors = QLineEdit(); self.edit_behaviors.setPlaceholderText("Enter behaviors, comma-separated")
-        self.btn_set_behaviors = QPushButton("Set")
-        hl.addWidget(self.edit_behaviors); hl.addWidget(self.btn_set_behaviors)
-        b.addLayout(hl)
-
-        # Group: Recording (reworked, but compact)
-        self.g_rec = QGroupBox("Recording"); r.addWidget(self.g_rec)
-        rec = QGridLayout(self.g_rec)
-        self.check_record = QCheckBox("Recording mode")
-        rec.addWidget(self.check_record, 0,0,1,2)
-        rec.addWidget(QLabel("Limit (min):"), 0,2)
-        self.spin_limit = QSpinBox(); self.spin_limit.setRange(1,999); self.spin_limit.setValue(0); self.spin_limit.setAccelerated(True)
-        rec.addWidget(self.spin_limit, 0,3)
-        # Total을 한 줄 라벨로 통합: "Total  (00:00)"
-        self.lbl_rec_total_title = QLabel("Total  (00:00)")
-        rec.addWidget(self.lbl_rec_total_title, 1,0,1,4)
-
-        # 4 slots rows: behavior combo + set key + key label + slot timer
-        self.slot_ui = []
-        for i in range(self.SLOTS):
-            row = 2 + i*2
-            title = QLabel(f"Slot {i+1}  (00:00)")
-            rec.addWidget(title, row, 0)
-            cmb = QComboBox(); cmb.addItem("(None)")
-            btn = QPushButton("Set physical key")
-            keylab = QLabel("-")
-            rec.addWidget(cmb,    row,   1)
-            rec.addWidget(btn,    row,   2)
-            rec.addWidget(keylab, row,   3)
-            self.slot_ui.append({'cmb': cmb, 'btn': btn, 'keylab': keylab, 'title': title})
-
-        self.check_overlay = QCheckBox("Show overlay"); self.check_overlay.setChecked(True)
-        rec.addWidget(self.check_overlay, 2+self.SLOTS*2, 0, 1, 4)
-
-        # Group: Bookmarks
-        self.g_bm = QGroupBox("Bookmarks"); r.addWidget(self.g_bm)
-        bm = QVBoxLayout(self.g_bm)
-        self.list_bookmarks = QListWidget()
-        bmhl = QHBoxLayout()
-        self.btn_add_bm = QPushButton("Add Bookmark")
-        self.btn_go_bm  = QPushButton("Go to Bookmark")
-        self.btn_del_bm = QPushButton("Delete Bookmark")
-        bmhl.addWidget(self.btn_add_bm); bmhl.addWidget(self.btn_go_bm); bmhl.addWidget(self.btn_del_bm)
-        bm.addWidget(self.list_bookmarks); bm.addLayout(bmhl)
-
-        # Group: Data
-        self.g_data = QGroupBox("Data"); r.addWidget(self.g_data)
-        dl = QHBoxLayout(self.g_data)
-        self.btn_import = QPushButton("Import Labels")
-        self.btn_export = QPushButton("Export Labels")
-        self.btn_preview = QPushButton("Preview Result")
-        dl.addWidget(self.btn_import); dl.addWidget(self.btn_export); dl.addWidget(self.btn_preview)
-
-        r.addStretch(1)
-        
-        # Group: Playback
-        self.g_play = QGroupBox("Playback")
-        p = QGridLayout(self.g_play)
-        self.btn_play = QPushButton("Play/Pause")
-        self.slider = QSlider(Qt.Horizontal); self.slider.setEnabled(False)
-        self.lbl_frame = QLabel("Frame: 0000 / 0000")
-        self.lbl_time  = QLabel("Time: 00:00 / 00:00")
-        # 1행: 슬라이더 전폭
-        p.addWidget(self.slider, 0, 0, 1, 7)
-        # 2행: 좌측 Speed, 가운데 Play(가로 확장), 우측 Frame/Time
-        p.addWidget(QLabel("Speed:"), 1, 0, 1, 1)
-        self.spin_speed = QDoubleSpinBox()
-        self.spin_speed.setDecimals(1)         # 0.1 단위
-        self.spin_speed.setRange(0.3, 5.0)     # 범위 0.3 ~ 5.0
-        self.spin_speed.setSingleStep(0.1)     # 스텝 0.1
-        self.spin_speed.setValue(1.0)          # 기본 1.0×
-        self.spin_speed.setSuffix("×")         # 표시: 배속 기호
-        self.spin_speed.setAccelerated(True)   # 화살표 꾹 누르면 가속
-        p.addWidget(self.spin_speed, 1, 1, 1, 1)
-        self.btn_play.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
-        p.addWidget(self.btn_play, 1, 2, 1, 3)
-        self.lbl_frame.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
-        self.lbl_time.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
-        p.addWidget(self.lbl_frame, 1, 5, 1, 1)
-        p.addWidget(self.lbl_time,  1, 6, 1, 1)
-        for col in (2,3,4):
-            p.setColumnStretch(col, 1)
-        for col in (0,1,5,6):
-            p.setColumnStretch(col, 0)
-        root.addWidget(self.g_play, 0)
-
-        # State
-        self.video_thread = None
-        self.video_loaded = False
-        self.video_folder = ""
-        self.current_video_path = None
-        self.current_frame_idx = 0
-        self.fps = 30.0
-        self.total_frames = 0
-        self.recording = False
-        self.record_start_frame = None
-        self.record_start_ms = None
-        self.record_total_ms = 0
-        self.record_limit_end_frame = None  # 제한 프레임
-        self._record_arming_pending = False
-        self._fit_initialized = False
-        self.data_modified = False
-
-        self.behaviors = []
-        self.frame_flags = []           # [n_behaviors][total_frames]
-        self.behavior_durations = []    # ms per behavior
-
-        # 4 input slots
-        self.slots = [{'key': None, 'behavior': None, 'ms': 0, 'pressed': False,
-                       'start_ms': 0, 'start_frame': 0} for _ in range(self.SLOTS)]
-        self.key_to_slot = {}  # (qt_key, scan) -> slot_idx
-        self.pending_key_capture = None
-
-        # Overlays (view 기준의 QLabel들)
-        self.overlay_labels = []
-        self._init_overlays()
-        # 뷰 리사이즈 감지 → 재배치
-        self.view.viewport().installEventFilter(self)
-
-        # Connect
-        self.btn_open_folder.clicked.connect(self.open_folder_dialog)
-        self.btn_load_video.clicked.connect(self.load_selected_video)
-        self.list_videos.itemDoubleClicked.connect(self.load_selected_video)
-        self.btn_play.clicked.connect(self.toggle_play_pause)
-        self.slider.sliderPressed.connect(self.on_slider_pressed)
-        self.slider.sliderReleased.connect(self.on_slider_released)
-        self.slider.sliderMoved.connect(self.on_slider_moved)
-
-        self.btn_set_behaviors.clicked.connect(self.define_behaviors)
-        self.check_record.stateChanged.connect(self.on_record_toggled)
-        self.btn_add_bm.clicked.connect(self.add_bookmark)
-        self.btn_go_bm.clicked.connect(self.jump_to_bookmark)
-        self.btn_del_bm.clicked.connect(self.delete_bookmark)
-        self.btn_import.clicked.connect(self.import_labels)
-        self.btn_export.clicked.connect(self.export_labels)
-        self.btn_preview.clicked.connect(self.preview_result)
-        self.spin_speed.valueChanged.connect(self.on_speed_changed)
-
-        for idx, s in enumerate(self.slot_ui):
-            s['btn'].clicked.connect(lambda _, i=idx: self.start_capture(i))
-            s['cmb'].currentIndexChanged.connect(lambda _, i=idx: self.on_slot_behavior_changed(i))
-
-        self.update_ui_state()
-        # Enter 로 behaviors 확정
-        self.edit_behaviors.returnPressed.connect(self.btn_set_behaviors.click)
-        # Focus policy: MainWindow 기본 StrongFocus, 자식 위젯 NoFocus(입력칸만 예외)
-        self.setFocusPolicy(Qt.StrongFocus)
-        self.apply_no_focus()
-
-    def apply_no_focus(self):
-        for w in self.findChildren(QWidget):
-            if w is self.edit_behaviors:
-                w.setFocusPolicy(Qt.ClickFocus)   # ← 예외
-            else:
-                w.setFocusPolicy(Qt.NoFocus)
-        self.setFocusPolicy(Qt.StrongFocus)
-        self.activateWindow()
-        self.raise_()
-        # 메인 초기 포커스는 MainWindow로 유지(입력은 클릭 시 활성화)
-        self.setFocus(Qt.ActiveWindowFocusReason)
-
-    # view 리사이즈 시 오버레이 재배치
-    def eventFilter(self, obj, ev):
-        if obj is self.view.viewport() and ev.type() == QEvent.Resize:
-            self._position_overlays()
-        return super().eventFilter(obj, ev)
-
-    def _guard_unsaved(self, reason_text: str) -> bool:
-        """
-        저장되지 않은 라벨이 있으면 경고를 띄워 진행 여부를 결정한다.
-        reason_text 예: 'load a new video', 'change behaviors'
-        return True → 계속 진행, False → 중단
-        """
-        if not getattr(self, 'data_modified', False):
-            return True
-        box = QMessageBox(self)
-        box.setWindowTitle("Unsaved labels")
-        box.setIcon(QMessageBox.Warning)
-        box.setText(f"There are unsaved label changes.\nDo you want to export them before you {reason_text}?")
-        btn_export  = box.addButton("Export now", QMessageBox.AcceptRole)
-        btn_discard = box.addButton("Continue without saving", QMessageBox.DestructiveRole)
-        btn_cancel  = box.addButton("Cancel", QMessageBox.RejectRole)
-        box.exec_()
-        clicked = box.clickedButton()
-        if clicked is btn_cancel:
-            return False
-        if clicked is btn_export:
-            # 사용자가 저장 대화상자에서 취소할 수도 있으므로, 저장 후 플래그 상태로 판단
-            self.export_labels()
-            return not self.data_modified
-        # 저장하지 않고 진행 → 변경 내용 폐기로 간주
-        self.data_modified = False
-        return True
-
-    # ---------- overlays ----------
-    def _init_overlays(self):
-        # view.viewport() 좌표계에 고정되는 라벨들
-        from PyQt5.QtWidgets import QLabel
-        self.overlay_labels = []
-        self._overlay_colors = [
-            "rgba(217,  99,  78, 180)", 
-            "rgba(242, 250,  97, 180)",
-            "rgba( 97, 250, 133, 180)",
-            "rgba(108, 152, 230, 180)",
-        ]
-        self._overlay_default_bg = "rgba(0,0,0,150)"
-        self._overlay_min_w = 100
-        self._overlay_base_w = 200
-        self._overlay_h = 44
-
-        for _ in range(self.SLOTS):
-            lab = QLabel("", self.view.viewport())
-            lab.setVisible(False)
-            lab.setAlignment(Qt.AlignCenter)
-            lab.setFixedSize(self._overlay_base_w, self._overlay_h)
-            lab.setStyleSheet("color: white; font-weight: 600; border-radius: 8px;")
-            self.overlay_labels.append(lab)
-        self._position_overlays()
-
-    def _position_overlays(self):
-        # 뷰포트 상단에서 좌→우로 균등 간격 배치
-        vp = self.view.viewport()
-        w, h = vp.width(), vp.height()
-        margin = 10
-        gap = 8
-        n = len(self.overlay_labels)
-        if n == 0:
-            return
-        # 창이 작아도 겹치지 않도록, 가용폭에 맞춰 라벨 폭을 동적으로 축소
-        total_gap = gap * (n - 1)
-        max_w_for_each = (w - 2*margin - total_gap) / max(1, n)
-        labw = max(self._overlay_min_w, min(self._overlay_base_w, int(max_w_for_each)))
-        y = margin
-        xs = [margin + i*(labw + gap) for i in range(n)]
-        for i, lab in enumerate(self.overlay_labels):
-            # 색상 적용(1~4는 팔레트, 그 이후는 기본색)
-            bg = self._overlay_colors[i] if i < len(self._overlay_colors) else self._overlay_default_bg
-            lab.setStyleSheet(f"background: {bg}; color: white; font-weight: 700; border-radius: 8px;")
-            lab.setFixedSize(labw, self._overlay_h)
-            lab.move(int(xs[i]), y)
-
-    def _set_overlay_text(self, slot_idx, text):
-        self.overlay_labels[slot_idx].setText(text)
-
-    # ---------- UI states ----------
-    def _rec_info_labels(self):
-        """Recording 패널 내에서 정보 표시용 라벨들을 모아 반환"""
-        labels = []
-        # 총 시간 라벨(예: 'Total  (00:00)')가 있으면 포함
-        if hasattr(self, "lbl_rec_total_title"):
-            labels.append(self.lbl_rec_total_title)
-        # 슬롯 타이틀 라벨: slot_ui[i]['title'] 로 관리(없으면 무시)
-        if hasattr(self, "slot_ui"):
-            for s in self.slot_ui:
-                if 'title' in s:
-                    labels.append(s['title'])
-        return tuple(labels)
-
-    def _refresh_slot_title_styles(self, recording: bool = False):
-        """슬롯 타이틀 라벨의 색을 상태에 맞춰 갱신.
-           - behavior 미지정: 회색
-           - 그 외: 검정색(Recording/Idle 모두)"""
-        if not hasattr(self, "slot_ui"):
-            return
-        for i, s in enumerate(self.slot_ui):
-            lab = s.get('title')
-            if lab is None:
-                continue
-            bi = self.slots[i]['behavior'] if i < len(self.slots) else None
-            if bi is None:
-                lab.setStyleSheet("color: gray;")
-            else:
-                # 녹화 중에도 정보는 선명한 검정
-                lab.setStyleSheet("color: black;")
-        # 총 시간 라벨은 항상 검정
-        if hasattr(self, "lbl_rec_total_title"):
-            self.lbl_rec_total_title.setStyleSheet("color: black;")
-
-    def _set_group_enabled(self, group: QGroupBox, enabled: bool, exceptions: tuple = ()):
-        """
-        그룹 단위 enable/disable. exceptions가 있을 때는 그룹을 켜둔 채,
-        자식 위젯만 개별 제어(예외 위젯은 활성, 나머지는 비활성).
-        """
-        if not exceptions:
-            group.setEnabled(enabled)
-            for w in group.findChildren(QWidget):
-                w.setEnabled(enabled)
-            return
-        # 부분 비활성: 부모는 켠 상태에서 자식만 선별 제어
-        group.setEnabled(True)
-        ex_set = set(exceptions)
-        for w in group.findChildren(QWidget):
-            w.setEnabled(w in ex_set)
-
-    def update_ui_state(self):
-        """
-        상태표:
-          1) 초기: Video File만 enabled, 나머지(Playback 포함) disabled
-          2) 영상 로드: Video File + Behaviors enabled, 나머지 disabled
-          3) 영상+Behavior 모두: 기본적으로 모두 enabled 가능.
-             - rec False + 재생중 : Recording disabled
-             - rec False + 정지중 : 모든 영역 enabled
-             - rec True  + 재생중 : Recording, Bookmarks, Data, Playback(단 Play버튼 제외) disabled
-             - rec True  + 정지중 : Recording(단 체크박스 제외), Data disabled
-        """
-        video_loaded = self.video_loaded
-        beh_ready = bool(self.behaviors)
-        recording = self.recording
-        playing = getattr(self, 'is_playing', False)
-
-        # 1) 초기 상태
-        if not video_loaded:
-            self._set_group_enabled(self.g_file, True)
-            self._set_group_enabled(self.g_beh, False)
-            self._set_group_enabled(self.g_rec, False)
-            self._set_group_enabled(self.g_bm,  False)
-            self._set_group_enabled(self.g_data, False)
-            self._set_group_enabled(self.g_play, False)
-            return
-
-        # 2) 영상만 로드
-        if video_loaded and not beh_ready:
-            self._set_group_enabled(self.g_file, True)
-            self._set_group_enabled(self.g_beh, True)
-            self._set_group_enabled(self.g_rec, False)
-            self._set_group_enabled(self.g_bm,  False)
-            self._set_group_enabled(self.g_data, False, exceptions=(self.btn_import,))
-            self._set_group_enabled(self.g_play, False)
-            return
-
-        # 3) 영상+Behavior 준비됨 → 기본은 모두 enabled
-        self._set_group_enabled(self.g_file, True)
-        self._set_group_enabled(self.g_beh, True)
-        self._set_group_enabled(self.g_rec, True)
-        self._set_group_enabled(self.g_bm,  True)
-        self._set_group_enabled(self.g_data, True)
-        self._set_group_enabled(self.g_play, True)
-
-        self._refresh_slot_title_styles(recording=False)
-
-        # 추가 규칙
-        if not recording and playing:
-            # 녹화 off + 재생중 → Recording만 잠금
-            self._set_group_enabled(self.g_rec, False)
-            return
-        if not recording and not playing:
-            # 녹화 off + 정지중 → 모두 활성 (이미 반영)
-            return
-        if recording and playing:
-            # 녹화 on + 재생중 → Recording, Bookmarks, Data, Playback(Play 제외) 비활성
-            self._set_group_enabled(self.g_rec,  False, exceptions=self._rec_info_labels())
-            self._set_group_enabled(self.g_bm,   False)
-            self._set_group_enabled(self.g_data, False)
-            self._set_group_enabled(self.g_play, False, exceptions=(self.btn_play,))
-            self._refresh_slot_title_styles(recording=True)
-            return
-        if recording and not playing:
-            # 녹화 on + 정지중 → Recording(체크박스 2개만 예외), Data 비활성
-            self._set_group_enabled(self.g_rec,  False, exceptions=(self.check_record, self.check_overlay) + self._rec_info_labels())
-            self._set_group_enabled(self.g_bm,   False) 
-            self._set_group_enabled(self.g_data, False)
-            self._refresh_slot_title_styles(recording=True)
-            return
-
-    # ---------- helpers ----------
-    def _fmt_ms(self, ms):
-        s = int(ms // 1000); return f"{s//60:02d}:{s%60:02d}"
-
-    def _set_total_label_text(self, ms):
-        self.lbl_rec_total_title.setText(f"Total  ({self._fmt_ms(ms)})")
-
-    def _update_slot_title(self, i, ms=None):
-        """슬롯 제목을 'Slot N (mm:ss)'로 갱신."""
-        sl = self.slots[i]
-        if ms is None:
-            ms = sl['ms']
-            if sl['pressed']:
-                ms += max(0, self._ms_now() - sl['start_ms'])
-        self.slot_ui[i]['title'].setText(f"Slot {i+1}  ({self._fmt_ms(ms)})")
-
-    def _frame_ms(self, frames):
-        return int((frames / self.fps) * 1000) if self.fps else frames * 33
-
-    def _slot_valid(self, i):
-        return (self.slots[i]['key'] is not None) and (self.slots[i]['behavior'] is not None)
-
-    def _rebuild_key_index(self):
-        self.key_to_slot.clear()
-        for i, sl in enumerate(self.slots):
-            if sl['key'] is not None:
-                self.key_to_slot[sl['key']] = i
-
-    def _key_to_slot(self, event):
-        """(qt_key, scan) 우선 매칭, 실패 시 qt_key만으로 fallback."""
-        ktuple = (event.key(), event.nativeScanCode())
-        idx = self.key_to_slot.get(ktuple)
-        if idx is not None:
-            return idx
-        qk = event.key()
-        for i, sl in enumerate(self.slots):
-            if sl['key'] and sl['key'][0] == qk:
-                return i
-        return None
-
-    # ---------- folder/video ----------
-    def open_folder_dialog(self):
-        folder = QFileDialog.getExistingDirectory(self, "Select Video Folder")
-        if not folder: return
-        files = [f for f in os.listdir(folder)
-                 if os.path.isfile(os.path.join(folder, f)) and f.lower().split('.')[-1] in ('mp4','avi','mov','mkv','wmv')]
-        files.sort()
-        self.list_videos.clear(); self.list_videos.addItems(files)
-        self.video_folder = folder
-
-    def load_selected_video(self):
-        if not self._guard_unsaved("load a new video"):
-            return
-        item = self.list_videos.currentItem()
-        if not item: return
-        self.current_video_path = item.text()
-        path = os.path.join(self.video_folder, item.text())
-        if self.video_thread:
-            self.video_thread.stop(); self.video_thread.wait(); self.video_thread = None
-        self.video_thread = VideoThread(path)
-        self.video_thread.frameReady.connect(self.on_frame_ready)
-        self.video_thread.finished.connect(self.on_video_finished)
-        self.video_thread.start()
-
-        cap = cv2.VideoCapture(path)
-        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
-        cap.release()
-
-        self.slider.setRange(0, max(0, self.total_frames - 1))
-        self.slider.setValue(0)
-        self.current_frame_idx = 0
-        self._fit_initialized = False
-        self.update_time_labels(0)
-
-        self.video_loaded = True
-
-        # reset behaviors/flags when loading new video
-        self.behaviors = []
-        self.frame_flags = []
-        self.behavior_durations = []
-        self.frame_index = list(range(self.total_frames))
-        self.edit_behaviors.setEnabled(True)
-        # reset slots
-        for i, sl in enumerate(self.slots):
-            sl.update({'key': None, 'behavior': None, 'ms': 0, 'pressed': False, 'start_ms': 0, 'start_frame': 0})
-            self.slot_ui[i]['keylab'].setText("-")
-            self._update_slot_title(i, 0)
-            self.slot_ui[i]['cmb'].clear(); self.slot_ui[i]['cmb'].addItem("(None)")
-            if 'title' in self.slot_ui[i]:
-                self.slot_ui[i]['title'].setStyleSheet("color: gray;")
-        # 총 타이머 00:00
-        self.record_total_ms = 0
-        self._set_total_label_text(0)
-        self._rebuild_key_index()
-        # overlay reposition on first frame
-        self._position_overlays()
-        # request first frame
-        if self.video_thread: self.video_thread.seek(0)
-        self.apply_no_focus()
-        self.data_modified = False
-        self.update_ui_state()
-        self._refresh_slot_title_styles(recording=False)
-
-    # ---------- playback ----------
-    def toggle_play_pause(self):
-        if not self.video_loaded or not self.video_thread: return
-        if getattr(self, 'is_playing', False):
-            self.video_thread.pause(); self.is_playing = False; self.btn_play.setText("Play")
-        else:
-            if self.current_frame_idx >= max(0, self.total_frames - 1):
-                self.video_thread.seek(0)
-            self.video_thread.play(); self.is_playing = True; self.btn_play.setText("Pause")
-        self.update_ui_state()
-
-    def on_slider_pressed(self):
-        if self.video_thread and getattr(self, 'is_playing', False):
-            self.video_thread.pause()
-
-    def on_slider_moved(self, value):
-        if not self.video_loaded or not self.video_thread: return
-        if self.recording and self.record_start_frame is not None and value < self.record_start_frame:
-            value = self.record_start_frame
-        if self.recording and any(sl['pressed'] for sl in self.slots):
-            return
-        self.video_thread.seek(int(value))
-
-    def on_slider_released(self):
-        if self.video_thread and getattr(self, 'is_playing', False):
-            self.video_thread.play()
-
-    def on_frame_ready(self, image: QImage, frame_index: int):
-        self.current_frame_idx = frame_index
-        self.pix_item.setPixmap(QPixmap.fromImage(image))
-        self.scene.setSceneRect(self.pix_item.boundingRect())
-        # 기준(시작 프레임/시각/제한프레임)을 확정
-        if self.recording and self._record_arming_pending:
-            self.record_start_frame = self.current_frame_idx
-            self.record_start_ms = self._ms_now()
-            if self.spin_limit.value() > 0 and self.fps:
-                limit_frames = int(self.spin_limit.value() * 60 * self.fps)
-                self.record_limit_end_frame = min(self.total_frames - 1,
-                                                  self.record_start_frame + limit_frames)
-            else:
-                self.record_limit_end_frame = None
-            self._set_total_label_text(0)
-            self._record_arming_pending = False
-        if frame_index == 0 and not self._fit_initialized:
-            # 새 영상 첫 프레임에서만 뷰 기준 100% 적용
-            self.view.set_content_size(image.width(), image.height())
-            self.view.reset_to_100()
-            self._position_overlays()
-            self._fit_initialized = True
-        self.slider.blockSignals(True); self.slider.setValue(frame_index); self.slider.blockSignals(False)
-        self.update_time_labels(frame_index)
-
-        # recording timers live update
-        if self.recording and self.record_start_ms is not None:
-            running = max(0, self._ms_now() - self.record_start_ms)
-            self._set_total_label_text(running)
-            # per-slot display (include ongoing press)
-            for i, sl in enumerate(self.slots):
-                disp = sl['ms']
-                if sl['pressed']:
-                    disp += max(0, self._ms_now() - sl['start_ms'])
-                self._update_slot_title(i, disp)
-
-        # 현재 프레임의 behavior를 0으로 초기화
-        # 눌려있는(slot.pressed) 슬롯의 behavior만 1로 설정
-        if (self.recording and getattr(self, 'is_playing', False)
-                and self.behaviors and self.frame_flags
-                and 0 <= frame_index < self.total_frames):
-            # 이번 세션에서 측정할 행동 컬럼 집합(슬롯에 지정된 것들)
-            override_cols = {sl['behavior'] for sl in self.slots if sl['behavior'] is not None}
-            # 해당 컬럼들만 0으로 초기화
-            for bi in override_cols:
-                self.frame_flags[bi][frame_index] = 0
-            # 눌린 슬롯의 행동만 1
-            for sl in self.slots:
-                bi = sl['behavior']
-                if bi is not None and sl['pressed']:
-                    self.frame_flags[bi][frame_index] = 1
-            self.data_modified = True
-        
-        # 제한시간 도달 시 자동 정지
-        if (self.recording and
-            self.record_limit_end_frame is not None and
-            frame_index >= self.record_limit_end_frame):
-            if self.video_thread:
-                self.video_thread.pause()
-                self.is_playing = False
-            # 체크박스 해제 → stop_recording() 호출
-            self.check_record.blockSignals(True)
-            self.check_record.setChecked(False)
-            self.check_record.blockSignals(False)
-            self.stop_recording()
-
-    def on_video_finished(self):
-        self.is_playing = False
-        self.btn_play.setText("Play")
-        # 레코딩 중이면 안전하게 종료 + 체크박스 해제
-        if self.recording:
-            self.check_record.blockSignals(True)
-            self.check_record.setChecked(False)
-            self.check_record.blockSignals(False)
-            self.stop_recording()
-        self.update_ui_state()
-
-    def update_time_labels(self, frame_index: int):
-        self.lbl_frame.setText(f"Frame: {frame_index:04d} / {self.total_frames:04d}")
-        if self.fps:
-            tot_s = int(self.total_frames / self.fps)
-            cur_s = int(frame_index / self.fps)
-            self.lbl_time.setText(f"Time: {cur_s//60:02d}:{cur_s%60:02d} / {tot_s//60:02d}:{tot_s%60:02d}")
-        else:
-            self.lbl_time.setText("Time: --:-- / --:--")
-
-    def on_speed_changed(self, value):
-        v = float(value)
-        if self.video_thread:
-            self.video_thread.set_speed(v)
-
-    # ---------- behaviors ----------
-    def define_behaviors(self):
-        if not self.video_loaded: return
-        # 가드: 기존 behavior가 있고 저장되지 않은 변경이 있으면 확인
-        if self.behaviors and not self._guard_unsaved("change behaviors"):
-            return
-        text = self.edit_behaviors.text().strip()
-        if not text: return
-        names = []
-        for t in [s.strip() for s in text.split(',') if s.strip()]:
-            if t not in names: names.append(t)
-        self.behaviors = names
-        n = len(names)
-        self.frame_flags = [[0]*self.total_frames for _ in range(n)]
-        self.behavior_durations = [0]*n
-
-        # populate slot combos with "(None) + behaviors"  + 슬롯 상태 초기화
-        for s in self.slot_ui:
-            s['cmb'].blockSignals(True)
-            s['cmb'].clear(); s['cmb'].addItem("(None)")
-            s['cmb'].addItems(self.behaviors)
-            s['cmb'].blockSignals(False)
-        for i, sl in enumerate(self.slots):
-            # behavior만 리셋(키는 유지), 시간/표시 초기화
-            sl['behavior'] = None
-            sl['ms'] = 0
-            sl['pressed'] = False
-            self._update_slot_title(i, 0)
-            if 'title' in self.slot_ui[i]:
-                self.slot_ui[i]['title'].setStyleSheet("color: gray;")
-            self._set_overlay_text(i, "")
-            self.overlay_labels[i].hide()
-            # 콤보 (None)으로 고정
-            self.slot_ui[i]['cmb'].blockSignals(True)
-            self.slot_ui[i]['cmb'].setCurrentIndex(0)
-            self.slot_ui[i]['cmb'].blockSignals(False)
-        # 총 타이머 00:00
-        self.record_total_ms = 0
-        self._set_total_label_text(0)
-
-        # prepare overlays text to match slot behavior name at press time (dynamic)
-        QMessageBox.information(self, "Behaviors Set", "Behaviors defined. Assign physical keys per slot.")
-
-        # enable export/preview only when there is data later
-        self.btn_preview.setEnabled(True)
-        self.btn_export.setEnabled(True)
-        self.update_ui_state()
-        self._refresh_slot_title_styles(recording=self.recording)
-
-    def on_slot_behavior_changed(self, slot_idx: int):
-        """슬롯의 behavior 콤보가 바뀌었을 때: 중복 가드 + 색 갱신."""
-        if slot_idx < 0 or slot_idx >= len(self.slot_ui):
-            return
-        cmb = self.slot_ui[slot_idx]['cmb']
-        text = cmb.currentText().strip()
-
-        # "(None)" 처리
-        if text == "(None)":
-            sl = self.slots[slot_idx]
-            # 진행 중이면 즉시 중단/오버레이 off
-            if sl.get('pressed'):
-                sl['pressed'] = False
-                if self.check_overlay.isChecked():
-                    self.overlay_labels[slot_idx].hide()
-            # behavior 해제 + 시간 리셋
-            sl['behavior'] = None
-            sl['ms'] = 0
-            # 색: 미지정 → 회색
-            if 'title' in self.slot_ui[slot_idx]:
-                self.slot_ui[slot_idx]['title'].setStyleSheet("color: gray;")
-                self._update_slot_title(slot_idx, 0)
-            # 오버레이 텍스트도 정리
-            self._set_overlay_text(slot_idx, "")
-            return
-
-        # 문자열을 behaviors 인덱스로 매핑
-        try:
-            bi = self.behaviors.index(text)
-        except ValueError:
-            # 정의되지 않은 이름이 들어왔다면 안전하게 해제
-            cmb.setCurrentIndex(0)
-            return
-
-        # 중복 행동 가드: 다른 슬롯이 이미 같은 behavior를 사용 중이면 금지
-        for i, sl in enumerate(self.slots):
-            if i != slot_idx and sl.get('behavior') == bi:
-                QMessageBox.warning(self, "Duplicate behavior",
-                                    f"'{text}' is already assigned to Slot {i+1}.")
-                cmb.blockSignals(True)
-                cmb.setCurrentIndex(0)  # (None)으로 되돌림
-                cmb.blockSignals(False)
-                # 회색으로 반영
-                if 'title' in self.slot_ui[slot_idx]:
-                    self.slot_ui[slot_idx]['title'].setStyleSheet("color: gray;")
-                self.slots[slot_idx]['behavior'] = None
-                self._set_overlay_text(slot_idx, "")
-                return
-
-        # 정상 할당: 슬롯에 behavior 인덱스 저장
-        sl = self.slots[slot_idx]
-        # 진행 중이면 즉시 중단/오버레이 off
-        if sl.get('pressed'):
-            sl['pressed'] = False
-            if self.check_overlay.isChecked():
-                self.overlay_labels[slot_idx].hide()
-        sl['behavior'] = bi
-        sl['ms'] = 0
-        # 색: 지정됨 → 검정
-        if 'title' in self.slot_ui[slot_idx]:
-            self.slot_ui[slot_idx]['title'].setStyleSheet("color: black;")
-            self._update_slot_title(slot_idx, 0)
-        # 오버레이 텍스트 갱신
-        self._set_overlay_text(slot_idx, text)
-        # 상태에 맞춰 다른 라벨 색도 재정렬(녹화 중/아닐 때 규칙 유지)
-        self._refresh_slot_title_styles(recording=self.recording)
-        # 필요 시 UI 상태 갱신
-        self.update_ui_state()
-
-    # ---------- capture (per-slot & multi) ----------
-    def start_capture(self, slot_idx):
-        self.check_record.setEnabled(False)
-        if self.recording:
-            QMessageBox.information(self, "Locked", "Cannot capture keys during recording.")
-            return
-        self.pending_key_capture = slot_idx
-        self.slot_ui[slot_idx]['keylab'].setText("Press any key...")
-        self.activateWindow(); self.raise_()
-        self.setFocus(Qt.ActiveWindowFocusReason)
-        self.grabKeyboard()
-
-    # ---------- recording ----------
-    def on_record_toggled(self, state):
-        if state == Qt.Checked:
-            if not self.start_recording():
-                # 시작 실패 시 체크 되돌림
-                self.check_record.setChecked(False)
-        else:
-            self.stop_recording()
-        self.update_ui_state()
-
-    def _validate_recording_ready(self):
-        # behavior가 선택된 슬롯만 검사
-        beh_slots = [i for i in range(self.SLOTS) if self.slots[i]['behavior'] is not None]
-        if not beh_slots:
-            QMessageBox.warning(self, "Invalid", "Select at least one behavior for a slot.")
-            return False
-        # 선택된 behavior 슬롯은 반드시 키가 있어야 함
-        missing = [i+1 for i in beh_slots if self.slots[i]['key'] is None]
-        if missing:
-            QMessageBox.warning(self, "Invalid", f"Slots with a behavior must have a physical key (check slots: {missing}).")
-            return False
-        # 중복 체크(선택된 behavior 슬롯끼리만)
-        keys = [self.slots[i]['key'] for i in beh_slots]
-        if len(set(keys)) != len(keys):
-            QMessageBox.warning(self, "Invalid", "Duplicate physical keys across behavior-assigned slots.")
-            return False
-        behs = [self.slots[i]['behavior'] for i in beh_slots]
-        if len(set(behs)) != len(behs):
-            QMessageBox.warning(self, "Invalid", "Behaviors must be unique across slots.")
-            return False
-        return True
-
-    def start_recording(self):
-        self.update_ui_state()
-        if not self.behaviors:
-            QMessageBox.warning(self, "No Behaviors", "Define behaviors first.")
-            return False
-        if not self._validate_recording_ready():
-            return False
-
-        selected_beh_indices = [sl['behavior'] for sl in self.slots if sl['behavior'] is not None]
-        already_labeled = []
-        for bi in selected_beh_indices:
-            # 해당 행동 컬럼에 1이 한 번이라도 있으면 과거 라벨 존재로 간주
-            if bi is not None and any(self.frame_flags[bi]):
-                already_labeled.append(bi)
-        if already_labeled:
-            names = ", ".join(self.behaviors[bi] for bi in sorted(set(already_labeled)))
-            box = QMessageBox(self)
-            box.setWindowTitle("Confirm re-measure")
-            box.setIcon(QMessageBox.Warning)
-            box.setText(f"The following behaviors already have labels:\n{names}\n\n"
-                        "Continuing will overwrite these behaviors on frames you pass during this session.\n"
-                        "Do you want to continue?")
-            btn_yes = box.addButton("Continue", QMessageBox.AcceptRole)
-            btn_cancel = box.addButton("Cancel", QMessageBox.RejectRole)
-            box.exec_()
-            if box.clickedButton() is btn_cancel:
-                return False
-
-        # reset timers
-        self.record_total_ms = 0
-        self._set_total_label_text(0)
-        for i, sl in enumerate(self.slots):
-            sl['ms'] = 0
-            self._update_slot_title(i, 0)
-
-        # mark state
-        self.recording = True
-        # 바로 고정하지 않고, 다음 on_frame_ready에서 확정
-        self.record_start_frame = None
-        self.record_start_ms = None
-        self.record_limit_end_frame = None
-        self._record_arming_pending = True
-
-        self._rebuild_key_index()
-        self.update_ui_state()
-        return True
-
-    def stop_recording(self):
-        if not self.recording: return
-        # finalize any pressed slots
-        any_finalized = False
-        for i, sl in enumerate(self.slots):
-            if sl['pressed'] and sl['behavior'] is not None:
-                bi = sl['behavior']
-                end_ms = self._ms_now()
-                dur = max(0, end_ms - sl['start_ms'])
-                sl['ms'] += dur
-                self.behavior_durations[bi] += dur
-                s, e = sl['start_frame'], self.current_frame_idx
-                if e < s: s, e = e, s
-                for f in range(max(0, s), min(self.total_frames-1, e)+1):
-                    self.frame_flags[bi][f] = 1
-                sl['pressed'] = False
-                if self.check_overlay.isChecked():
-                    self.overlay_labels[i].hide()
-                any_finalized = True
-            # update UI time
-            self._update_slot_title(i)
-
-        # keep total timer label (do not reset)
-        if self.record_start_ms is not None:
-            self.record_total_ms = max(0, self._ms_now() - self.record_start_ms)
-            self._set_total_label_text(self.record_total_ms)
-
-        self.recording = False
-        self._record_arming_pending = False
-        self.record_limit_end_frame = None
-        if any_finalized:
-            self.data_modified = True
-        self.update_ui_state()
-
-    def _ms_now(self):
-        # use frame index for stability with video timing
-        return int((self.current_frame_idx / self.fps) * 1000) if self.fps else int(time.time()*1000)
-
-    # ---------- bookmarks ----------
-    def add_bookmark(self):
-        f = int(self.current_frame_idx)
-        if self.fps:
-            total_seconds = int(f / self.fps)
-            mm, ss = divmod(total_seconds, 60)
-        else:
-            mm, ss = 0, 0
-        text = f"Frame {f} ({mm:02d}:{ss:02d})"
-        # 중복 방지: 데이터(UserRole)로 비교
-        for i in range(self.list_bookmarks.count()):
-            it = self.list_bookmarks.item(i)
-            if it.data(Qt.UserRole) == f:
-                return
-        it = QListWidgetItem(text)
-        it.setData(Qt.UserRole, f)
-        self.list_bookmarks.addItem(it)
-
-    def jump_to_bookmark(self):
-        item = self.list_bookmarks.currentItem()
-        if not item or not self.video_thread: return
-        # 저장된 프레임 번호를 직접 사용(파싱 불필요)
-        frame = item.data(Qt.UserRole)
-        if frame is None:
-            # 구버전 북마크(문자열만 저장) 호환
-            parts = item.text().split()
-            try: frame = int(parts[1])
-            except: return
-        # 녹화 중엔 시작 프레임 이전으로 점프 금지(설계대로 클램프)
-        if self.recording and self.record_start_frame is not None:
-            frame = max(frame, self.record_start_frame)
-        # 범위 보정 후 실제 점프
-        frame = max(0, min(int(frame), self.total_frames - 1))
-        self.video_thread.seek(frame)
-
-    def delete_bookmark(self):
-        for it in self.list_bookmarks.selectedItems():
-            self.list_bookmarks.takeItem(self.list_bookmarks.row(it))
-
-    # ---------- preview/import/export (lightweight CSV) ----------
-    def preview_result(self):
-        if not self.behaviors or not self.frame_flags:
-            QMessageBox.information(self, "Preview", "No data to preview.")
-            return
-        dlg = QDialog(self); dlg.setWindowTitle("Preview Result")
-        dlg.setMinimumSize(900, 600)
-        v = QVBoxLayout(dlg)
-        meta = QWidget(dlg)
-        meta.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
-        meta_v = QVBoxLayout(meta); meta_v.setContentsMargins(0,0,0,0)
-        # 상단 요약
-        video_name = self.list_videos.currentItem().text() if self.list_videos.currentItem() else "N/A"
-        hdr = QLabel(f"<b>Video:</b> {video_name} &nbsp;&nbsp; "
-                     f"<b>Frames:</b> {self.total_frames} &nbsp;&nbsp; "
-                     f"<b>FPS:</b> {self.fps:.2f}")
-        meta_v.addWidget(hdr)
-        frame_dur = 1.0 / self.fps if self.fps else 0
-        lines = []
-        for i, name in enumerate(self.behaviors):
-            cnt = sum(self.frame_flags[i])
-            lines.append(f"{name}: {cnt} frames (~{cnt*frame_dur:.2f}s)")
-        meta_v.addWidget(QLabel("<b>Totals per behavior</b><br>" + "<br>".join(lines)))
-        
-        # 하단 테이블: 0..last 모든 프레임 표시 (작은 표 + 스크롤)
-        frames_list = list(range(self.total_frames))
-        meta_v.addWidget(QLabel(f"All frames: 0 .. {self.total_frames-1}"))
-        v.addWidget(meta, 0)  # stretch 0 → 메타는 그대로, 아래 테이블만 늘어남
-        table = QTableWidget(len(frames_list), 1 + len(self.behaviors), dlg)
-        headers = ["Frame"] + self.behaviors
-        table.setHorizontalHeaderLabels(headers)
-        # 작은 폰트/행높이/스크롤
-        small_font = table.font(); small_font.setPointSize(9)
-        table.setFont(small_font)
-        table.verticalHeader().setDefaultSectionSize(16)  # 행 높이
-        table.setAlternatingRowColors(True)
-        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        table.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
-        # 첫 컬럼은 내용 기준, 나머지는 스트레치
-        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
-        for c in range(1, 1+len(self.behaviors)):
-            table.horizontalHeader().setSectionResizeMode(c, QHeaderView.Stretch)
-
-        # 데이터 채우기
-        for r, f in enumerate(frames_list):
-            itf = QTableWidgetItem(str(f))
-            itf.setTextAlignment(Qt.AlignCenter)
-            itf.setFlags(itf.flags() & ~Qt.ItemIsEditable)
-            table.setItem(r, 0, itf)
-            for c in range(len(self.behaviors)):
-                val = 1 if self.frame_flags[c][f] else 0
-                it = QTableWidgetItem("1" if val else "0")
-                it.setTextAlignment(Qt.AlignCenter)
-                it.setFlags(it.flags() & ~Qt.ItemIsEditable)
-                if val:
-                    # 1이면 살짝 강조(가독성)
-                    it.setBackground(QColor(255, 230, 160))  # 연한 주황빛
-                table.setItem(r, 1+c, it)
-        # 테이블은 가로/세로 모두 Expanding
-        table.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        table.setMinimumHeight(240)
-        v.addWidget(table, 1)  # stretch 1 → 세로 여유를 전부 테이블이 가져감
-        dlg.resize(1000, 700)
-        dlg.exec_()
-
-    def import_labels(self):
-        path, _ = QFileDialog.getOpenFileName(self, "Import Labels", "", "CSV Files (*.csv)")
-        if not path: return
-        try:
-            with open(path, 'r', encoding='utf-8') as fp:
-                lines = [ln.strip() for ln in fp if ln.strip()]
-        except Exception as e:
-            QMessageBox.critical(self, "Import Failed", str(e)); return
-        # simple CSV: header "Frame,<beh...>"
-        header = None
-        for ln in lines:
-            if ln.lower().startswith("frame,"):
-                header = [h.strip() for h in ln.split(',')]
-                break
-        if not header:
-            QMessageBox.warning(self, "Invalid", "No header 'Frame,...' found.")
-            return
-        behs = header[1:]
-        # define behaviors if different
-        self.edit_behaviors.setText(", ".join(behs))
-        self.define_behaviors()
-        # zero flags
-        for i in range(len(self.behaviors)):
-            self.frame_flags[i] = [0]*self.total_frames
-        # read rows
-        start_idx = lines.index(",".join(header)) + 1
-        for ln in lines[start_idx:]:
-            parts = ln.split(',')
-            try:
-                f = int(parts[0])
-            except:
-                continue
-            for i in range(len(self.behaviors)):
-                if 1+i < len(parts):
-                    self.frame_flags[i][f] = 1 if parts[1+i].strip() == '1' else 0
-        self.data_modified = False
-
-    def export_labels(self):
-        if not self.behaviors or not self.frame_flags:
-            QMessageBox.information(self, "Export", "No data to export.")
-            return
-        if self.current_video_path:
-            stem = os.path.splitext(os.path.basename(self.current_video_path))[0]
-            default_name = f"{stem}_labels.csv"
-            folder = self.video_folder if self.video_folder else os.path.dirname(self.current_video_path)
-            initial = os.path.join(folder, default_name)
-        else:
-            default_name = "labels.csv"
-            folder = self.video_folder if self.video_folder else os.getcwd()
-            initial = os.path.join(folder, default_name)
-        path, _ = QFileDialog.getSaveFileName(
-            self, "Export CSV", initial, "CSV Files (*.csv)"
-        )
-        if not path: return
-        if os.path.exists(path):
-            box = QMessageBox(self)
-            box.setWindowTitle("Overwrite file?")
-            box.setIcon(QMessageBox.Warning)
-            box.setText(f"'{os.path.basename(path)}' already exists.\nDo you want to overwrite it?")
-            btn_yes = box.addButton("Overwrite", QMessageBox.AcceptRole)
-            btn_no  = box.addButton("Cancel", QMessageBox.RejectRole)
-            box.exec_()
-            if box.clickedButton() is btn_no:
-                return
-        try:
-            with open(path, 'w', encoding='utf-8') as fp:
-                video_name = self.list_videos.currentItem().text() if self.list_videos.currentItem() else "N/A"
-                fp.write(f"Video name,{video_name}\n")
-                fp.write(f"Video fps,{self.fps}\n")
-                # 총계(초/프레임)
-                frame_dur = (1.0 / self.fps) if self.fps else 0.0
-                totals_frames = [sum(col) for col in self.frame_flags]
-                totals_seconds = [round(cnt * frame_dur, 3) for cnt in totals_frames]
-                fp.write("Total seconds," + ",".join(str(x) for x in totals_seconds) + "\n")
-                fp.write("Total frames,"  + ",".join(str(x) for x in totals_frames)  + "\n")
-                # 헤더 + 프레임별 표
-                fp.write("Frame," + ",".join(self.behaviors) + "\n")
-                for f in range(self.total_frames):
-                    row = [str(f)] + [("1" if self.frame_flags[i][f] else "0") for i in range(len(self.behaviors))]
-                    fp.write(",".join(row) + "\n")
-            QMessageBox.information(self, "Export", "Exported.")
-            self.data_modified = False
-        except Exception as e:
-            QMessageBox.critical(self, "Export Failed", str(e))
-
-    # ---------- key events ----------
-    def keyPressEvent(self, event):
-        k = event.key()
-        # ---- Arrow keys: 1 frame step (allow auto-repeat) ----
-        if k in (Qt.Key_Left, Qt.Key_Right):
-            # 슬라이더가 비활성화면 방향키도 비활성
-            if self.video_loaded and self.video_thread and self.slider.isEnabled():
-                # 슬롯 키가 눌린 중엔(라벨링 충돌 방지) 스텝 금지
-                if not any(sl['pressed'] for sl in self.slots):
-                    delta = 1 if k == Qt.Key_Right else -1
-                    new_frame = max(0, min(self.total_frames - 1, self.current_frame_idx + delta))
-                    self.video_thread.seek(new_frame)
-            return
-
-        # ---- 기타 키는 자동반복 무시 ----
-        if event.isAutoRepeat():
-            return
-
-        # 1) capture mode has priority
-        if self.pending_key_capture is not None:
-            self.check_record.setEnabled(False)
-            idx = self.pending_key_capture
-            # ESC로 캡처 취소
-            if event.key() == Qt.Key_Escape:
-                self.pending_key_capture = None
-                self.slot_ui[idx]['keylab'].setText("-")
-                self.releaseKeyboard()
-                self.check_record.setEnabled(True)
-                return
-            qt_key, scan = event.key(), event.nativeScanCode()
-            if qt_key in (Qt.Key_Left, Qt.Key_Right, Qt.Key_Space):
-                QMessageBox.warning(self, "Not allowed", "Left/Right arrows and Space is are reserved for frame control.")
-                self.slot_ui[idx]['keylab'].setText("Press any key...")
-                return
-            key_id = (qt_key, scan)
-            # 다른 슬롯과 중복 물리키 금지
-            if any(sl['key'] == key_id for n, sl in enumerate(self.slots) if n != idx):
-                QMessageBox.warning(self, "Invalid", "This physical key is already used by another slot.")
-                # 캡처 유지: 안내 문구 갱신
-                self.slot_ui[idx]['keylab'].setText("Press any key...")
-                return
-            # 저장 및 UI 갱신
-            self.slots[idx]['key'] = key_id
-            key_name = QKeySequence(qt_key).toString() or str(qt_key)
-            self.slot_ui[idx]['keylab'].setText(f"{key_name}")
-            # 종료 처리
-            self.pending_key_capture = None
-            self.releaseKeyboard()
-            self._rebuild_key_index()
-            self.check_record.setEnabled(True)
-            return
-
-        # 2) slot press handling (recording)
-        slot_idx = self._key_to_slot(event)
-        if slot_idx is not None and self.recording:
-            sl = self.slots[slot_idx]
-            bi = sl['behavior']
-            if bi is not None and not sl['pressed']:
-                sl['pressed'] = True
-                sl['start_ms'] = self._ms_now()
-                sl['start_frame'] = self.current_frame_idx
-                # overlay on with behavior text
-                if self.check_overlay.isChecked():
-                    self._set_overlay_text(slot_idx, self.behaviors[bi])
-                    self.overlay_labels[slot_idx].show()
-            return
-
-        # 3) globals
-        if k == Qt.Key_Space:
-            if not self.btn_play.isEnabled():
-                return
-            self.toggle_play_pause(); return
-
-        super().keyPressEvent(event)
-
-    def keyReleaseEvent(self, event):
-        if event.isAutoRepeat(): return
-        slot_idx = self._key_to_slot(event)
-        if slot_idx is not None and self.recording:
-            sl = self.slots[slot_idx]
-            bi = sl['behavior']
-            if bi is not None and sl['pressed']:
-                sl['pressed'] = False
-                end_ms = self._ms_now()
-                dur = max(0, end_ms - sl['start_ms'])
-                sl['ms'] += dur
-                self.behavior_durations[bi] += dur
-                s, e = sl['start_frame'], self.current_frame_idx
-                if e < s: s, e = e, s
-                for f in range(max(0, s), min(self.total_frames-1, e)+1):
-                    self.frame_flags[bi][f] = 1
-                if self.check_overlay.isChecked():
-                    self.overlay_labels[slot_idx].hide()
-                # update UI time
-                self._update_slot_title(slot_idx)
-                self.data_modified = True
-            return
-        super().keyReleaseEvent(event)
-
-    # ---------- close ----------
-    def closeEvent(self, e):
-        if self.video_thread:
-            self.video_thread.stop(); self.video_thread.wait()
-        e.accept()
-
-
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    m = MainWindow()
-    m.showMaximized()
-    sys.exit(app.exec_())
+import sys, os, cv2, time, threading, hashlib, bisect, json, struct, csv, argparse, sqlite3
+from array import array
+import numpy as np
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, pyqtSlot, QTimer, QRectF, QEvent, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QImage, QPixmap, QPainter, QColor, QFont, QKeySequence, QTransform
+from PyQt5.QtWidgets import (
+     QApplication, QMainWindow, QWidget, QFileDialog, QSizePolicy,
+     QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QListWidgetItem,
+     QPushButton, QLineEdit, QLabel, QCheckBox, QSpinBox, QDoubleSpinBox, QSlider,
+    QListWidget, QMessageBox, QGridLayout, QVBoxLayout, QHBoxLayout,
+    QGroupBox, QComboBox, QDialog, QTableView, QHeaderView, QAbstractItemView, QProgressDialog
+ )
+
+# ------------------------------ Sidecar cache ------------------------------
+CACHE_DIRNAME = ".mbti_cache"
+
+def _cache_path(video_path: str, suffix: str) -> str:
+    """비디오 폴더의 .mbti_cache/ 아래 사이드카 경로. 폴더에 쓸 수 없으면 홈 디렉터리 캐시로."""
+    folder, name = os.path.split(os.path.abspath(video_path))
+    return _folder_cache_path(folder, f"{name}.{suffix}")
+
+def _folder_cache_path(folder: str, filename: str) -> str:
+    folder = os.path.abspath(folder)
+    d = os.path.join(folder, CACHE_DIRNAME)
+    try:
+        os.makedirs(d, exist_ok=True)
+        if not os.access(d, os.W_OK):
+            raise PermissionError(d)
+    except OSError:
+        tag = hashlib.md5(folder.encode('utf-8')).hexdigest()[:10]
+        d = os.path.join(os.path.expanduser("~"), CACHE_DIRNAME, tag)
+        os.makedirs(d, exist_ok=True)
+    return os.path.join(d, filename)
+
+def _file_sig(path: str):
+    """캐시 유효성 판단용 (size, mtime_ns)."""
+    st = os.stat(path)
+    return [int(st.st_size), int(st.st_mtime_ns)]
+
+
+# ------------------------------ Performance Instrumentation ------------------------------
+class _Span:
+    __slots__ = ('stats', 'stage', 't0')
+
+    def __init__(self, stats, stage):
+        self.stats, self.stage = stats, stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.record(self.stage, self.t0)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+
+class PerfStats:
+    """단계별 소요 시간 히스토그램(µs, 2배 간격 버킷), 카운터, Chrome trace 이벤트.
+    여러 스레드에서 기록한다. 꺼져 있으면(enabled=False) span/record/count는 바로 반환."""
+    BUCKETS = 24            # 1µs .. 2**23µs(≈8초)
+    TRACE_MAX = 200000      # trace 이벤트 ring buffer
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hist = {}      # stage → [bucket counts], count, sum(µs), max(µs)
+            self.counters = {}
+            self.trace = deque(maxlen=self.TRACE_MAX)
+            self.threads = {}
+
+    def span(self, stage: str):
+        """with PERF.span("decode"): ..."""
+        return _Span(self, stage) if self.enabled else _NULL_SPAN
+
+    def record(self, stage: str, start: float, end: float = None):
+        """perf_counter 기준 [start, end] 구간 하나."""
+        if not self.enabled:
+            return
+        end = time.perf_counter() if end is None else end
+        us = max(0.0, (end - start) * 1e6)
+        b = min(self.BUCKETS - 1, int(us).bit_length())
+        tid = threading.get_ident()
+        with self._lock:
+            h = self.hist.get(stage)
+            if h is None:
+                h = self.hist[stage] = [[0] * self.BUCKETS, 0, 0.0, 0.0]
+            h[0][b] += 1
+            h[1] += 1
+            h[2] += us
+            h[3] = max(h[3], us)
+            if tid not in self.threads:
+                self.threads[tid] = threading.current_thread().name
+            self.trace.append((stage, (start - self._t0) * 1e6, us, tid))
+
+    def count(self, name: str, n: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def percentile(self, stage: str, q: float) -> float:
+        """히스토그램에서 q(0~1) 분위수의 버킷 상한(ms)."""
+        with self._lock:
+            h = self.hist.get(stage)
+            if not h or not h[1]:
+                return 0.0
+            target, acc = q * h[1], 0
+            for b, n in enumerate(h[0]):
+                acc += n
+                if acc >= target:
+                    return min((1 << b) / 1000.0, h[3] / 1000.0)
+        return h[3] / 1000.0
+
+    def summary(self):
+        """[(stage, count, mean ms, p50 ms, p95 ms, max ms)]"""
+        with self._lock:
+            stages = sorted(self.hist)
+            base = {st: (self.hist[st][1], self.hist[st][2], self.hist[st][3]) for st in stages}
+        return [(st, n, tot / n / 1000.0 if n else 0.0, self.percentile(st, 0.5), self.percentile(st, 0.95), mx / 1000.0)
+                for st, (n, tot, mx) in base.items()]
+
+    def export_trace(self, path: str):
+        """Chrome trace(JSON, chrome://tracing / Perfetto). 요약 통계/카운터는 otherData에."""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.trace)
+            threads = dict(self.threads)
+            counters = dict(self.counters)
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                  for tid, name in threads.items()]
+        events += [{"name": st, "cat": "mbti", "ph": "X", "ts": round(ts, 1), "dur": round(dur, 1), "pid": pid, "tid": tid}
+                   for st, ts, dur, tid in spans]
+        summary = {st: {"count": n, "mean_ms": round(m, 3), "p50_ms": p50, "p95_ms": p95, "max_ms": round(mx, 3)}
+                   for st, n, m, p50, p95, mx in self.summary()}
+        tmp = path + ".part"
+        with open(tmp, 'w', encoding='utf-8') as fp:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"stages": summary, "counters": counters}}, fp)
+        os.replace(tmp, path)
+
+PERF = PerfStats()
+
+
+# ------------------------------ Keyframe Index / Seek Planner ------------------------------
+class VideoIndex:
+    """비디오별 키프레임 목록(표시 순서 프레임 번호)과 프레임별 표시 시각(ms).
+    한 번 만들어 사이드카(.npz)로 저장. len(pts_ms)가 정확한 프레임 수."""
+    SUFFIX = "index.npz"
+
+    def __init__(self, keyframes, pts_ms):
+        self.keyframes = np.asarray(keyframes, dtype=np.int64)
+        self.pts_ms = np.asarray(pts_ms, dtype=np.float64)
+
+    @classmethod
+    def build(cls, video_path: str, should_stop=None):
+        """raw packet 모드로 디코드 없이 패킷만 훑어 키프레임 플래그와 pts를 모은다.
+        backend가 raw 모드를 지원하지 않으면 grab()(디코드) 패스로 프레임 수/pts만 모은다
+        (키프레임 목록은 비어 있음 → plan_seek는 인덱스 없는 경우와 같게 동작)."""
+        has_key = getattr(cv2, 'CAP_PROP_LRF_HAS_KEY_FRAME', None)
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+        try:
+            if not cap.isOpened():
+                return None
+            raw = has_key is not None and cap.set(cv2.CAP_PROP_FORMAT, -1)
+            pts, key = [], []
+            while cap.grab():
+                if should_stop and should_stop():
+                    return None
+                pts.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+                key.append(raw and cap.get(has_key) > 0)
+        finally:
+            cap.release()
+        if not pts:
+            return None
+        # 패킷은 decode 순서(B-frame) → pts로 정렬해 표시 순서 번호로 변환
+        pts = np.asarray(pts)
+        order = np.argsort(pts, kind='stable')
+        return cls(np.flatnonzero(np.asarray(key)[order]), pts[order] - pts[order[0]])
+
+    @classmethod
+    def load(cls, video_path: str):
+        """저장된 인덱스를 읽는다. 없거나 비디오가 바뀌었으면 None."""
+        try:
+            p = _cache_path(video_path, cls.SUFFIX)
+            if not os.path.exists(p):
+                return None
+            with np.load(p) as z:
+                if list(z['sig']) != _file_sig(video_path):
+                    return None
+                return cls(z['keyframes'], z['pts_ms'])   # pts가 없는 옛 캐시 → KeyError → 다시 생성
+        except Exception:
+            return None
+
+    def save(self, video_path: str):
+        p = _cache_path(video_path, self.SUFFIX)
+        tmp = p + ".tmp"
+        with open(tmp, 'wb') as fp:
+            np.savez_compressed(fp, keyframes=self.keyframes, pts_ms=self.pts_ms,
+                                sig=np.asarray(_file_sig(video_path), dtype=np.int64))
+        os.replace(tmp, p)
+
+
+class FrameTimeline:
+    """프레임 번호 ↔ 표시 시각(ms). pts_ms가 있으면 실제 타임스탬프(VFR 대응),
+    없으면 공칭 fps로 계산한다. 프레임 f의 구간은 [ms(f), ms(f+1))."""
+
+    def __init__(self, fps: float, total_frames: int, pts_ms=None):
+        self.fps = fps if fps and fps > 0 else 30.0
+        if pts_ms is not None and len(pts_ms):
+            pts = np.asarray(pts_ms, dtype=np.float64)
+            # 마지막 프레임의 길이: 끝쪽 간격의 중앙값 (한 장짜리면 공칭 fps)
+            tail = np.diff(pts[-9:])
+            last = float(np.median(tail)) if tail.size else 1000.0 / self.fps
+            self.edges = np.append(pts, pts[-1] + last)
+            self.total_frames = len(pts)
+        else:
+            self.edges = None
+            self.total_frames = max(0, int(total_frames))
+
+    @property
+    def exact(self) -> bool:
+        return self.edges is not None
+
+    def ms(self, frame) -> float:
+        """프레임 시작 시각. frame == total_frames이면 영상 끝."""
+        if self.edges is None:
+            return frame * 1000.0 / self.fps
+        n = self.total_frames
+        if frame > n:   # 범위 밖은 마지막 간격으로 연장
+            return float(self.edges[n] + (frame - n) * (self.edges[n] - self.edges[n - 1]))
+        return float(self.edges[max(0, int(frame))])
+
+    def span_ms(self, s: int, e: int) -> float:
+        """프레임 [s, e] (양끝 포함)가 화면에 머무는 시간."""
+        return self.ms(e + 1) - self.ms(s)
+
+    def total_ms(self, bouts) -> float:
+        """[start, end] 목록의 시간 합."""
+        b = np.asarray(bouts, dtype=np.int64).reshape(-1, 2)
+        if not b.size:
+            return 0.0
+        if self.edges is None:
+            return float((b[:, 1] - b[:, 0] + 1).sum()) * 1000.0 / self.fps
+        e = np.minimum(b[:, 1] + 1, self.total_frames)
+        s = np.minimum(b[:, 0], e)
+        return float((self.edges[e] - self.edges[s]).sum())
+
+    def duration_ms(self) -> float:
+        return self.ms(self.total_frames)
+
+    def frame_at(self, ms: float) -> int:
+        """ms 시각에 보이는 프레임."""
+        if self.edges is None:
+            f = int(ms * self.fps / 1000.0)
+        else:
+            f = int(np.searchsorted(self.edges, ms, side='right')) - 1
+        return max(0, min(f, self.total_frames - 1))
+
+
+SEEK_BACKOFF = 16   # FFmpeg backend의 seek은 target-16 이전의 키프레임부터 디코드해 온다
+SEEK_OVERHEAD = 8   # 컨테이너 seek + 디코더 flush 비용(프레임 디코드 수로 환산)
+
+def plan_seek(pos: int, target: int, keyframes=None, grab_limit: int = 48):
+    """디코더 위치 pos(다음에 나올 프레임, 모르면 -1)에서 target을 읽는 방법을 고른다.
+    return (method, start)
+      'grab'     : pos부터 순차 grab() (start == pos)
+      'keyframe' : 키프레임 start(target-SEEK_BACKOFF 이하)부터 디코드하는 seek이 더 싼 경우
+                   → 디코드 수는 target-start (+ seek 비용)
+      'seek'     : 인덱스가 없고 거리가 멀 때 → 컨테이너 seek (start == target)"""
+    ahead = target - pos if pos >= 0 else -1
+    if keyframes is not None and len(keyframes):
+        land = max(0, target - SEEK_BACKOFF)
+        i = int(np.searchsorted(keyframes, land, side='right')) - 1
+        k = int(keyframes[i]) if i >= 0 else 0
+        # 디코드 프레임 수 비교: 순차 전진(ahead) vs 키프레임부터(target-k) + seek 비용
+        if 0 <= ahead <= (target - k) + SEEK_OVERHEAD:
+            return 'grab', pos
+        return 'keyframe', k
+    if 0 <= ahead <= grab_limit:
+        return 'grab', pos
+    return 'seek', target
+
+
+class VideoIndexer(QThread):
+    """백그라운드에서 VideoIndex를 읽거나(캐시) 만들어 저장한다."""
+    indexReady = pyqtSignal(str, object)
+
+    def __init__(self, video_path: str, parent=None):
+        super().__init__(parent)
+        self.video_path = video_path
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def run(self):
+        idx = VideoIndex.load(self.video_path)
+        if idx is None:
+            idx = VideoIndex.build(self.video_path, should_stop=lambda: self._stop)
+            if idx is None:
+                return
+            try:
+                idx.save(self.video_path)
+            except OSError as e:
+                print("Index save error:", e)
+        if not self._stop:
+            self.indexReady.emit(self.video_path, idx)
+
+
+# ------------------------------ Folder Metadata Index ------------------------------
+VIDEO_EXTS = ('mp4', 'avi', 'mov', 'mkv', 'wmv')
+FOLDER_INDEX_NAME = "folder_index.json"
+
+def list_videos_in(folder: str):
+    return sorted(f for f in os.listdir(folder)
+                  if os.path.isfile(os.path.join(folder, f)) and f.lower().split('.')[-1] in VIDEO_EXTS)
+
+def probe_video(path: str) -> dict:
+    """fps / 프레임 수 / 길이 / 해상도 / 코덱. (컨테이너 값이라 VFR에서는 추정치)"""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise RuntimeError(f"Failed to open video: {path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
+        cc = int(cap.get(cv2.CAP_PROP_FOURCC))
+        codec = "".join(chr((cc >> (8 * i)) & 0xFF) for i in range(4)).strip("\0 ") if cc else ""
+        return {'fps': fps, 'frames': frames, 'duration': frames / fps if fps else 0.0,
+                'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                'codec': codec}
+    finally:
+        cap.release()
+
+def has_labels(path: str) -> bool:
+    """이 영상에 대한 라벨(사이드카/autosave/내보낸 CSV, 라벨 기록이 있는 저널)이 옆에 있는지."""
+    stem = os.path.splitext(path)[0]
+    if any(os.path.exists(p) for p in (label_sidecar_path(path), label_autosave_path(path), stem + "_labels.csv")):
+        return True
+    journal = label_journal_path(path)
+    return any(LabelJournal.has_events(p) for p in (journal, journal + ".old"))
+
+def format_video_meta(meta: dict) -> str:
+    m, s = divmod(int(round(meta.get('duration', 0))), 60)
+    h, m = divmod(m, 60)
+    dur = f"{h}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
+    text = f"{meta['width']}×{meta['height']} · {meta['fps']:.2f} fps · {dur}"
+    if meta.get('codec'):
+        text += f" · {meta['codec']}"
+    if meta.get('labels'):
+        text += " · labeled"
+    return text
+
+
+class FolderIndexer(QThread):
+    """폴더의 영상 메타데이터를 worker pool로 probe. 결과는 폴더 캐시(파일별 크기/mtime)로 재사용.
+    라벨 파일 유무는 영상과 무관하게 바뀌므로 매번 새로 확인한다."""
+    metaReady = pyqtSignal(str, object)   # 파일 이름, meta dict
+
+    def __init__(self, folder: str, names, workers: int = None, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+        self.names = list(names)
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def _load_cache(self, path: str) -> dict:
+        try:
+            with open(path, 'r', encoding='utf-8') as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return {}
+
+    def run(self):
+        cache_file = _folder_cache_path(self.folder, FOLDER_INDEX_NAME)
+        cache = self._load_cache(cache_file)
+        todo, fresh = [], {}
+        for name in self.names:
+            path = os.path.join(self.folder, name)
+            try:
+                sig = _file_sig(path)
+            except OSError:
+                continue
+            ent = cache.get(name)
+            if ent and ent.get('sig') == sig:
+                fresh[name] = ent
+                self.metaReady.emit(name, dict(ent['meta'], sig=sig, labels=has_labels(path)))
+            else:
+                todo.append((name, sig))
+
+        def work(job):
+            name, sig = job
+            if self._stop:
+                return
+            path = os.path.join(self.folder, name)
+            try:
+                meta = probe_video(path)
+            except Exception as e:
+                print("Probe error:", e)
+                return
+            fresh[name] = {'sig': sig, 'meta': meta}
+            self.metaReady.emit(name, dict(meta, sig=sig, labels=has_labels(path)))
+
+        if todo:
+            with ThreadPoolExecutor(max_workers=self.workers) as ex:
+                list(ex.map(work, todo))
+        if fresh != cache:
+            tmp = cache_file + ".tmp"
+            try:
+                with open(tmp, 'w', encoding='utf-8') as fp:
+                    json.dump(fresh, fp)
+                os.replace(tmp, cache_file)
+            except OSError as e:
+                print("Folder index save error:", e)
+
+
+# ------------------------------ Proxy Videos ------------------------------
+# 저해상도 all-intra(MJPG) 사본. 프레임 수/fps는 원본과 같아 프레임 번호가 그대로 대응한다.
+PROXY_HEIGHT = 360
+PROXY_SUFFIX = "proxy.avi"
+
+def proxy_path(video_path: str) -> str:
+    return _cache_path(video_path, PROXY_SUFFIX)
+
+def load_proxy(video_path: str):
+    """유효한 프록시가 있으면 그 경로, 없거나 원본이 바뀌었으면 None."""
+    try:
+        p = proxy_path(video_path)
+        with open(p + ".json", 'r', encoding='utf-8') as fp:
+            meta = json.load(fp)
+        if meta.get('sig') != _file_sig(video_path) or not os.path.exists(p):
+            return None
+        return p
+    except (OSError, ValueError):
+        return None
+
+def build_proxy(video_path: str, should_stop=None, on_progress=None):
+    """원본을 처음부터 끝까지 디코드해 PROXY_HEIGHT 높이 MJPG로 다시 쓴다. 취소되면 None."""
+    src = cv2.VideoCapture(video_path)
+    if not src.isOpened():
+        raise RuntimeError(f"Failed to open video: {video_path}")
+    out = proxy_path(video_path)
+    part = out[:-len(".avi")] + ".part.avi"   # 컨테이너는 확장자로 정해짐
+    fps = src.get(cv2.CAP_PROP_FPS) or 30.0
+    total = int(src.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
+    w, h = int(src.get(cv2.CAP_PROP_FRAME_WIDTH)), int(src.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    ph = min(PROXY_HEIGHT, h) // 2 * 2
+    pw = max(2, int(round(w * ph / max(1, h) / 2)) * 2)
+    writer = cv2.VideoWriter(part, cv2.VideoWriter_fourcc(*'MJPG'), fps, (pw, ph))
+    if not writer.isOpened():
+        src.release()
+        raise RuntimeError("MJPG writer is not available.")
+    writer.set(cv2.VIDEOWRITER_PROP_QUALITY, 80)
+    n, last_pct, done = 0, -1, False
+    try:
+        while True:
+            if should_stop and should_stop():
+                return None
+            ok, frame = src.read()
+            if not ok:
+                break
+            writer.write(frame if (w, h) == (pw, ph) else cv2.resize(frame, (pw, ph), interpolation=cv2.INTER_AREA))
+            n += 1
+            pct = n * 100 // total if total else 0
+            if on_progress and pct != last_pct:
+                on_progress(min(100, pct))
+                last_pct = pct
+        done = n > 0 and not (should_stop and should_stop())
+    finally:
+        writer.release()
+        src.release()
+        if not done and os.path.exists(part):   # 취소/빈 영상/오류 → 쓰다 만 파일 정리
+            os.remove(part)
+    if not done:
+        return None
+    os.replace(part, out)
+    with open(out + ".json", 'w', encoding='utf-8') as fp:
+        json.dump({'sig': _file_sig(video_path), 'frames': n, 'size': [pw, ph]}, fp)
+    return out
+
+
+class ProxyBuilder(QThread):
+    """폴더의 영상들을 차례로 프록시로 만든다(이미 유효한 것은 건너뜀). prioritize로 순서 변경."""
+    progress = pyqtSignal(str, int)       # video_path, %
+    proxyReady = pyqtSignal(str, str)     # video_path, proxy_path
+
+    def __init__(self, video_paths, parent=None):
+        super().__init__(parent)
+        self._queue = list(video_paths)
+        self._lock = threading.Lock()
+        self._stop = False
+
+    def prioritize(self, video_path: str):
+        with self._lock:
+            if video_path in self._queue:
+                self._queue.remove(video_path)
+                self._queue.insert(0, video_path)
+
+    def stop(self):
+        self._stop = True
+
+    def run(self):
+        while not self._stop:
+            with self._lock:
+                if not self._queue:
+                    return
+                path = self._queue.pop(0)
+            try:
+                out = load_proxy(path) or build_proxy(path, should_stop=lambda: self._stop,
+                                                      on_progress=lambda pct: self.progress.emit(path, pct))
+            except Exception as e:
+                print("Proxy build error:", e)
+                continue
+            if out:
+                self.proxyReady.emit(path, out)
+
+
+# ------------------------------ Frame Source ------------------------------
+class FrameSource:
+    """cv2.VideoCapture 래퍼. 다음에 디코드될 위치(pos)를 추적하고,
+    디코드 워커/재생 스레드가 함께 쓰므로 접근은 lock으로 직렬화한다.
+    keyframes가 주어지면 plan_seek로 순차 grab / 키프레임 디코드 / 컨테이너 seek 중 선택."""
+    GRAB_LIMIT = 48  # 인덱스 없을 때 이 거리 이내 전진은 seek 대신 순차 grab
+
+    def __init__(self, path: str):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Failed to open video: {path}")
+        self.lock = threading.RLock()
+        self.pos = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) or 0  # 다음 read()가 돌려줄 프레임
+        self.keyframes = None
+
+    def get(self, prop):
+        with self.lock:
+            return self.cap.get(prop)
+
+    def read(self, index: int, out=None):
+        """index 프레임을 디코드해 BGR 배열로 반환(실패 시 None).
+        out(같은 크기 uint8 배열)을 주면 그 버퍼에 바로 디코드한다."""
+        with self.lock:
+            method, start = plan_seek(self.pos, index, self.keyframes, self.GRAB_LIMIT)
+            if method != 'grab':
+                # 'keyframe': backend는 요청-SEEK_BACKOFF 이전 키프레임부터 디코드하므로
+                #             start+SEEK_BACKOFF를 요청해야 키프레임 start에서 시작한다 → 나머지는 순차 grab
+                # 'seek'    : 인덱스 없음 → backend의 seek에 맡긴다 (start == index)
+                start = min(index, start + SEEK_BACKOFF) if method == 'keyframe' else index
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            for _ in range(index - start):
+                if not self.cap.grab():
+                    self.pos = -1
+                    return None
+            ret, frame = self.cap.read(out) if out is not None else self.cap.read()
+            if not ret:
+                self.pos = -1  # 위치 불명 → 다음 read는 반드시 seek
+                return None
+            self.pos = index + 1
+            return frame
+
+    def release(self):
+        with self.lock:
+            self.cap.release()
+
+
+# ------------------------------ Pooled Frames ------------------------------
+HAS_BGR888 = hasattr(QImage, 'Format_BGR888')   # Qt 5.14+: BGR 버퍼를 변환 없이 QImage로
+
+class FramePool:
+    """같은 크기 프레임 버퍼(H×W×3 uint8) 재사용 풀. 디코더가 여기서 받은 버퍼에 바로 쓴다."""
+
+    def __init__(self, max_free: int = 32):
+        self.max_free = max_free
+        self._free = {}
+        self._lock = threading.Lock()
+        self.allocs = 0
+        self.reuses = 0
+
+    def acquire(self, shape):
+        with self._lock:
+            free = self._free.get(shape)
+            if free:
+                self.reuses += 1
+                return free.pop()
+            self.allocs += 1
+        return np.empty(shape, dtype=np.uint8)
+
+    def give_back(self, buf):
+        with self._lock:
+            free = self._free.setdefault(buf.shape, [])
+            if len(free) < self.max_free:
+                free.append(buf)
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
+
+
+class PooledFrame:
+    """풀 버퍼를 복사 없이 감싼 QImage + 참조 카운트.
+    보관하는 쪽(캐시, prefetch 버퍼, 화면으로 전달 중)마다 retain/release 한 번씩.
+    0이 되면 버퍼는 풀로 돌아가므로, release 이후에는 image를 쓰면 안 된다."""
+    __slots__ = ('buf', 'image', 'nbytes', 'proxy', 'emitted', '_refs', '_pool', '_lock')
+
+    def __init__(self, buf, pool: FramePool, fmt):
+        h, w = buf.shape[:2]
+        self.buf = buf
+        self.image = QImage(buf.data, w, h, buf.strides[0], fmt)
+        self.nbytes = buf.nbytes
+        self.proxy = False      # 프록시에서 디코드한 프레임(저해상도)
+        self.emitted = 0.0      # GUI로 보낸 시각(perf_counter) → 시그널 큐 대기 시간 측정
+        self._refs = 1
+        self._pool = pool
+        self._lock = threading.Lock()
+
+    def retain(self):
+        with self._lock:
+            self._refs += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            if self._refs <= 0:
+                return
+            self._refs -= 1
+            if self._refs:
+                return
+        self.image = QImage()
+        if self._pool is not None:
+            self._pool.give_back(self.buf)
+        self.buf = None
+
+def release_items(items):
+    """[(index, PooledFrame|None), ...] 중 프레임을 모두 release."""
+    for _, fr in items:
+        if fr is not None:
+            fr.release()
+
+
+# ------------------------------ Decoded Frame Cache ------------------------------
+class FrameCache:
+    """프레임 번호 → PooledFrame LRU 캐시. 캐시도 참조 하나를 들고 있고(put), get은 호출자 몫으로 retain해 준다.
+    max_bytes를 넘으면 가장 오래 안 쓴 프레임부터 버린다. 워커/재생 스레드 공용이라 lock 사용."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = int(max_bytes)
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, index: int):
+        with self._lock:
+            fr = self._items.get(index)
+            if fr is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(index)
+            self.hits += 1
+            return fr.retain()
+
+    def put(self, index: int, frame: PooledFrame):
+        size = frame.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(index, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+                old.release()
+            self._items[index] = frame.retain()
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, ev = self._items.popitem(last=False)
+                self.nbytes -= ev.nbytes
+                ev.release()
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for fr in self._items.values():
+                fr.release()
+            self._items.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'frames': len(self._items), 'bytes': self.nbytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+# ------------------------------ Decode-ahead Prefetcher ------------------------------
+class FramePrefetcher(threading.Thread):
+    """재생 위치보다 최대 depth 프레임 앞서 디코드+변환을 끝내 두는 워커.
+    produce(index, direction) → 재생 순서대로 [(index, PooledFrame), ...], 끝에 닿으면 (index, None).
+    버퍼에 있는 프레임은 prefetcher 소유: take/claim으로 꺼내면 호출자 소유, 버려질 때는 release.
+    (역재생은 GOP 조각을 한꺼번에 디코드해 역순으로 돌려주므로 한 번에 여러 프레임)
+    버퍼 내용은 generation 번호로 관리: restart/halt 시 진행 중이던 결과는 버려진다."""
+
+    def __init__(self, produce, depth: int):
+        super().__init__(daemon=True)
+        self._produce = produce
+        self.depth = max(1, int(depth))
+        self._buf = deque()
+        self._cond = threading.Condition()
+        self._gen = 0
+        self._next = 0          # 워커가 다음에 만들 프레임
+        self._dir = 1
+        self._active = False
+        self._stopped = False
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and (not self._active or len(self._buf) >= self.depth):
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                gen, idx, d = self._gen, self._next, self._dir
+            items = self._produce(idx, d)  # 디코드는 condition 밖에서
+            with self._cond:
+                if gen != self._gen:
+                    release_items(items)
+                    continue  # 그 사이 seek/flush 됨 → 폐기
+                self._buf.extend(items)
+                if items[-1][1] is None:
+                    self._active = False  # 끝: 더 채우지 않음
+                else:
+                    self._next = items[-1][0] + d
+                self._cond.notify_all()
+
+    def _head(self):
+        return self._buf[0][0] if self._buf else self._next
+
+    def _reset(self, index: int, direction: int, active: bool):
+        self._gen += 1
+        release_items(self._buf)
+        self._buf.clear()
+        self._next = index
+        self._dir = direction
+        self._active = active
+        self._cond.notify_all()
+
+    def restart(self, index: int, direction: int = 1):
+        """버퍼 flush 후 index부터 direction 방향으로 다시 채운다."""
+        with self._cond:
+            self._reset(index, direction, True)
+
+    def halt(self):
+        with self._cond:
+            self._reset(self._next, self._dir, False)
+
+    def claim(self, index: int):
+        """seek 대상이 이미 버퍼에 있으면 그 앞은 버리고 해당 항목을 돌려준다(없으면 None)."""
+        with self._cond:
+            if not any(i == index for i, _ in self._buf):
+                return None
+            while self._buf[0][0] != index:
+                release_items([self._buf.popleft()])
+            item = self._buf.popleft()
+            self._cond.notify_all()
+            return item
+
+    def take(self, index: int, direction: int, timeout: float):
+        """재생 루프용: index 프레임을 꺼낸다. 위치/방향이 어긋나 있으면 flush 후 재시작."""
+        with self._cond:
+            if not (self._active or self._buf) or self._head() != index or self._dir != direction:
+                self._reset(index, direction, True)
+            if not self._buf:
+                self._cond.wait(timeout)
+            if not self._buf:
+                return None
+            item = self._buf.popleft()
+            self._cond.notify_all()
+            return item
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            release_items(self._buf)
+            self._buf.clear()
+            self._cond.notify_all()
+
+
+# ------------------------------ Video Playback Thread ------------------------------
+class VideoThread(QThread):
+    frameReady = pyqtSignal(object, int)   # (PooledFrame | None=화면 드롭, index) — 받는 쪽이 release() 한 번
+    finished = pyqtSignal()
+    rateReport = pyqtSignal(float, float, int)   # 실제 배속, 요청 배속, 구간 내 화면 드롭 수
+    scrubReady = pyqtSignal(object, int, float)  # (PooledFrame, 실제 보여 준 index, scrub 요청 시각) — release() 한 번
+
+    PREFETCH_DEPTH = 8      # 앞서 디코드해 둘 최대 프레임 수 (0 = prefetch 끔)
+    PREFETCH_MB = 256       # ring buffer 메모리 상한 → 고해상도에서는 depth 자동 축소
+    CACHE_MB = 256          # 최근 디코드 프레임 LRU 캐시 상한
+    REVERSE_CHUNK = 32      # 역재생 시 한 번에 정방향 디코드할 최대 프레임 수
+    LAG_DROP, LAG_SLOW = "drop", "slow"   # 늦어졌을 때: 화면 프레임 드롭(인덱스는 모두 전달) / 느려지기
+    MAX_LAG = 0.5           # 드롭으로도 못 따라잡는 지연(초) → 기준 시각을 다시 잡음
+    MIN_DRAW_INTERVAL = 1 / 30   # 드롭 중에도 이 간격마다 한 장은 그린다
+    RATE_REPORT_S = 1.0
+    PROXY_MIN_SPEED = 2.0   # 프록시 모드에서 이 배속 이상 재생은 프록시로
+    SCRUB_DECODE = 32       # scrub 미리보기 한 장에 허용할 최대 디코드 수(키프레임 인덱스가 있을 때)
+
+    def __init__(self, video_path: str, parent=None, prefetch_depth: int = None, cache_mb: int = None,
+                 source: "FrameSource" = None, meta: dict = None):
+        super().__init__(parent)
+        self.video_path = video_path
+        self.src = source       # 이미 열어 둔 디코더가 있으면 그대로 사용 (영상당 한 번만 연다)
+        self.meta = meta        # 폴더 인덱스 메타데이터 (fps/frames/해상도)
+        self.fps = 0.0
+        self.total_frames = 0
+        self.current_index = 0  # 마지막으로 내보낸 프레임 + 1
+        self.playing = False
+        self.stopped = False
+        self.seek_frame = None
+        self.speed = 1.0
+        self.direction = 1      # 1: 정방향, -1: 역재생
+        self._eof_emitted = False
+        self.prefetch_depth = self.PREFETCH_DEPTH if prefetch_depth is None else int(prefetch_depth)
+        self._prefetcher = None
+        self._chunk = self.REVERSE_CHUNK
+        self.keyframes = None
+        self.frame_cache = FrameCache((self.CACHE_MB if cache_mb is None else cache_mb) * 1024 * 1024)
+        self.pool = FramePool()
+        self._shape = None      # 디코드 프레임 (h, w, 3)
+        self._target = None     # (w, h): 화면 표시 크기. 원본보다 작으면 변환 전에 축소 (워커 스레드가 적용)
+        self._target_req = None # GUI가 요청한 새 표시 크기 → 루프에서 _apply_target_size
+        self._size_gen = 0      # 표시 크기 세대: 이전 크기로 변환된 프레임은 캐시에 넣지 않는다
+        self.proxy_path = None  # 프록시 파일 (scrub/고배속 재생용)
+        self.use_proxy = False
+        self._proxy_src = None
+        self._proxy_lock = threading.Lock()
+        self._showing_proxy = False
+        self.scrub_req = None   # (frame, 요청 시각): 드래그 중 최신 요청만 유지
+        self._wake = threading.Event()  # 정지 중 대기를 seek/play가 즉시 깨우도록
+        self.lag_policy = self.LAG_DROP
+        self.timeline = None    # FrameTimeline: 재생 시계는 프레임별 표시 시각을 따른다
+        self._anchor = None     # (monotonic 시각, 프레임): 재생 시계 기준점
+        self._rate_win = None   # (시작 시각, 시작 프레임, 드롭 수): rateReport 구간
+        self._last_draw = 0.0
+        self._seek_t = 0.0      # 마지막 seek 요청 시각 (seek 지연 측정)
+
+    def open_video(self):
+        if self.src is None:
+            self.src = FrameSource(self.video_path)
+        self.src.keyframes = self.keyframes
+        meta = self.meta
+        if meta:
+            self.fps = meta['fps']
+            self.total_frames = meta['frames']
+            w, h = meta['width'], meta['height']
+        else:
+            self.fps = self.src.get(cv2.CAP_PROP_FPS) or 30.0
+            self.total_frames = int(self.src.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
+            w = int(self.src.get(cv2.CAP_PROP_FRAME_WIDTH))
+            h = int(self.src.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.current_index = self.src.pos
+        if self.timeline is None:
+            self.timeline = FrameTimeline(self.fps, self.total_frames)
+        else:   # 인덱스 캐시로 이미 정확한 프레임 수를 안다
+            self.total_frames = self.timeline.total_frames
+        if w > 0 and h > 0:
+            self._shape = (h, w, 3)
+        # 고해상도일수록 버퍼/역재생 조각을 줄여 메모리 상한을 지킨다
+        w, h = w or 1920, h or 1080
+        by_mem = (self.PREFETCH_MB * 1024 * 1024) // max(1, w * h * 3)
+        self.prefetch_depth = min(self.prefetch_depth, max(2, by_mem)) if self.prefetch_depth > 0 else 0
+        self._chunk = max(2, min(self.REVERSE_CHUNK, by_mem))
+
+    def _start_prefetcher(self):
+        if self.prefetch_depth <= 0:
+            return
+        self._prefetcher = FramePrefetcher(self._produce_chunk, self.prefetch_depth)
+        self._prefetcher.start()
+
+    def _produce(self, index: int):
+        """캐시 → 디코드 순으로 index 프레임을 만든다. 디코드한 프레임은 캐시에 넣는다.
+        돌려주는 PooledFrame은 호출자 몫의 참조 하나를 갖고 있다.
+        프록시 고배속 재생 중이면 프록시에서(캐시에는 넣지 않음)."""
+        if self.use_proxy and self.playing and self.speed >= self.PROXY_MIN_SPEED:
+            item = self._produce_proxy(index)
+            if item is not None:
+                return item
+        fr = self.frame_cache.get(index)
+        if fr is not None:
+            return index, fr
+        buf = self.pool.acquire(self._shape) if self._shape else None
+        with PERF.span("decode"):
+            frame = self.src.read(index, buf)
+        if frame is None:
+            if buf is not None:
+                self.pool.give_back(buf)
+            return index, None
+        gen = self._size_gen    # _to_frame보다 먼저 읽는다 (적용 쪽은 _target → _size_gen 순서)
+        with PERF.span("convert"):
+            fr = self._to_frame(frame)
+        if gen == self._size_gen:
+            self.frame_cache.put(index, fr)
+        return index, fr
+
+    def _proxy_source(self):
+        with self._proxy_lock:
+            if self._proxy_src is None and self.proxy_path:
+                try:
+                    self._proxy_src = FrameSource(self.proxy_path)
+                except RuntimeError as e:
+                    print("Proxy open error:", e)
+                    self.proxy_path = None
+            return self._proxy_src
+
+    def _produce_proxy(self, index: int):
+        """프록시에서 index 프레임. 모든 프레임이 키프레임이라 어느 위치든 디코드 한 번. 실패면 None."""
+        src = self._proxy_source()
+        if src is None:
+            return None
+        with PERF.span("decode (proxy)"):
+            frame = src.read(index)
+        if frame is None:
+            return None
+        with PERF.span("convert"):
+            fr = self._to_frame(frame)
+        fr.proxy = True
+        return index, fr
+
+    def _produce_scrub(self, target: int):
+        """scrub 미리보기: 캐시 → 프록시 → (순차 전진이 싸면) 정확히 → 키프레임 근처 순.
+        target이 속한 GOP의 키프레임 k에 대해 q ∈ [k+16, k+SCRUB_DECODE]를 보여 준다.
+        FrameSource.read('keyframe')는 k에서부터 디코드하므로(k+SEEK_BACKOFF로 seek 후 grab)
+        q-k ≤ SCRUB_DECODE 장만 디코드 → GOP 길이와 상관없는 비용."""
+        fr = self.frame_cache.get(target)
+        if fr is not None:
+            return target, fr
+        if self.use_proxy:
+            item = self._produce_proxy(target)
+            if item is not None:
+                return item
+        kf = self.keyframes
+        pos = self.src.pos
+        if kf is None or not len(kf) or 0 <= target - pos <= self.SCRUB_DECODE:
+            item = self._produce(target)
+            return item if item[1] is not None else None
+        k = int(kf[max(0, int(np.searchsorted(kf, target, side='right')) - 1)])
+        q = min(self.total_frames - 1, max(k + SEEK_BACKOFF, min(target, k + self.SCRUB_DECODE)))
+        item = self._produce(q)
+        return item if item[1] is not None else None
+
+    def _produce_chunk(self, index: int, direction: int):
+        """재생 순서대로 내보낼 프레임 목록.
+        정방향은 한 프레임, 역방향은 index가 속한 GOP 조각을 앞에서부터 한 번만 디코드해 역순으로."""
+        if direction > 0:
+            return [self._produce(index)]
+        if index < 0:
+            return [(index, None)]  # 처음에 도달
+        fr = self.frame_cache.get(index)
+        if fr is not None:
+            return [(index, fr)]
+        start = max(0, index - self._chunk + 1)
+        if self.keyframes is not None and len(self.keyframes):
+            # 조각이 키프레임 경계를 넘지 않게 → 조각마다 seek은 한 번
+            i = int(np.searchsorted(self.keyframes, index, side='right')) - 1
+            if i >= 0:
+                start = max(start, int(self.keyframes[i]))
+        items = [self._produce(f) for f in range(start, index + 1)]
+        items = [it for it in items if it[1] is not None] or [(index, None)]
+        items.reverse()
+        return items
+
+    def run(self):
+        threading.current_thread().name = "VideoThread"   # trace에 표시될 이름
+        try:
+            self.open_video()
+        except Exception as e:
+            print("Video open error:", e)
+            return
+        self._start_prefetcher()
+        pf = self._prefetcher
+        while not self.stopped:
+            if self._target_req != self._target:
+                self._apply_target_size()
+            req, self.scrub_req = self.scrub_req, None
+            if req is not None and self.seek_frame is None:
+                # 1단계(드래그 중): 빨리 만들 수 있는 근처 프레임 한 장. 선행 디코드는 멈춰 둔다
+                if pf: pf.halt()
+                item = self._produce_scrub(max(0, min(req[0], self.total_frames - 1)))
+                if item is not None:
+                    self.current_index = item[0] + 1
+                    self._showing_proxy = True   # 근사 화면 → pause 등에서 정확히 다시
+                    self.scrubReady.emit(item[1], item[0], req[1])
+                continue
+            if self.seek_frame is not None:
+                target = max(0, min(self.seek_frame, self.total_frames - 1))
+                self.seek_frame = None
+                # 버퍼에 이미 있으면(→ 한 칸 전진 등) 디코드 없이 사용
+                item = pf.claim(target) if pf else None
+                if item is None:
+                    if pf: pf.halt()
+                    item = self._produce(target)
+                    if pf: pf.restart(target + self.direction, self.direction)
+                self.current_index = target
+                if item[1] is not None:
+                    self.current_index = target + 1
+                    self._showing_proxy = item[1].proxy
+                    PERF.record("seek", self._seek_t)
+                    item[1].emitted = time.perf_counter()
+                    self.frameReady.emit(item[1], target)
+                self._anchor = None
+            if self.playing:
+                d = self.direction
+                # current_index는 '마지막 프레임 + 1' → 역방향의 다음 프레임은 -2
+                idx = self.current_index if d > 0 else self.current_index - 2
+                if pf:
+                    item = pf.take(idx, d, 0.02)
+                    if item is None:
+                        continue  # 아직 디코드 중 → 다시 시도
+                else:
+                    items = self._produce_chunk(idx, d)
+                    item = items.pop(0) if items[0][0] == idx else (idx, None)
+                    release_items(items)   # 역방향 조각의 나머지는 캐시에 남아 있음
+                if item[1] is None:
+                    self.playing = False
+                    if not self._eof_emitted:
+                        self.finished.emit()
+                        self._eof_emitted = True
+                    # 현재 위치를 끝(역방향이면 처음)으로 클램프
+                    self.current_index = self.total_frames if d > 0 else 1
+                    if self._showing_proxy:
+                        self.seek(self.current_index - 1)   # 끝 화면은 원본으로
+                    QThread.msleep(20)
+                    continue
+                show = self._pace(idx)
+                if show is None:
+                    item[1].release()
+                    continue  # 기다리는 동안 seek/pause
+                self.current_index = idx + 1
+                if not show:
+                    item[1].release()
+                    PERF.count("frames dropped")
+                else:
+                    self._showing_proxy = item[1].proxy
+                    item[1].emitted = time.perf_counter()
+                PERF.count("frames")
+                self.frameReady.emit(item[1] if show else None, idx)
+            else:
+                self._wake.wait(0.02)
+                self._wake.clear()
+        if pf:
+            pf.stop(); pf.join()
+        self.src.release()
+        if self._proxy_src:
+            self._proxy_src.release()
+
+    def _pace(self, idx: int):
+        """프레임 idx의 표시 시각(단조 시계 기준)까지 기다린다.
+        return True: 표시, False: 화면만 드롭(인덱스는 전달), None: 대기 중 seek/pause로 취소"""
+        now = time.monotonic()
+        tl = self.timeline
+        if tl is None:
+            return True
+        scale = 1.0 / (1000.0 * self.speed)
+        period = tl.span_ms(idx, idx) * scale
+        if self._anchor is None:
+            self._anchor = (now, idx)
+        if self._rate_win is None:
+            self._rate_win = [now, idx, 0]
+        t0, f0 = self._anchor
+        late = now - (t0 + abs(tl.ms(idx) - tl.ms(f0)) * scale)
+        show = True
+        if late < 0:
+            self._wake.clear()
+            self._wake.wait(-late)
+            if self.seek_frame is not None or not self.playing or self.stopped:
+                return None
+        elif late > period:
+            PERF.count("frames late")
+            if self.lag_policy == self.LAG_SLOW or late > self.MAX_LAG:
+                self._anchor = (now, idx)   # 따라잡기 포기 → 지금부터 다시 (느려짐)
+            elif now - self._last_draw < self.MIN_DRAW_INTERVAL:
+                show = False
+        if show:
+            self._last_draw = time.monotonic()
+        win = self._rate_win
+        win[2] += 0 if show else 1
+        elapsed = time.monotonic() - win[0]
+        if elapsed >= self.RATE_REPORT_S:
+            # 실제 배속 = 지나간 영상 시간 / 벽시계 시간
+            self.rateReport.emit(abs(tl.ms(idx) - tl.ms(win[1])) / 1000.0 / elapsed, self.speed, win[2])
+            self._rate_win = [time.monotonic(), idx, 0]
+        return show
+
+    def _downscale(self, bgr, tw: int, th: int):
+        """INTER_AREA는 정확히 1/2일 때만 빠르다 → 목표 이상인 동안 반씩 줄이고, 남은(2배 미만) 부분은 선형 보간."""
+        h, w = bgr.shape[:2]
+        while w // 2 >= tw and h // 2 >= th:
+            w, h = w // 2, h // 2
+            half = cv2.resize(bgr, (w, h), dst=self.pool.acquire((h, w, 3)), interpolation=cv2.INTER_AREA)
+            self.pool.give_back(bgr)
+            bgr = half
+        if (w, h) == (tw, th):
+            return bgr
+        small = cv2.resize(bgr, (tw, th), dst=self.pool.acquire((th, tw, 3)), interpolation=cv2.INTER_LINEAR)
+        self.pool.give_back(bgr)
+        return small
+
+    def _to_frame(self, bgr):
+        """디코드 버퍼를 복사 없이 QImage로 감싼다. BGR888이 없는 Qt면 풀 버퍼로 RGB 변환 한 번.
+        표시 크기가 원본보다 작으면 먼저 그 크기로 줄인다(변환/전달/QPixmap 비용이 면적만큼 감소)."""
+        tw, th = self._target or (0, 0)
+        h, w = bgr.shape[:2]
+        if 0 < tw < w and 0 < th < h:
+            bgr = self._downscale(bgr, tw, th)
+        if HAS_BGR888:
+            return PooledFrame(bgr, self.pool, QImage.Format_BGR888)
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=self.pool.acquire(bgr.shape))
+        self.pool.give_back(bgr)
+        return PooledFrame(rgb, self.pool, QImage.Format_RGB888)
+
+    @pyqtSlot()
+    def stop(self):
+        self.stopped = True
+        self.playing = False
+        self._wake.set()
+        if self._prefetcher:
+            self._prefetcher.stop()
+
+    @pyqtSlot()
+    def play(self):
+        self._anchor = None
+        self._rate_win = None
+        self.playing = True
+        if self.direction > 0 and self.total_frames > 0 and self.current_index >= self.total_frames - 1:
+            self.seek(0)
+        elif self.direction < 0 and self.current_index <= 1:
+            self.seek(self.total_frames - 1)
+        self.playing = True
+        self._wake.set()
+
+    @pyqtSlot()
+    def pause(self):
+        self.playing = False
+        if self._showing_proxy:
+            self.seek(max(0, self.current_index - 1))   # 정지 화면은 원본으로
+
+    @pyqtSlot(str)
+    def set_proxy(self, path: str):
+        with self._proxy_lock:
+            if self._proxy_src is not None:
+                self._proxy_src.release()   # (run 종료 전 교체: 다른 스레드는 lock 안에서만 접근)
+            self._proxy_src = None
+            self.proxy_path = path or None
+
+    @pyqtSlot(bool)
+    def set_use_proxy(self, on: bool):
+        """프록시를 scrub/고배속 재생에 쓸지. 꺼질 때 정지 화면이 프록시면 원본으로 다시."""
+        self.use_proxy = bool(on)
+        if not on and self._showing_proxy and not self.playing:
+            self.seek(max(0, self.current_index - 1))
+
+    @pyqtSlot(int)
+    def seek(self, frame_index: int):
+        self._seek_t = time.perf_counter()
+        self.seek_frame = frame_index
+        self._eof_emitted = False
+        self._anchor = None
+        self._wake.set()
+
+    def scrub(self, frame_index: int, t_request: float = None):
+        """slider 드래그용 빠른 미리보기 요청. 최신 것만 처리되고, 결과는 scrubReady로.
+        정확한 프레임은 드래그가 끝난 뒤 seek()으로."""
+        self.scrub_req = (int(frame_index), time.monotonic() if t_request is None else t_request)
+        self._wake.set()
+
+    @pyqtSlot(float)
+    def set_speed(self, speed: float):
+        self.speed = max(0.1, float(speed))
+        self._anchor = None
+        self._rate_win = None
+
+    @pyqtSlot(int)
+    def set_direction(self, direction: int):
+        """1: 정방향, -1: 역재생. 재생 루프/prefetch 버퍼가 다음 프레임부터 방향을 맞춘다."""
+        self.direction = -1 if direction < 0 else 1
+        self._eof_emitted = False
+        self._anchor = None
+        self._wake.set()
+
+    @pyqtSlot(str)
+    def set_lag_policy(self, policy: str):
+        """LAG_DROP: 화면 프레임을 건너뛰어 요청 배속 유지 / LAG_SLOW: 모든 프레임 표시, 대신 느려짐."""
+        self.lag_policy = self.LAG_SLOW if policy == self.LAG_SLOW else self.LAG_DROP
+
+    @pyqtSlot(int, int)
+    def set_target_size(self, w: int, h: int):
+        """VideoViewer가 알려 주는 표시 크기. 적용(캐시/선행 버퍼 폐기)은 워커 스레드가 다음 루프에서."""
+        self._target_req = (int(w), int(h))
+        self._wake.set()
+
+    def _apply_target_size(self):
+        """(워커 스레드) 새 표시 크기 적용. 이전 크기로 만든 캐시/선행 버퍼는 버리고,
+        prefetcher가 디코드 중이던 프레임은 세대 번호로 걸러진다."""
+        self._target = self._target_req
+        self._size_gen += 1
+        if self._prefetcher:
+            self._prefetcher.halt()
+        self.frame_cache.clear()
+        self.pool.clear()
+
+    def set_keyframes(self, keyframes):
+        """VideoIndexer 결과 적용 → 이후 seek부터 seek planner 사용."""
+        self.keyframes = keyframes
+        if self.src is not None:
+            self.src.keyframes = keyframes
+
+    def set_timeline(self, timeline):
+        """정확한 프레임 수/타임스탬프 적용 (VideoIndexer 결과)."""
+        self.timeline = timeline
+        self.total_frames = timeline.total_frames
+        self._anchor = None
+
+
+# ------------------------------ Thumbnails ------------------------------
+THUMB_HEIGHT = 64
+THUMB_EVERY_S = 2.0     # 썸네일 간격(초)
+THUMB_MAX = 1200        # 아주 긴 영상은 간격을 늘려 개수 제한
+
+class ThumbStrip:
+    """일정 간격으로 뽑은 작은 BGR 썸네일 묶음. frames[i] 위치의 썸네일이 thumbs[i]."""
+    SUFFIX = "thumbs.npz"
+
+    def __init__(self, frames, thumbs):
+        self.frames = np.asarray(frames, dtype=np.int64)
+        self.thumbs = thumbs    # (N, h, w, 3) uint8
+
+    def __len__(self):
+        return len(self.frames)
+
+    def nearest(self, frame: int) -> int:
+        """frame에 가장 가까운 썸네일 번호."""
+        i = int(np.searchsorted(self.frames, frame))
+        if i >= len(self.frames):
+            return len(self.frames) - 1
+        if i > 0 and frame - self.frames[i - 1] < self.frames[i] - frame:
+            return i - 1
+        return i
+
+    @staticmethod
+    def sample_frames(total_frames: int, fps: float):
+        step = max(1, int(round((fps or 30.0) * THUMB_EVERY_S)), -(-total_frames // THUMB_MAX))
+        return np.arange(0, max(0, total_frames), step, dtype=np.int64)
+
+    @classmethod
+    def load(cls, video_path: str):
+        """디스크 캐시(경로 + 크기/mtime 일치)에서 읽는다. 없으면 None."""
+        try:
+            p = _cache_path(video_path, cls.SUFFIX)
+            if not os.path.exists(p):
+                return None
+            with np.load(p) as z:
+                if list(z['sig']) != _file_sig(video_path):
+                    return None
+                return cls(z['frames'], z['thumbs'])
+        except Exception:
+            return None
+
+    def save(self, video_path: str):
+        p = _cache_path(video_path, self.SUFFIX)
+        tmp = p + ".tmp"
+        with open(tmp, 'wb') as fp:
+            np.savez(fp, frames=self.frames, thumbs=self.thumbs,
+                     sig=np.asarray(_file_sig(video_path), dtype=np.int64))
+        os.replace(tmp, p)
+
+    @classmethod
+    def build(cls, video_path: str, workers: int = 4, keyframes=None, should_stop=None, on_progress=None):
+        """샘플 프레임을 worker 수만큼 연속 구간으로 나눠, 구간마다 자기 디코더로 앞에서부터 읽는다.
+        (구간 안에서는 plan_seek가 순차 grab / 키프레임 seek을 고름)"""
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
+        w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.release()
+        frames = cls.sample_frames(total, fps)
+        if not len(frames) or w <= 0 or h <= 0:
+            return None
+        th = THUMB_HEIGHT
+        tw = max(2, int(round(w * th / h)))
+        thumbs = np.zeros((len(frames), th, tw, 3), dtype=np.uint8)
+        ok = np.zeros(len(frames), dtype=bool)
+        done = [0]
+        lock = threading.Lock()
+
+        def work(part):
+            src = FrameSource(video_path)
+            src.keyframes = keyframes
+            try:
+                for i in part:
+                    if should_stop and should_stop():
+                        return
+                    frame = src.read(int(frames[i]))
+                    if frame is None:
+                        continue
+                    while frame.shape[1] // 2 >= tw * 2:   # 큰 배율은 반씩(INTER_AREA 1/2는 빠름)
+                        frame = cv2.resize(frame, (frame.shape[1] // 2, frame.shape[0] // 2),
+                                           interpolation=cv2.INTER_AREA)
+                    thumbs[i] = cv2.resize(frame, (tw, th), interpolation=cv2.INTER_AREA)
+                    ok[i] = True
+                    with lock:
+                        done[0] += 1
+                        if on_progress:
+                            on_progress(done[0] * 100 // len(frames))
+            finally:
+                src.release()
+
+        workers = max(1, min(workers, len(frames)))
+        parts = np.array_split(np.arange(len(frames)), workers)
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            list(ex.map(work, parts))
+        if should_stop and should_stop():
+            return None
+        return cls(frames[ok], thumbs[ok])
+
+
+class ThumbnailJob(QThread):
+    """영상 하나의 ThumbStrip을 캐시에서 읽거나 worker pool로 만들어 저장한다."""
+    progress = pyqtSignal(int)
+    thumbsReady = pyqtSignal(str, object)
+
+    def __init__(self, video_path: str, workers: int = None, parent=None):
+        super().__init__(parent)
+        self.video_path = video_path
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def run(self):
+        strip = ThumbStrip.load(self.video_path)
+        if strip is None:
+            idx = VideoIndex.load(self.video_path)
+            try:
+                strip = ThumbStrip.build(self.video_path, self.workers, idx.keyframes if idx else None,
+                                         should_stop=lambda: self._stop, on_progress=self.progress.emit)
+            except Exception as e:
+                print("Thumbnail build error:", e)
+                return
+            if strip is None:
+                return
+            try:
+                strip.save(self.video_path)
+            except OSError as e:
+                print("Thumbnail save error:", e)
+        if not self._stop:
+            self.thumbsReady.emit(self.video_path, strip)
+
+
+# ------------------------------ Label Store ------------------------------
+class LabelMatrix:
+    """behavior × frame 라벨 행렬 (uint8 NumPy, 0/1).
+    구간 set/clear, 컬럼 합계, any 검사를 모두 벡터 연산으로 처리 → 영상 길이와 무관하게 빠름."""
+
+    def __init__(self, n_behaviors: int, total_frames: int):
+        self.data = np.zeros((int(n_behaviors), max(0, int(total_frames))), dtype=np.uint8)
+
+    @property
+    def n_behaviors(self) -> int:
+        return self.data.shape[0]
+
+    @property
+    def total_frames(self) -> int:
+        return self.data.shape[1]
+
+    def __len__(self):
+        return self.n_behaviors
+
+    def _span(self, s: int, e: int):
+        """[s, e] (양끝 포함, 순서 무관)를 유효 범위로 잘라 slice로. 비면 None."""
+        if e < s: s, e = e, s
+        s, e = max(0, int(s)), min(self.total_frames - 1, int(e))
+        return slice(s, e + 1) if s <= e else None
+
+    def set_range(self, bi: int, s: int, e: int, value: int = 1):
+        sl = self._span(s, e)
+        if sl is not None:
+            self.data[bi, sl] = 1 if value else 0
+
+    def clear_range(self, bi: int, s: int, e: int):
+        self.set_range(bi, s, e, 0)
+
+    def set_rows(self, frames, values):
+        """frames[k] 프레임의 전체 behavior 값을 values[k]로 (import용 일괄 대입)."""
+        frames = np.asarray(frames, dtype=np.int64)
+        if frames.size:
+            self.data[:, frames] = (np.asarray(values, dtype=np.uint8).reshape(frames.size, -1) != 0).T
+
+    def get(self, bi: int, f: int) -> int:
+        return int(self.data[bi, f])
+
+    def any(self, bi: int) -> bool:
+        return bool(self.data[bi].any())
+
+    def totals(self):
+        """behavior별 라벨 프레임 수."""
+        return np.count_nonzero(self.data, axis=1).tolist()
+
+    def block(self, start: int, stop: int):
+        """프레임 [start, stop) 구간의 (n_behaviors, stop-start) view."""
+        return self.data[:, start:stop]
+
+    def row(self, bi: int, start: int, stop: int):
+        return self.data[bi, start:stop]
+
+    def bout_table(self, bi: int):
+        """(count, 2) int64 [start, end] 표."""
+        b = BoutList.from_row(self.data[bi])
+        return np.stack([np.frombuffer(b.starts, np.int64), np.frombuffer(b.ends, np.int64)], axis=1)
+
+    def resized(self, total_frames: int):
+        """프레임 수를 total_frames로 맞춘 새 행렬(넘치는 뒤쪽은 버리고 모자라면 0)."""
+        m = LabelMatrix(self.n_behaviors, total_frames)
+        k = min(total_frames, self.total_frames)
+        m.data[:, :k] = self.data[:, :k]
+        return m
+
+    def copy(self):
+        m = LabelMatrix(0, 0)
+        m.data = self.data.copy()
+        return m
+
+
+class BoutList:
+    """한 behavior의 bout 목록: 정렬·병합된 [start, end] (양끝 포함) 구간.
+    starts/ends는 int64 array → bisect로 조회 O(log n), bout당 16바이트."""
+
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.total = 0  # 라벨 프레임 수(유지 관리)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, s: int, e: int):
+        # [s-1, e+1]과 겹치거나 맞닿은 bout들을 하나로 병합
+        i = bisect.bisect_left(self.ends, s - 1)
+        j = bisect.bisect_right(self.starts, e + 1)
+        if i < j:
+            s, e = min(s, self.starts[i]), max(e, self.ends[j - 1])
+            self.total -= sum(self.ends[k] - self.starts[k] + 1 for k in range(i, j))
+        self.starts[i:j] = array('q', (s,))
+        self.ends[i:j] = array('q', (e,))
+        self.total += e - s + 1
+
+    def remove(self, s: int, e: int):
+        i = bisect.bisect_left(self.ends, s)
+        j = bisect.bisect_right(self.starts, e)
+        if i >= j:
+            return
+        ns, ne = array('q'), array('q')
+        if self.starts[i] < s:  # 왼쪽 자투리
+            ns.append(self.starts[i]); ne.append(s - 1)
+        if self.ends[j - 1] > e:  # 오른쪽 자투리
+            ns.append(e + 1); ne.append(self.ends[j - 1])
+        self.total -= sum(self.ends[k] - self.starts[k] + 1 for k in range(i, j))
+        self.total += sum(b - a + 1 for a, b in zip(ns, ne))
+        self.starts[i:j] = ns
+        self.ends[i:j] = ne
+
+    def contains(self, f: int) -> bool:
+        i = bisect.bisect_right(self.starts, f) - 1
+        return i >= 0 and self.ends[i] >= f
+
+    def next_after(self, f: int):
+        """f 이후에 시작하는 첫 bout (start, end), 없으면 None."""
+        i = bisect.bisect_right(self.starts, f)
+        return (self.starts[i], self.ends[i]) if i < len(self.starts) else None
+
+    def fill(self, out, start: int):
+        """out(길이 m) = 프레임 [start, start+m)의 0/1."""
+        stop = start + len(out)
+        i = bisect.bisect_right(self.ends, start - 1)
+        while i < len(self.starts) and self.starts[i] < stop:
+            out[max(self.starts[i], start) - start: min(self.ends[i] + 1, stop) - start] = 1
+            i += 1
+
+    @classmethod
+    def from_row(cls, row):
+        b = cls()
+        d = np.diff(np.concatenate(([0], (np.asarray(row) != 0).astype(np.int8), [0])))
+        st, en = np.flatnonzero(d == 1), np.flatnonzero(d == -1) - 1
+        b.starts = array('q', st.tolist())
+        b.ends = array('q', en.tolist())
+        b.total = int((en - st + 1).sum())
+        return b
+
+
+class BoutLabels:
+    """behavior별 BoutList 묶음. LabelMatrix와 같은 인터페이스(set_range/get/any/totals/block)를 제공하고
+    '프레임 f에서 활성인 behavior', '다음 bout', '총 프레임'을 로그 시간에 답한다.
+    per-frame 행렬(import/export용)과는 to_matrix/from_matrix로 손실 없이 변환."""
+
+    def __init__(self, n_behaviors: int, total_frames: int):
+        self.total_frames = max(0, int(total_frames))
+        self.lanes = [BoutList() for _ in range(int(n_behaviors))]
+
+    @property
+    def n_behaviors(self) -> int:
+        return len(self.lanes)
+
+    def __len__(self):
+        return self.n_behaviors
+
+    def set_range(self, bi: int, s: int, e: int, value: int = 1):
+        if e < s: s, e = e, s
+        s, e = max(0, int(s)), min(self.total_frames - 1, int(e))
+        if s > e:
+            return
+        if value:
+            self.lanes[bi].add(s, e)
+        else:
+            self.lanes[bi].remove(s, e)
+
+    def clear_range(self, bi: int, s: int, e: int):
+        self.set_range(bi, s, e, 0)
+
+    def get(self, bi: int, f: int) -> int:
+        return 1 if self.lanes[bi].contains(f) else 0
+
+    def any(self, bi: int) -> bool:
+        return len(self.lanes[bi]) > 0
+
+    def totals(self):
+        return [lane.total for lane in self.lanes]
+
+    def active_at(self, f: int):
+        """프레임 f에서 라벨이 켜진 behavior 인덱스 목록."""
+        return [bi for bi, lane in enumerate(self.lanes) if lane.contains(f)]
+
+    def next_bout(self, bi: int, f: int):
+        return self.lanes[bi].next_after(f)
+
+    def bouts(self, bi: int):
+        lane = self.lanes[bi]
+        return list(zip(lane.starts, lane.ends))
+
+    def block(self, start: int, stop: int):
+        """프레임 [start, stop) 구간을 (n_behaviors, stop-start) uint8 배열로 materialize."""
+        start, stop = max(0, start), min(self.total_frames, stop)
+        out = np.zeros((self.n_behaviors, max(0, stop - start)), dtype=np.uint8)
+        for bi, lane in enumerate(self.lanes):
+            lane.fill(out[bi], start)
+        return out
+
+    def row(self, bi: int, start: int, stop: int):
+        out = np.zeros(max(0, min(self.total_frames, stop) - start), dtype=np.uint8)
+        self.lanes[bi].fill(out, start)
+        return out
+
+    def bout_table(self, bi: int):
+        lane = self.lanes[bi]
+        return np.stack([np.frombuffer(lane.starts, np.int64), np.frombuffer(lane.ends, np.int64)], axis=1)
+
+    @classmethod
+    def from_bout_tables(cls, tables, total_frames: int):
+        """bout_table() 목록 → BoutLabels (사이드카 로드용, 행렬을 거치지 않음)."""
+        b = cls(0, total_frames)
+        for t in tables:
+            t = np.asarray(t, dtype=np.int64).reshape(-1, 2)
+            lane = BoutList()
+            lane.starts = array('q', t[:, 0].tobytes())
+            lane.ends = array('q', t[:, 1].tobytes())
+            lane.total = int((t[:, 1] - t[:, 0] + 1).sum())
+            b.lanes.append(lane)
+        return b
+
+    def resized(self, total_frames: int):
+        """프레임 수를 total_frames로 맞춘 새 BoutLabels (넘치는 bout은 잘라낸다)."""
+        tables = []
+        for bi in range(self.n_behaviors):
+            t = self.bout_table(bi)
+            t = t[t[:, 0] < total_frames]
+            if len(t):
+                t[-1, 1] = min(t[-1, 1], total_frames - 1)
+            tables.append(t)
+        return BoutLabels.from_bout_tables(tables, total_frames)
+
+    def copy(self):
+        """백그라운드 작업용 스냅샷."""
+        b = BoutLabels(0, self.total_frames)
+        for lane in self.lanes:
+            c = BoutList()
+            c.starts, c.ends, c.total = array('q', lane.starts), array('q', lane.ends), lane.total
+            b.lanes.append(c)
+        return b
+
+    def to_matrix(self) -> LabelMatrix:
+        m = LabelMatrix(self.n_behaviors, self.total_frames)
+        m.data[:] = self.block(0, self.total_frames)
+        return m
+
+    @classmethod
+    def from_matrix(cls, m: LabelMatrix):
+        b = cls(0, m.total_frames)
+        b.lanes = [BoutList.from_row(m.data[bi]) for bi in range(m.n_behaviors)]
+        return b
+
+
+# ------------------------------ Label CSV Export ------------------------------
+def format_label_rows(start: int, block, eol: bytes = b"\n") -> bytes:
+    """프레임 start부터의 라벨 block(n_behaviors × m, 0/1)을 'f,0,1,...' CSV 행 바이트로.
+    프레임 번호 자릿수가 같은 구간끼리 고정폭 uint8 행렬을 채워 한 번에 tobytes()."""
+    n, m = block.shape
+    out = []
+    f0, end = start, start + m
+    while f0 < end:
+        digits = len(str(f0))
+        f1 = min(end, 10 ** digits)
+        fr = np.arange(f0, f1, dtype=np.int64)
+        buf = np.empty((f1 - f0, digits + 2 * n + len(eol)), dtype=np.uint8)
+        for k in range(digits):
+            buf[:, digits - 1 - k] = fr // 10 ** k % 10 + 48
+        buf[:, digits:digits + 2 * n:2] = ord(',')
+        buf[:, digits + 1:digits + 2 * n:2] = (block[:, f0 - start:f1 - start] != 0).T + 48
+        buf[:, digits + 2 * n:] = np.frombuffer(eol, dtype=np.uint8)
+        out.append(buf.tobytes())
+        f0 = f1
+    return b"".join(out)
+
+
+class LabelExportWorker(QThread):
+    """라벨 CSV를 백그라운드에서 청크 단위로 기록. 임시 파일에 쓰고 끝나면 원자적으로 교체한다."""
+    progress = pyqtSignal(int)   # 0..100
+    CHUNK = 1 << 16              # 청크당 프레임 수
+
+    def __init__(self, path: str, header_lines, labels, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.header_lines = list(header_lines)
+        self.labels = labels     # 스냅샷(copy)을 넘길 것
+        self.cancelled = False
+        self.error = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        # 텍스트 모드('w')로 쓰던 기존 CSV와 같은 줄바꿈 유지
+        eol = os.linesep.encode()
+        tmp = self.path + ".part"
+        try:
+            with open(tmp, 'wb', buffering=1 << 20) as fp:
+                for ln in self.header_lines:
+                    fp.write(ln.encode('utf-8') + eol)
+                total = self.labels.total_frames
+                for start in range(0, total, self.CHUNK):
+                    if self.cancelled:
+                        break
+                    stop = min(total, start + self.CHUNK)
+                    fp.write(format_label_rows(start, self.labels.block(start, stop), eol))
+                    self.progress.emit(int(stop * 100 / total))
+            if self.cancelled:
+                os.remove(tmp)
+            else:
+                os.replace(tmp, self.path)
+        except Exception as e:
+            self.error = str(e)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+# ------------------------------ Label CSV Import ------------------------------
+READ_CHUNK_BYTES = 8 << 20  # 스트리밍 파싱 청크 크기
+
+def _parse_label_chunk(data: bytes, n: int):
+    """CSV 데이터 청크(줄 단위로 끝남) → (frames int64[k], flags uint8[k, n]).
+    내보내기 형식('f,0,1,...')이면 바이트 배열 위에서 전부 벡터 연산으로,
+    그 외(공백, 빈 셀, 숫자 아닌 값 등)는 행 단위로 기존 규칙대로(셀이 '1'일 때만 1) 처리한다."""
+    a = np.frombuffer(data, dtype=np.uint8)
+    nl = np.flatnonzero(a == 10)
+    starts = np.concatenate(([0], nl[:-1] + 1))
+    ends = nl.copy()
+    cr = (ends > starts) & (a[np.maximum(ends - 1, 0)] == 13)
+    ends[cr] -= 1
+    keep = ends > starts  # 빈 줄 제외
+    starts, ends = starts[keep], ends[keep]
+    num_end = ends - 2 * n  # 프레임 번호의 끝(배타)
+    if len(starts) and (num_end > starts).all() and (num_end - starts).max() <= 18:
+        cols = num_end[:, None] + np.arange(n) * 2
+        commas, cells = a[cols], a[cols + 1]
+        if (commas == 44).all() and ((cells == 48) | (cells == 49)).all():
+            nd = num_end - starts
+            frames = np.zeros(len(starts), dtype=np.int64)
+            ok = True
+            for d in range(int(nd.max())):
+                m = nd > d
+                ch = a[num_end[m] - 1 - d].astype(np.int64) - 48
+                if ((ch < 0) | (ch > 9)).any():
+                    ok = False
+                    break
+                frames[m] += ch * 10 ** d
+            if ok:
+                return frames, (cells == 49).astype(np.uint8)
+    frames, flags = [], []
+    for ln in data.split(b"\n"):
+        ln = ln.strip()
+        if not ln:
+            continue
+        parts = ln.split(b',')
+        try:
+            f = int(parts[0])
+        except ValueError:
+            continue
+        frames.append(f)
+        flags.append([1 if 1+i < len(parts) and parts[1+i].strip() == b'1' else 0 for i in range(n)])
+    return np.asarray(frames, np.int64), np.asarray(flags, np.uint8).reshape(-1, n)
+
+
+def read_label_csv(path: str, total_frames: int = None, should_stop=None, on_progress=None):
+    """라벨 CSV를 청크 단위로 스트리밍 파싱해 LabelMatrix로 바로 채운다.
+    total_frames를 주면 범위를 벗어난 프레임 행은 건너뛰고 개수만 센다(없으면 최대 프레임+1로 크기 결정).
+    return dict(video, fps, behaviors, labels, skipped, rows) / 헤더가 없으면 ValueError, 중단 시 None."""
+    size = max(1, os.path.getsize(path))
+    info = {'video': None, 'fps': None}
+    with open(path, 'rb') as fp:
+        # 헤더 구간: 'Frame,...' 줄까지 메타 행을 읽는다
+        header = None
+        for ln in fp:
+            text = ln.decode('utf-8').strip()
+            key = text.split(',', 1)[0].strip().lower()
+            if key == "frame":
+                header = [h.strip() for h in text.split(',')]
+                break
+            if key == "video name":
+                info['video'] = text.split(',', 1)[1] if ',' in text else ""
+            elif key == "video fps":
+                try:
+                    info['fps'] = float(text.split(',', 1)[1])
+                except (IndexError, ValueError):
+                    pass
+        if not header:
+            raise ValueError("No header 'Frame,...' found.")
+        behs = header[1:]
+        n = len(behs)
+        mat = LabelMatrix(n, total_frames) if total_frames is not None else None
+        parts, skipped, rows = [], 0, 0
+        while True:
+            if should_stop and should_stop():
+                return None
+            chunk = fp.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            chunk += fp.readline()  # 줄 경계에서 자르기
+            if not chunk.endswith(b"\n"):
+                chunk += b"\n"
+            frames, flags = _parse_label_chunk(chunk, n)
+            rows += len(frames)
+            if mat is not None:
+                ok = (frames >= 0) & (frames < total_frames)
+                skipped += int(len(frames) - np.count_nonzero(ok))
+                mat.set_rows(frames[ok], flags[ok])
+            else:
+                ok = frames >= 0
+                skipped += int(len(frames) - np.count_nonzero(ok))
+                parts.append((frames[ok], flags[ok]))
+            if on_progress:
+                on_progress(int(fp.tell() * 100 / size))
+    if mat is None:
+        last = max((int(f.max()) for f, _ in parts if len(f)), default=-1)
+        mat = LabelMatrix(n, last + 1)
+        for f, v in parts:
+            mat.set_rows(f, v)
+    info.update(behaviors=behs, labels=mat, skipped=skipped, rows=rows)
+    return info
+
+
+class LabelImportWorker(QThread):
+    """read_label_csv를 GUI 스레드 밖에서 실행."""
+    progress = pyqtSignal(int)
+
+    def __init__(self, path: str, total_frames: int, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.total_frames = total_frames
+        self.cancelled = False
+        self.result = None
+        self.error = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            self.result = read_label_csv(self.path, self.total_frames,
+                                         should_stop=lambda: self.cancelled,
+                                         on_progress=self.progress.emit)
+        except Exception as e:
+            self.error = str(e)
+
+
+# ------------------------------ Binary Label Sidecar (.mbti) ------------------------------
+# 레이아웃:  b"MBTI" | u16 version | u16 0 | u32 header_len | header JSON
+#            | (4096 정렬) 라벨 컬럼 uint8 [n_behaviors × total_frames] (memmap 가능)
+#            | (8 정렬) behavior별 bout 표 int64 [count × 2]
+SIDECAR_MAGIC = b"MBTI"
+SIDECAR_VERSION = 1
+_SIDECAR_HEAD = struct.Struct("<4sHHI")
+
+def label_sidecar_path(video_path: str) -> str:
+    return os.path.splitext(video_path)[0] + ".mbti"
+
+def _align(x: int, a: int) -> int:
+    return (x + a - 1) // a * a
+
+def _sidecar_layout(header_len: int, n: int, total_frames: int):
+    cols = _align(_SIDECAR_HEAD.size + header_len, 4096)
+    bouts = _align(cols + n * total_frames, 8)
+    return cols, bouts
+
+def write_label_sidecar(path: str, video: str, fps: float, behaviors, labels):
+    """labels(BoutLabels/LabelMatrix)를 .mbti로 저장. 임시 파일에 쓰고 원자적으로 교체."""
+    n, total = len(behaviors), labels.total_frames
+    tables = [labels.bout_table(bi) for bi in range(n)]
+    header = json.dumps({'video': video, 'fps': fps, 'total_frames': total,
+                         'behaviors': list(behaviors),
+                         'bout_counts': [len(t) for t in tables]}).encode('utf-8')
+    cols, bouts = _sidecar_layout(len(header), n, total)
+    tmp = path + ".part"
+    try:
+        with open(tmp, 'wb', buffering=1 << 20) as fp:
+            fp.write(_SIDECAR_HEAD.pack(SIDECAR_MAGIC, SIDECAR_VERSION, 0, len(header)))
+            fp.write(header)
+            fp.write(b"\0" * (cols - fp.tell()))
+            step = 1 << 22
+            for bi in range(n):
+                for start in range(0, total, step):
+                    fp.write(labels.row(bi, start, start + step).tobytes())
+            fp.write(b"\0" * (bouts - fp.tell()))
+            for t in tables:
+                fp.write(np.ascontiguousarray(t, dtype='<i8').tobytes())
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def read_label_sidecar(path: str):
+    """.mbti를 연다. 라벨은 bout 표에서 바로 BoutLabels로(행렬 변환 없음),
+    컬럼은 필요할 때만 읽히는 read-only memmap으로 돌려준다.
+    return dict(video, fps, total_frames, behaviors, labels, columns)"""
+    with open(path, 'rb') as fp:
+        head = fp.read(_SIDECAR_HEAD.size)
+        if len(head) < _SIDECAR_HEAD.size:
+            raise ValueError("Not an MBTI label file.")
+        magic, version, _, hlen = _SIDECAR_HEAD.unpack(head)
+        if magic != SIDECAR_MAGIC or version > SIDECAR_VERSION:
+            raise ValueError("Not an MBTI label file (or written by a newer version).")
+        meta = json.loads(fp.read(hlen).decode('utf-8'))
+        n, total = len(meta['behaviors']), int(meta['total_frames'])
+        cols, bouts = _sidecar_layout(hlen, n, total)
+        fp.seek(bouts)
+        tables = [np.frombuffer(fp.read(c * 16), dtype='<i8').reshape(-1, 2) for c in meta['bout_counts']]
+    columns = (np.memmap(path, dtype=np.uint8, mode='r', offset=cols, shape=(n, total))
+               if n and total else np.zeros((n, total), np.uint8))
+    meta.update(labels=BoutLabels.from_bout_tables(tables, total), columns=columns)
+    return meta
+
+
+# ------------------------------ Label Journal (crash recovery) ------------------------------
+# <stem>.mbti-journal: 고정 길이 레코드를 append만 한다 (이벤트당 os.write 1회, fsync는 타이머로 묶어 백그라운드에서).
+# 압축은 저장되지 않은 상태를 <stem>.mbti-autosave 스냅샷으로 쓴다 (저장된 <stem>.mbti는 건드리지 않음).
+# 로드 순서: 저장본(DB/<stem>.mbti) → <stem>.mbti-autosave → <stem>.mbti-journal.old(압축 중이던 것) → <stem>.mbti-journal
+# 모든 이벤트는 절대값(set/clear 범위)이라 같은 레코드를 다시 적용해도 결과가 같다.
+JOURNAL_COMPACT_BYTES = 1 << 20
+JOURNAL_SYNC_MS = 500
+
+def label_journal_path(video_path: str) -> str:
+    return os.path.splitext(video_path)[0] + ".mbti-journal"
+
+def label_autosave_path(video_path: str) -> str:
+    return os.path.splitext(video_path)[0] + ".mbti-autosave"
+
+class LabelJournal:
+    OP_BEHAVIORS, OP_SET, OP_CLEAR, OP_RESET = 0, 1, 2, 3
+    REC = struct.Struct("<BBHqq")   # op, behavior, 0, start|payload_len, end|total_frames
+    _syncer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-sync")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.old_path = path + ".old"
+        self.autosave_path = os.path.splitext(path)[0] + ".mbti-autosave"
+        self.fd = None
+        self.behaviors = []
+        self.total_frames = 0
+        self._dirty = False
+        self._lock = threading.Lock()   # fsync(백그라운드) ↔ close(GUI)
+        self._pending = None
+        self._armed = False             # open() 후 close() 전: 첫 라벨 기록 때 파일을 만든다
+        self._reset_pending = False     # 파일을 만들기 전에 들어온 reset 선언
+
+    # ---------- writing ----------
+    def open(self, behaviors, total_frames: int, valid_bytes=None):
+        """append용으로 연다. 파일이 없으면 첫 라벨 기록 때 만든다 (열어 보기만 한 영상 옆에 빈 저널을 남기지 않음).
+        이미 있으면 valid_bytes 뒤의 깨진 꼬리를 잘라낸다."""
+        self.behaviors, self.total_frames = list(behaviors), total_frames
+        self._armed, self._reset_pending = True, False
+        if not os.path.exists(self.path):
+            return
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | getattr(os, 'O_BINARY', 0))
+        if valid_bytes is not None and os.fstat(self.fd).st_size > valid_bytes:
+            os.ftruncate(self.fd, valid_bytes)
+        if self.size() == 0:   # 남아 있던 빈 저널 → 정리하고 다시 지연 생성
+            os.close(self.fd)
+            self.fd = None
+            os.remove(self.path)
+
+    def _create(self):
+        """첫 라벨 기록: 파일을 만들고 현재 behavior 선언을 머리에 쓴다."""
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_BINARY', 0), 0o644)
+        reset, self._reset_pending = self._reset_pending, False
+        self._write(self._declaration(reset))
+
+    def _write(self, b: bytes):
+        if self.fd is None:
+            return
+        os.write(self.fd, b)
+        self._dirty = True
+
+    def _declaration(self, reset: bool) -> bytes:
+        payload = json.dumps(self.behaviors).encode('utf-8')
+        op = self.OP_RESET if reset else self.OP_BEHAVIORS
+        return self.REC.pack(op, 0, 0, len(payload), self.total_frames) + payload
+
+    def declare(self, behaviors, total_frames: int, reset: bool = False):
+        """behavior 목록 기록. reset=True면 재생 시 라벨을 비운다(define_behaviors).
+        파일이 아직 없으면 첫 라벨 기록 때 함께 쓴다."""
+        self.behaviors, self.total_frames = list(behaviors), total_frames
+        if self.fd is None:
+            self._reset_pending = self._reset_pending or reset
+            return
+        self._write(self._declaration(reset))
+
+    def set_range(self, bi: int, s: int, e: int, value: int = 1):
+        if self.fd is None:
+            if not self._armed:
+                return
+            self._create()
+        self._write(self.REC.pack(self.OP_SET if value else self.OP_CLEAR, bi, 0, s, e))
+
+    def size(self) -> int:
+        return os.fstat(self.fd).st_size if self.fd is not None else 0
+
+    def sync(self):
+        with self._lock:
+            if self.fd is not None and self._dirty:
+                self._dirty = False   # fsync 중에 들어온 기록은 다음 sync가 맡는다
+                os.fsync(self.fd)
+
+    def sync_in_background(self):
+        """fsync를 전용 스레드에 맡긴다 (GUI 스레드는 append만). 이전 sync가 진행 중이면 건너뜀."""
+        if not self._dirty or (self._pending and not self._pending.done()):
+            return
+        self._pending = self._syncer.submit(self._sync_logged)
+
+    def _sync_logged(self):
+        try:
+            self.sync()
+        except OSError as e:
+            print("Journal sync error:", e)
+
+    def close(self, sync: bool = True):
+        with self._lock:
+            self._armed = False
+            if self.fd is None:
+                return
+            if sync and self._dirty:
+                os.fsync(self.fd)
+            os.close(self.fd)
+            self.fd = None
+            self._dirty = False
+
+    def rotate(self) -> str:
+        """현재 저널을 .old로 넘기고 새 저널을 시작. 이전 .old가 남아 있으면 뒤에 이어 붙인다.
+        .old의 fsync는 LabelCompactor가 한다."""
+        self.close(sync=False)
+        if not os.path.exists(self.path):
+            pass   # 마지막 회전 뒤 라벨 기록 없음
+        elif os.path.exists(self.old_path):
+            with open(self.path, 'rb') as src, open(self.old_path, 'ab') as dst:
+                dst.write(src.read())
+                dst.flush(); os.fsync(dst.fileno())
+            os.remove(self.path)
+        elif os.path.exists(self.path):
+            os.replace(self.path, self.old_path)
+        self.open(self.behaviors, self.total_frames)
+        return self.old_path
+
+    def truncate(self):
+        """저장했거나 변경을 버렸을 때: 저널을 비우고 .old와 autosave 스냅샷 삭제."""
+        self.discard()
+        self.open(self.behaviors, self.total_frames)
+
+    def discard(self):
+        self.close(sync=False)
+        for p in (self.path, self.old_path, self.autosave_path):
+            if os.path.exists(p):
+                os.remove(p)
+
+    # ---------- replay ----------
+    @classmethod
+    def has_events(cls, path: str) -> bool:
+        """저널에 라벨 기록(set/clear)이 하나라도 있는지. behavior 선언만 있으면 False."""
+        try:
+            with open(path, 'rb') as fp:
+                while True:
+                    head = fp.read(cls.REC.size)
+                    if len(head) < cls.REC.size:
+                        return False
+                    op, _, _, a, _ = cls.REC.unpack(head)
+                    if op in (cls.OP_SET, cls.OP_CLEAR):
+                        return True
+                    if op not in (cls.OP_BEHAVIORS, cls.OP_RESET):
+                        return False
+                    fp.seek(a, os.SEEK_CUR)
+        except OSError:
+            return False
+
+    @classmethod
+    def replay(cls, path: str, behaviors, labels, total_frames: int):
+        """저널을 labels에 적용. return (behaviors, labels, events, valid_bytes)
+        잘린 꼬리(쓰다 만 레코드)는 무시한다."""
+        with open(path, 'rb') as fp:
+            data = fp.read()
+        rec, pos, events = cls.REC, 0, 0
+        behaviors = list(behaviors)
+        while pos + rec.size <= len(data):
+            op, bi, _, a, b = rec.unpack_from(data, pos)
+            nxt = pos + rec.size
+            if op in (cls.OP_BEHAVIORS, cls.OP_RESET):
+                if nxt + a > len(data):
+                    break
+                try:
+                    names = json.loads(data[nxt:nxt + a].decode('utf-8'))
+                except ValueError:
+                    break
+                nxt += a
+                if op == cls.OP_RESET or names != behaviors or labels is None:
+                    behaviors, labels = names, BoutLabels(len(names), max(total_frames, b))
+                elif b > labels.total_frames:   # 정확한 프레임 수로 늘어난 경우
+                    labels = labels.resized(b)
+            elif op in (cls.OP_SET, cls.OP_CLEAR) and labels is not None and bi < labels.n_behaviors:
+                labels.set_range(bi, a, b, 1 if op == cls.OP_SET else 0)
+                events += 1
+            elif op not in (cls.OP_SET, cls.OP_CLEAR):
+                break   # 알 수 없는 레코드 → 손상으로 보고 여기서 멈춤
+            pos = nxt
+        return behaviors, labels, events, pos
+
+
+class LabelCompactor(QThread):
+    """회전된 저널(.old)을 autosave 스냅샷에 접어 넣고 지운다."""
+    def __init__(self, autosave_path: str, old_journal: str, video: str, fps: float, behaviors, labels, parent=None):
+        super().__init__(parent)
+        self.autosave_path = autosave_path
+        self.old_journal = old_journal
+        self.video, self.fps = video, fps
+        self.behaviors = list(behaviors)
+        self.labels = labels
+        self.error = None
+
+    def run(self):
+        try:
+            if os.path.exists(self.old_journal):   # 스냅샷이 완성될 때까지는 .old가 복구 근거
+                with open(self.old_journal, 'rb+') as fp:
+                    os.fsync(fp.fileno())
+            write_label_sidecar(self.autosave_path, self.video, self.fps, self.behaviors, self.labels)
+            if os.path.exists(self.old_journal):
+                os.remove(self.old_journal)
+        except Exception as e:
+            self.error = str(e)
+
+
+# ------------------------------ Project Store (SQLite) ------------------------------
+PROJECT_DB_NAME = "mbti_project.sqlite"
+
+class ProjectStore:
+    """영상 폴더 하나의 라벨 DB. 영상별 현재 bout 상태(프레임 + 실제 시각 ms)와 녹화 세션 기록.
+    bouts는 (video, behavior, start) 인덱스로, 영상 간 시간 구간 질의는 (behavior, start_ms) 인덱스로."""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS videos(
+            id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL,
+            fps REAL, total_frames INTEGER, duration_ms REAL, updated REAL);
+        CREATE TABLE IF NOT EXISTS behaviors(
+            id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+        CREATE TABLE IF NOT EXISTS video_behaviors(
+            video_id INTEGER NOT NULL REFERENCES videos(id), position INTEGER NOT NULL,
+            behavior_id INTEGER NOT NULL REFERENCES behaviors(id), PRIMARY KEY (video_id, position));
+        CREATE TABLE IF NOT EXISTS sessions(
+            id INTEGER PRIMARY KEY, video_id INTEGER NOT NULL REFERENCES videos(id),
+            started REAL, ended REAL, start_frame INTEGER, end_frame INTEGER);
+        CREATE TABLE IF NOT EXISTS bouts(
+            video_id INTEGER NOT NULL REFERENCES videos(id), behavior_id INTEGER NOT NULL REFERENCES behaviors(id),
+            start INTEGER NOT NULL, end INTEGER NOT NULL, start_ms REAL, end_ms REAL);
+        CREATE INDEX IF NOT EXISTS bouts_video_behavior_start ON bouts(video_id, behavior_id, start);
+        CREATE INDEX IF NOT EXISTS bouts_behavior_time ON bouts(behavior_id, start_ms);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+
+    @classmethod
+    def for_folder(cls, folder: str):
+        return cls(os.path.join(folder, PROJECT_DB_NAME))
+
+    def close(self):
+        self.db.close()
+
+    def _id(self, table: str, name: str) -> int:
+        row = self.db.execute(f"SELECT id FROM {table} WHERE name=?", (name,)).fetchone()
+        if row:
+            return row[0]
+        return self.db.execute(f"INSERT INTO {table}(name) VALUES (?)", (name,)).lastrowid
+
+    def save_labels(self, video: str, fps: float, behaviors, labels, timeline):
+        """영상의 behavior 목록과 bout 전체를 한 트랜잭션으로 교체."""
+        with self.db:
+            vid = self._id("videos", video)
+            self.db.execute("UPDATE videos SET fps=?, total_frames=?, duration_ms=?, updated=? WHERE id=?",
+                            (fps, labels.total_frames, timeline.duration_ms(), time.time(), vid))
+            bids = [self._id("behaviors", name) for name in behaviors]
+            self.db.execute("DELETE FROM video_behaviors WHERE video_id=?", (vid,))
+            self.db.executemany("INSERT INTO video_behaviors VALUES (?,?,?)",
+                                [(vid, pos, bid) for pos, bid in enumerate(bids)])
+            self.db.execute("DELETE FROM bouts WHERE video_id=?", (vid,))
+            self.db.executemany("INSERT INTO bouts VALUES (?,?,?,?,?,?)",
+                                ((vid, bid, int(s), int(e), timeline.ms(int(s)), timeline.ms(int(e) + 1))
+                                 for bi, bid in enumerate(bids) for s, e in labels.bout_table(bi)))
+
+    def load_labels(self, video: str):
+        """read_label_sidecar와 같은 모양의 dict (+ updated: 저장 시각). 이 영상이 없으면 None."""
+        row = self.db.execute("SELECT id, fps, total_frames, updated FROM videos WHERE name=?", (video,)).fetchone()
+        if not row:
+            return None
+        vid, fps, total, updated = row
+        beh = self.db.execute("SELECT b.id, b.name FROM video_behaviors vb JOIN behaviors b ON b.id = vb.behavior_id "
+                              "WHERE vb.video_id=? ORDER BY vb.position", (vid,)).fetchall()
+        tables = [np.asarray(self.db.execute("SELECT start, end FROM bouts WHERE video_id=? AND behavior_id=? "
+                                             "ORDER BY start", (vid, bid)).fetchall(), dtype=np.int64)
+                  for bid, _ in beh]
+        return {'video': video, 'fps': fps, 'total_frames': total, 'behaviors': [n for _, n in beh],
+                'labels': BoutLabels.from_bout_tables(tables, total), 'updated': updated or 0.0}
+
+    def add_session(self, video: str, start_frame: int, end_frame: int, started: float, ended: float):
+        with self.db:
+            self.db.execute("INSERT INTO sessions(video_id, started, ended, start_frame, end_frame) VALUES (?,?,?,?,?)",
+                            (self._id("videos", video), started, ended, start_frame, end_frame))
+
+    def query_bouts(self, behavior: str = None, start_s: float = None, end_s: float = None, video: str = None):
+        """[start_s, end_s) 구간과 겹치는 bout 목록. return [(video, behavior, start, end, start_s, end_s)]"""
+        where, args = [], []
+        if behavior is not None:
+            where.append("b.name=?"); args.append(behavior)
+        if video is not None:
+            where.append("v.name=?"); args.append(video)
+        if end_s is not None:
+            where.append("bt.start_ms < ?"); args.append(end_s * 1000.0)
+        if start_s is not None:
+            where.append("bt.end_ms > ?"); args.append(start_s * 1000.0)
+        sql = ("SELECT v.name, b.name, bt.start, bt.end, bt.start_ms / 1000.0, bt.end_ms / 1000.0 FROM bouts bt "
+               "JOIN videos v ON v.id = bt.video_id JOIN behaviors b ON b.id = bt.behavior_id")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self.db.execute(sql + " ORDER BY v.name, b.name, bt.start", args).fetchall()
+
+
+# ------------------------------ Inter-rater Reliability ------------------------------
+RELIABILITY_TOLERANCE = 15   # bout onset/offset 일치 허용 오차(프레임)
+RELIABILITY_HEADER = ["Video", "Behavior", "Raters", "Frames", "Agreement", "Cohen's kappa",
+                      "Fleiss' kappa", "Onset match", "Offset match", "Bout match", "Bouts per rater"]
+
+def _rater_masks(tables, total: int):
+    """rater별 bout 표 → 프레임 구간별 '켜진 rater 비트마스크'의 길이 히스토그램 (길이 2**R).
+    프레임 행렬을 만들지 않고 구간 경계만 정렬해 훑으므로 영상 길이와 무관하게 bout 수에 비례."""
+    pos, w = [np.zeros(0, np.int64)], [np.zeros(0, np.int64)]
+    for r, t in enumerate(tables):
+        t = np.asarray(t, np.int64).reshape(-1, 2)
+        t = t[t[:, 0] < total]
+        pos += [t[:, 0], np.minimum(t[:, 1] + 1, total)]
+        w += [np.full(len(t), 1 << r, np.int64), np.full(len(t), -(1 << r), np.int64)]
+    pos, w = np.concatenate(pos), np.concatenate(w)
+    order = np.lexsort((w, pos))   # 같은 위치에선 끝(-)을 먼저 → 마스크가 범위를 넘지 않음
+    pos, w = pos[order], w[order]
+    masks = np.concatenate(([0], np.cumsum(w)))
+    lengths = np.diff(np.concatenate(([0], pos, [total])))
+    return np.bincount(masks, weights=lengths, minlength=1 << len(tables))[:1 << len(tables)]
+
+
+def _kappa(po: float, pe: float) -> float:
+    return (po - pe) / (1.0 - pe) if pe < 1.0 else float('nan')
+
+
+def _edge_match(a, b, tol: int) -> int:
+    """a의 각 값에 대해 b에 tol 이내 값이 있는 개수 (a, b 정렬됨)."""
+    if not len(a) or not len(b):
+        return 0
+    i = np.searchsorted(b, a)
+    d = np.minimum(np.abs(b[np.minimum(i, len(b) - 1)] - a), np.abs(b[np.maximum(i - 1, 0)] - a))
+    return int(np.count_nonzero(d <= tol))
+
+
+def _bout_match(a, b, tol: int) -> int:
+    """a의 bout 중 시작이 가장 가까운 b bout과 시작/끝 모두 tol 이내인 개수."""
+    if not len(a) or not len(b):
+        return 0
+    bs = b[:, 0]
+    j = np.searchsorted(bs, a[:, 0])
+    best = None
+    for k in (np.clip(j - 1, 0, len(b) - 1), np.clip(j, 0, len(b) - 1)):
+        ok = (np.abs(bs[k] - a[:, 0]) <= tol) & (np.abs(b[k, 1] - a[:, 1]) <= tol)
+        best = ok if best is None else best | ok
+    return int(np.count_nonzero(best))
+
+
+def compare_raters(label_sets, tolerance: int = RELIABILITY_TOLERANCE):
+    """같은 영상에 대한 라벨 세트 2개 이상(read_label_file 결과) → behavior별 일치도.
+    프레임은 Frame 번호로 정렬되어 있으므로 가장 긴 세트 길이에 맞춰(없는 프레임은 0) 비교한다.
+    Cohen's kappa는 rater 쌍 평균(2명이면 그대로), Fleiss' kappa는 전체.
+    onset/offset/bout 일치는 rater 쌍마다 양방향 일치 수 / 전체 bout 수의 평균."""
+    R = len(label_sets)
+    if R < 2:
+        raise ValueError("Need at least two label sets to compare.")
+    total = max(ls['total_frames'] for ls in label_sets)
+    common = [b for b in label_sets[0]['behaviors'] if all(b in ls['behaviors'] for ls in label_sets[1:])]
+    bits = np.arange(1 << R)
+    on = (bits[:, None] >> np.arange(R)) & 1              # (2**R, R) 마스크별 rater 상태
+    k = on.sum(axis=1)
+    nan = float('nan')
+    rows = []
+    for name in common:
+        tables = [ls['labels'].bout_table(ls['behaviors'].index(name)) for ls in label_sets]
+        h = _rater_masks(tables, total)
+        T = float(total)
+        agree = (h[0] + h[-1]) / T if T else nan
+        # Fleiss
+        p_i = (k * (k - 1) + (R - k) * (R - k - 1)) / (R * (R - 1))
+        p_pos = float((h * k).sum()) / (T * R) if T else nan
+        fleiss = _kappa(float((h * p_i).sum()) / T, p_pos ** 2 + (1 - p_pos) ** 2) if T else nan
+        cohen, onset, offset, bout = [], [], [], []
+        for a in range(R):
+            for b in range(a + 1, R):
+                n1a, n1b = float(h[on[:, a] == 1].sum()), float(h[on[:, b] == 1].sum())
+                n11 = float(h[(on[:, a] == 1) & (on[:, b] == 1)].sum())
+                if T:
+                    cohen.append(_kappa((T - n1a - n1b + 2 * n11) / T, (n1a * n1b + (T - n1a) * (T - n1b)) / (T * T)))
+                ta, tb = tables[a], tables[b]
+                nb = len(ta) + len(tb)
+                if nb:
+                    onset.append((_edge_match(ta[:, 0], tb[:, 0], tolerance) + _edge_match(tb[:, 0], ta[:, 0], tolerance)) / nb)
+                    ends_a, ends_b = np.sort(ta[:, 1]), np.sort(tb[:, 1])
+                    offset.append((_edge_match(ends_a, ends_b, tolerance) + _edge_match(ends_b, ends_a, tolerance)) / nb)
+                    bout.append((_bout_match(ta, tb, tolerance) + _bout_match(tb, ta, tolerance)) / nb)
+        mean = lambda v: float(np.mean(v)) if v else nan
+        rows.append({'behavior': name, 'raters': R, 'frames': total, 'agreement': agree,
+                     'cohen': mean(cohen), 'fleiss': fleiss, 'onset': mean(onset), 'offset': mean(offset),
+                     'bout': mean(bout), 'bouts': [len(t) for t in tables]})
+    return rows
+
+
+def reliability_row(video: str, r: dict):
+    fmt = lambda x: "" if x != x else round(x, 4)   # NaN(정의 안 됨) → 빈 칸
+    return [video, r['behavior'], r['raters'], r['frames'], fmt(r['agreement']), fmt(r['cohen']),
+            fmt(r['fleiss']), fmt(r['onset']), fmt(r['offset']), fmt(r['bout']), "/".join(map(str, r['bouts']))]
+
+
+# ------------------------------ Preview Table Models ------------------------------
+class LabelTableModel(QAbstractTableModel):
+    """Preview용 프레임 테이블(Frame + behaviors). 셀 값/강조색은 화면에 보일 때만 labels에서 읽는다."""
+    HIGHLIGHT = QColor(255, 230, 160)  # 1이면 살짝 강조(연한 주황빛)
+
+    def __init__(self, labels, behaviors, parent=None):
+        super().__init__(parent)
+        self.labels = labels
+        self.headers = ["Frame"] + list(behaviors)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.labels.total_frames
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        r, c = index.row(), index.column()
+        if role == Qt.DisplayRole:
+            return str(r) if c == 0 else ("1" if self.labels.get(c - 1, r) else "0")
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role == Qt.BackgroundRole and c > 0 and self.labels.get(c - 1, r):
+            return self.HIGHLIGHT
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+
+class BoutTableModel(QAbstractTableModel):
+    """'Bouts only' 보기: behavior별 bout을 시작 프레임 순으로 한 줄씩."""
+    HEADERS = ["Behavior", "Start", "End", "Frames", "Seconds"]
+
+    def __init__(self, labels, behaviors, timeline, parent=None):
+        super().__init__(parent)
+        self.behaviors = list(behaviors)
+        self.timeline = timeline
+        self.rows = sorted(((s, e, bi) for bi in range(len(self.behaviors)) for s, e in labels.bouts(bi)))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        s, e, bi = self.rows[index.row()]
+        c = index.column()
+        if role == Qt.DisplayRole:
+            n = e - s + 1
+            if c == 4:
+                return f"{self.timeline.span_ms(s, e) / 1000.0:.2f}"
+            return (self.behaviors[bi], str(s), str(e), str(n))[c]
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+
+class RowsTableModel(QAbstractTableModel):
+    """고정된 행 목록(list of list)을 그대로 보여 주는 읽기 전용 표."""
+
+    def __init__(self, headers, rows, parent=None):
+        super().__init__(parent)
+        self.headers, self.rows = list(headers), rows
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return str(self.rows[index.row()][index.column()])
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+
+# ------------------------------ Video Viewer (zoom/pan) ------------------------------
+class VideoViewer(QGraphicsView):
+    targetSizeChanged = pyqtSignal(int, int)   # 화면에 실제로 필요한 프레임 픽셀 크기(원본 이하)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setDragMode(QGraphicsView.NoDrag)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self._panning = False
+        self._last = None
+        self._base = 1.0
+        self._zoom = 1.0
+        self._content_w = 0
+        self._content_h = 0
+        self._target = None
+
+    def wheelEvent(self, e):
+        # 기준 배율(_base) 아래로는 내려가지 않음(= fit-to-view 이하로 축소 금지)
+        step_up, step_dn = 1.25, 0.8
+        factor = step_up if e.angleDelta().y() > 0 else step_dn
+        self._zoom = max(1.0, self._zoom * factor)
+        self._apply_transform()
+        e.accept()
+
+    def reset_to_100(self):
+        self._zoom = 1.0
+        self.update_fit_base()
+        self._apply_transform()
+
+    def set_content_size(self, w: int, h: int):
+        """콘텐츠(비디오 프레임) 픽셀 크기 설정 → 기준 배율 갱신."""
+        self._content_w, self._content_h = int(w), int(h)
+        self._target = None   # 새 영상 → 목표 크기 다시 알림
+        self.update_fit_base()
+        self._apply_transform()
+
+    def update_fit_base(self):
+        """현재 뷰포트에 콘텐츠가 '꽉 차게' 보이도록 기준 배율 계산(비율 유지)."""
+        vw, vh = self.viewport().width(), self.viewport().height()
+        if self._content_w > 0 and self._content_h > 0 and vw > 0 and vh > 0:
+            sx = vw / self._content_w
+            sy = vh / self._content_h
+            self._base = min(sx, sy)  # 비율 유지
+        else:
+            self._base = 1.0
+
+    def _apply_transform(self):
+        t = QTransform()
+        scale = self._base * self._zoom
+        t.scale(scale, scale)
+        self.setTransform(t)
+        self._emit_target(scale)
+
+    def _emit_target(self, scale: float):
+        """원본 대비 화면 배율(장치 픽셀 기준)을 1/8 단위로 올림 → 창 크기 드래그 중에도 몇 단계로만 바뀜.
+        1:1 이상 확대면 원본 크기."""
+        if self._content_w <= 0 or self._content_h <= 0:
+            return
+        s = min(1.0, int(np.ceil(scale * self.devicePixelRatioF() * 8)) / 8)
+        size = (max(1, round(self._content_w * s)), max(1, round(self._content_h * s)))
+        if size != self._target:
+            self._target = size
+            self.targetSizeChanged.emit(*size)
+
+    def resizeEvent(self, e):
+        super().resizeEvent(e)
+        # 창 크기 변할 때도 기준 배율 갱신(상대 배율은 유지)
+        self.update_fit_base()
+        self._apply_transform()
+
+    def mousePressEvent(self, e):
+        if e.button() == Qt.MiddleButton or (e.button() == Qt.LeftButton and (e.modifiers() & Qt.ControlModifier)):
+            self.setCursor(Qt.ClosedHandCursor)
+            self._panning, self._last = True, e.pos()
+            e.accept()
+        else:
+            super().mousePressEvent(e)
+
+    def mouseMoveEvent(self, e):
+        if self._panning and (e.buttons() & (Qt.MiddleButton | Qt.LeftButton)):
+            d = e.pos() - self._last
+            self._last = e.pos()
+            self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() - d.x())
+            self.verticalScrollBar().setValue(self.verticalScrollBar().value() - d.y())
+            e.accept()
+        else:
+            super().mouseMoveEvent(e)
+
+    def mouseReleaseEvent(self, e):
+        if self._panning and (e.button() in (Qt.MiddleButton, Qt.LeftButton)):
+            self._panning = False
+            self.setCursor(Qt.ArrowCursor)
+            e.accept()
+        else:
+            super().mouseReleaseEvent(e)
+
+
+# ------------------------------ Filmstrip ------------------------------
+class FilmstripWidget(QWidget):
+    """슬라이더 위 썸네일 띠(ThumbStrip). 마우스를 올리면 그 위치 미리보기, 클릭하면 frameRequested.
+    띠 전체는 크기가 바뀔 때만 다시 그려 두고, 재생 위치 표시만 매번 덧그린다."""
+    frameRequested = pyqtSignal(int)
+    PREVIEW_SCALE = 2.5
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFixedHeight(40)
+        self.setMouseTracking(True)
+        self.strip = None
+        self.total_frames = 0
+        self.position = 0
+        self.progress = None
+        self._band = None        # 현재 크기로 그려 둔 띠 QPixmap
+        self._thumb_pm = {}      # 썸네일 번호 → QPixmap
+        self._preview = QLabel(None, Qt.ToolTip)
+
+    def set_strip(self, strip, total_frames: int):
+        self.strip, self.total_frames = strip, total_frames
+        self.progress = None
+        self._band = None
+        self._thumb_pm.clear()
+        self.update()
+
+    def clear(self):
+        self.set_strip(None, 0)
+        self.hide_preview()
+
+    def set_progress(self, pct: int):
+        self.progress = pct
+        self.update()
+
+    def set_position(self, frame: int):
+        self.position = frame
+        self.update()
+
+    def frame_at(self, x: int) -> int:
+        if self.total_frames <= 0:
+            return 0
+        f = int(round(x / max(1, self.width() - 1) * (self.total_frames - 1)))
+        return max(0, min(self.total_frames - 1, f))
+
+    def _thumb_pixmap(self, i: int) -> QPixmap:
+        pm = self._thumb_pm.get(i)
+        if pm is None:
+            t = np.ascontiguousarray(self.strip.thumbs[i])
+            h, w = t.shape[:2]
+            fmt = QImage.Format_BGR888 if HAS_BGR888 else QImage.Format_RGB888
+            if not HAS_BGR888:
+                t = np.ascontiguousarray(t[:, :, ::-1])
+            pm = QPixmap.fromImage(QImage(t.data, w, h, t.strides[0], fmt))
+            self._thumb_pm[i] = pm
+        return pm
+
+    def _render_band(self):
+        band = QPixmap(self.size())
+        band.fill(QColor(30, 30, 30))
+        qp = QPainter(band)
+        th = self.strip.thumbs.shape[1]
+        tile_w = max(1, int(self.strip.thumbs.shape[2] * self.height() / th))
+        W = self.width()
+        for x in range(0, W, tile_w):
+            i = self.strip.nearest(self.frame_at(x + tile_w // 2))
+            qp.drawPixmap(QRectF(x, 0, tile_w, self.height()), self._thumb_pixmap(i), QRectF(self._thumb_pixmap(i).rect()))
+        qp.end()
+        self._band = band
+
+    def paintEvent(self, e):
+        qp = QPainter(self)
+        if self.strip is not None and len(self.strip):
+            if self._band is None or self._band.size() != self.size():
+                self._render_band()
+            qp.drawPixmap(0, 0, self._band)
+            if self.total_frames > 1:
+                x = int(self.position / (self.total_frames - 1) * (self.width() - 1))
+                qp.fillRect(x - 1, 0, 3, self.height(), QColor(255, 200, 0))
+        else:
+            qp.fillRect(self.rect(), QColor(30, 30, 30))
+            if self.progress is not None:
+                qp.setPen(QColor(180, 180, 180))
+                qp.drawText(self.rect(), Qt.AlignCenter, f"Building thumbnails... {self.progress}%")
+        qp.end()
+
+    def resizeEvent(self, e):
+        self._band = None
+        super().resizeEvent(e)
+
+    def show_preview(self, frame: int, global_pos):
+        """frame 근처 썸네일을 크게 커서 위에 띄운다(디코드 없음)."""
+        if self.strip is None or not len(self.strip):
+            return
+        i = self.strip.nearest(frame)
+        src = self._thumb_pixmap(i)
+        pm = src.scaled(int(src.width() * self.PREVIEW_SCALE), int(src.height() * self.PREVIEW_SCALE),
+                        Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        qp = QPainter(pm)
+        qp.fillRect(0, pm.height() - 18, pm.width(), 18, QColor(0, 0, 0, 160))
+        qp.setPen(QColor(255, 255, 255))
+        qp.drawText(4, pm.height() - 5, f"Frame {int(self.strip.frames[i])}")
+        qp.end()
+        self._preview.setPixmap(pm)
+        self._preview.adjustSize()
+        self._preview.move(global_pos.x() - pm.width() // 2, global_pos.y() - pm.height() - 16)
+        self._preview.show()
+
+    def hide_preview(self):
+        self._preview.hide()
+
+    def mouseMoveEvent(self, e):
+        self.show_preview(self.frame_at(e.x()), e.globalPos())
+
+    def leaveEvent(self, e):
+        self.hide_preview()
+        super().leaveEvent(e)
+
+    def mousePressEvent(self, e):
+        if e.button() == Qt.LeftButton and self.total_frames > 0:
+            self.frameRequested.emit(self.frame_at(e.x()))
+        else:
+            super().mousePressEvent(e)
+
+
+# ------------------------------ Ethogram Timeline ------------------------------
+def lane_index(bouts):
+    """bout 표 [start, end] → (시작, 길이, 누적 길이): lane_coverage용으로 한 번만 계산."""
+    st = bouts[:, 0].astype(np.float64)
+    ln = (bouts[:, 1] - bouts[:, 0] + 1).astype(np.float64)
+    return st, ln, np.concatenate(([0.0], np.cumsum(ln)))
+
+
+def lane_coverage(index, edges):
+    """lane_index 결과와 픽셀 경계(프레임, 길이 W+1) → 픽셀별 라벨 프레임 비율(0~1)."""
+    edges = np.asarray(edges, dtype=np.float64)
+    st, ln, cum = index
+    if not len(st):
+        return np.zeros(len(edges) - 1)
+    i = np.searchsorted(st, edges, side='right') - 1   # edges 이전에 시작한 마지막 bout
+    inside = np.where(i >= 0, np.clip(edges - st[np.maximum(i, 0)], 0, ln[np.maximum(i, 0)]), 0.0)
+    covered = cum[np.maximum(i, 0)] * (i >= 0) + inside   # 프레임 edges 이전의 라벨 프레임 수
+    return np.diff(covered) / np.maximum(np.diff(edges), 1e-9)
+
+
+class EthogramWidget(QWidget):
+    """behavior별 lane으로 라벨 위치를 보여 주는 타임라인. 클릭하면 frameRequested.
+    줌 단계마다 TILE_W 픽셀 폭 타일(QPixmap)로 나눠 그려 LRU 캐시에 두고,
+    라벨이 바뀌면 그 프레임 구간을 덮는 타일만 버린다. 휠로 줌(커서 기준), 줌 상태에선 재생 위치를 따라간다."""
+    frameRequested = pyqtSignal(int)
+    LANE_H = 10
+    TILE_W = 256
+    MAX_TILES = 512
+    MAX_PX_PER_FRAME = 8
+
+    def __init__(self, provider, parent=None):
+        super().__init__(parent)
+        self.provider = provider      # () -> (labels, behaviors, total_frames, labels generation)
+        self.position = 0
+        self.zoom = 0                 # 0: 전체, z: 2**z 배 확대
+        self.offset = 0               # 현재 줌에서 보이는 첫 픽셀
+        self._key = None              # (labels generation, behaviors, total, width): 바뀌면 캐시 전체 무효
+        self._tiles = OrderedDict()   # (zoom, tile) → QPixmap
+        self._lanes = {}              # behavior → lane_index (라벨이 바뀐 lane만 다시 계산)
+        self._colors = []
+        self.setMouseTracking(True)
+        self._fit_height(0)
+
+    def _fit_height(self, n: int):
+        self.setFixedHeight(max(1, n) * self.LANE_H + 2)
+
+    # ---------- 좌표 ----------
+    def _fpp(self, zoom: int, total: int) -> float:
+        """줌 단계의 픽셀당 프레임 수."""
+        return total / max(1, self.width()) / (1 << zoom)
+
+    def _max_zoom(self, total: int) -> int:
+        z = 0
+        while self._fpp(z + 1, total) >= 1.0 / self.MAX_PX_PER_FRAME:
+            z += 1
+        return z
+
+    def frame_at(self, x: int) -> int:
+        total = self.provider()[2]
+        if total <= 0:
+            return 0
+        f = int((self.offset + x) * self._fpp(self.zoom, total))
+        return max(0, min(total - 1, f))
+
+    def _x_of(self, frame: int, total: int) -> float:
+        return frame / self._fpp(self.zoom, total) - self.offset
+
+    # ---------- 캐시 ----------
+    def _check_source(self):
+        labels, behaviors, total, gen = self.provider()
+        # id(labels)는 새 BoutLabels가 같은 주소를 받으면 그대로일 수 있어 세대 번호로 구분
+        key = (gen, tuple(behaviors or ()), total, self.width())
+        if key != self._key:
+            self._key = key
+            self._tiles.clear()
+            self._lanes.clear()
+            n = len(behaviors or ())
+            self._colors = [QColor.fromHsv(int(i * 360 / max(1, n)) % 360, 170, 230) for i in range(n)]
+            self._fit_height(n)
+            self.zoom = min(self.zoom, self._max_zoom(total)) if total else 0
+        return labels, behaviors, total
+
+    def invalidate_frames(self, bi: int, s: int, e: int):
+        """behavior bi의 프레임 [s, e] 라벨이 바뀜 → 그 구간을 덮는 타일만 버리고 다시 그린다."""
+        self._lanes.pop(bi, None)
+        total = self.provider()[2]
+        if total <= 0 or not self._tiles:
+            return
+        for key in [k for k in self._tiles
+                    if k[1] * self.TILE_W * self._fpp(k[0], total) <= e + 1
+                    and s < (k[1] + 1) * self.TILE_W * self._fpp(k[0], total)]:
+            del self._tiles[key]
+        self.update()
+
+    def _tile(self, labels, n: int, total: int, zoom: int, t: int) -> QPixmap:
+        key = (zoom, t)
+        pm = self._tiles.get(key)
+        if pm is not None:
+            self._tiles.move_to_end(key)
+            return pm
+        fpp = self._fpp(zoom, total)
+        W, H = self.TILE_W, n * self.LANE_H
+        edges = np.minimum((t * W + np.arange(W + 1)) * fpp, total)
+        img = np.empty((H, W, 4), dtype=np.uint8)
+        img[:] = (30, 30, 30, 255)   # BGRA (Format_ARGB32, little-endian)
+        for bi in range(n):
+            lane = self._lanes.get(bi)
+            if lane is None:
+                lane = self._lanes[bi] = lane_index(labels.bout_table(bi))
+            cov = lane_coverage(lane, edges)
+            # 한 픽셀에 여러 프레임이면 라벨 비율만큼 진하게(최소 35%), 조금이라도 있으면 보이게
+            a = np.where(cov > 0, 0.35 + 0.65 * cov, 0.0)[:, None]
+            c = self._colors[bi]
+            lane = img[bi * self.LANE_H + 1:(bi + 1) * self.LANE_H - 1, :, :3]
+            lane[:] = (np.array([c.blue(), c.green(), c.red()]) * a + 30 * (1 - a)).astype(np.uint8)
+        qimg = QImage(img.data, W, H, W * 4, QImage.Format_ARGB32)
+        pm = QPixmap.fromImage(qimg)   # 복사 → img는 버려도 됨
+        self._tiles[key] = pm
+        while len(self._tiles) > self.MAX_TILES:
+            self._tiles.popitem(last=False)
+        return pm
+
+    # ---------- 표시 ----------
+    def set_position(self, frame: int):
+        self.position = frame
+        total = self.provider()[2]
+        if self.zoom and total > 0:
+            x = self._x_of(frame, total)
+            if x < 0 or x >= self.width():   # 화면 밖으로 나가면 한 화면씩 따라감
+                self._set_offset(int(frame / self._fpp(self.zoom, total)) - self.width() // 8)
+        self.update()
+
+    def _set_offset(self, off: int):
+        span = self.width() * (1 << self.zoom)
+        self.offset = max(0, min(int(off), span - self.width()))
+
+    def paintEvent(self, e):
+        qp = QPainter(self)
+        qp.fillRect(self.rect(), QColor(30, 30, 30))
+        labels, behaviors, total = self._check_source()
+        n = len(behaviors or ())
+        if labels is None or not n or total <= 0:
+            qp.end(); return
+        first = self.offset // self.TILE_W
+        last = (self.offset + self.width() - 1) // self.TILE_W
+        for t in range(first, last + 1):
+            qp.drawPixmap(t * self.TILE_W - self.offset, 1, self._tile(labels, n, total, self.zoom, t))
+        qp.setFont(QFont(self.font().family(), 7))
+        for bi, name in enumerate(behaviors):
+            qp.setPen(self._colors[bi].lighter(130))
+            qp.drawText(3, 1 + (bi + 1) * self.LANE_H - 2, name)
+        x = int(self._x_of(self.position, total))
+        qp.fillRect(x - 1, 0, 2, self.height(), QColor(255, 200, 0))
+        qp.end()
+
+    def mousePressEvent(self, e):
+        if e.button() == Qt.LeftButton and self.provider()[2] > 0:
+            self.frameRequested.emit(self.frame_at(e.x()))
+        else:
+            super().mousePressEvent(e)
+
+    def mouseMoveEvent(self, e):
+        _, behaviors, total, _ = self.provider()
+        if behaviors and total > 0:
+            bi = min(len(behaviors) - 1, max(0, (e.y() - 1) // self.LANE_H))
+            self.setToolTip(f"{behaviors[bi]} — frame {self.frame_at(e.x())}")
+
+    def wheelEvent(self, e):
+        total = self.provider()[2]
+        if total <= 0:
+            return
+        z = max(0, min(self._max_zoom(total), self.zoom + (1 if e.angleDelta().y() > 0 else -1)))
+        if z == self.zoom:
+            return
+        f = (self.offset + e.x()) * self._fpp(self.zoom, total)   # 커서 아래 프레임 고정
+        self.zoom = z
+        self._set_offset(int(f / self._fpp(z, total)) - e.x())
+        self.update()
+
+
+# ------------------------------ Main Window ------------------------------
+class MainWindow(QMainWindow):
+    SLOTS = 4  # up to 4 keys
+    TARGET_SIZE_DEBOUNCE_MS = 150   # 줌/리사이즈가 멈춘 뒤 표시 크기 적용
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("MBTI Manual Behavior Tracking Interface (2.0.0)")
+        self.setMinimumSize(1200, 800)
+        w = QWidget(self); self.setCentralWidget(w)
+        root = QVBoxLayout(w)
+        top = QWidget(self)
+        top_layout = QHBoxLayout(top)
+        root.addWidget(top, 1)  # 상단 영역이 가변적으로 늘어나도록
+
+        # Left: Video
+        self.view = VideoViewer()
+        top_layout.addWidget(self.view, 10)
+        self.scene = self.view.scene()
+        self.pix_item = QGraphicsPixmapItem()
+        self.scene.addItem(self.pix_item)
+        self.video_size = (0, 0)   # 원본 프레임 크기 (프레임은 표시 크기로 줄여 올 수 있음)
+        self.view.targetSizeChanged.connect(self.on_view_target_size)
+
+        # Right: Control Panel
+        right = QWidget(); top_layout.addWidget(right, 3)
+        r = QVBoxLayout(right); r.setContentsMargins(6,6,6,6)
+
+        # Group: File
+        self.g_file = QGroupBox("Video File"); r.addWidget(self.g_file)
+        f = QVBoxLayout(self.g_file)
+        self.btn_open_folder = QPushButton("Open Folder")
+        self.list_videos = QListWidget()
+        self.btn_load_video = QPushButton("Load Video")
+        f.addWidget(self.btn_open_folder); f.addWidget(self.list_videos); f.addWidget(self.btn_load_video)
+
+        # Group: Behaviors (input line -> set)
+        self.g_beh = QGroupBox("Behaviors"); r.addWidget(self.g_beh)
+        b = QVBoxLayout(self.g_beh)
+        hl = QHBoxLayout()
+        self.edit_behaviors = QLineEdit(); self.edit_behaviors.setPlaceholderText("Enter behaviors, comma-separated")
+        self.btn_set_behaviors = QPushButton("Set")
+        hl.addWidget(self.edit_behaviors); hl.addWidget(self.btn_set_behaviors)
+        b.addLayout(hl)
+
+        # Group: Recording (reworked, but compact)
+        self.g_rec = QGroupBox("Recording"); r.addWidget(self.g_rec)
+        rec = QGridLayout(self.g_rec)
+        self.check_record = QCheckBox("Recording mode")
+        rec.addWidget(self.check_record, 0,0,1,2)
+        rec.addWidget(QLabel("Limit (min):"), 0,2)
+        self.spin_limit = QSpinBox(); self.spin_limit.setRange(1,999); self.spin_limit.setValue(0); self.spin_limit.setAccelerated(True)
+        rec.addWidget(self.spin_limit, 0,3)
+        # Total을 한 줄 라벨로 통합: "Total  (00:00)"
+        self.lbl_rec_total_title = QLabel("Total  (00:00)")
+        rec.addWidget(self.lbl_rec_total_title, 1,0,1,4)
+
+        # 4 slots rows: behavior combo + set key + key label + slot timer
+        self.slot_ui = []
+        for i in range(self.SLOTS):
+            row = 2 + i*2
+            title = QLabel(f"Slot {i+1}  (00:00)")
+            rec.addWidget(title, row, 0)
+            cmb = QComboBox(); cmb.addItem("(None)")
+            btn = QPushButton("Set physical key")
+            keylab = QLabel("-")
+            rec.addWidget(cmb,    row,   1)
+            rec.addWidget(btn,    row,   2)
+            rec.addWidget(keylab, row,   3)
+            self.slot_ui.append({'cmb': cmb, 'btn': btn, 'keylab': keylab, 'title': title})
+
+        self.check_overlay = QCheckBox("Show overlay"); self.check_overlay.setChecked(True)
+        rec.addWidget(self.check_overlay, 2+self.SLOTS*2, 0, 1, 2)
+        self.check_hud = QCheckBox("Perf HUD")
+        self.check_hud.setToolTip("Per-stage timings (p50/p95/max) and frame counters on the video")
+        rec.addWidget(self.check_hud, 2+self.SLOTS*2, 2)
+        self.btn_trace = QPushButton("Export Trace")
+        self.btn_trace.setToolTip("Save recorded timings as a Chrome trace (chrome://tracing, Perfetto)")
+        rec.addWidget(self.btn_trace, 2+self.SLOTS*2, 3)
+
+        # Group: Bookmarks
+        self.g_bm = QGroupBox("Bookmarks"); r.addWidget(self.g_bm)
+        bm = QVBoxLayout(self.g_bm)
+        self.list_bookmarks = QListWidget()
+        bmhl = QHBoxLayout()
+        self.btn_add_bm = QPushButton("Add Bookmark")
+        self.btn_go_bm  = QPushButton("Go to Bookmark")
+        self.btn_del_bm = QPushButton("Delete Bookmark")
+        bmhl.addWidget(self.btn_add_bm); bmhl.addWidget(self.btn_go_bm); bmhl.addWidget(self.btn_del_bm)
+        bm.addWidget(self.list_bookmarks); bm.addLayout(bmhl)
+
+        # Group: Data
+        self.g_data = QGroupBox("Data"); r.addWidget(self.g_data)
+        dl = QHBoxLayout(self.g_data)
+        self.btn_import = QPushButton("Import Labels")
+        self.btn_export = QPushButton("Export Labels")
+        self.btn_preview = QPushButton("Preview Result")
+        self.btn_reliability = QPushButton("Reliability")
+        self.check_project = QCheckBox("Project DB")   # 폴더별 SQLite에 라벨/세션 기록
+        dl.addWidget(self.btn_import); dl.addWidget(self.btn_export); dl.addWidget(self.btn_preview)
+        dl.addWidget(self.btn_reliability)
+        dl.addWidget(self.check_project)
+
+        r.addStretch(1)
+        
+        # Group: Playback
+        self.g_play = QGroupBox("Playback")
+        p = QGridLayout(self.g_play)
+        self.btn_play = QPushButton("Play/Pause")
+        self.slider = QSlider(Qt.Horizontal); self.slider.setEnabled(False)
+        self.lbl_frame = QLabel("Frame: 0000 / 0000")
+        self.lbl_time  = QLabel("Time: 00:00 / 00:00")
+        # 1행: 썸네일 필름스트립, 2행: 슬라이더 (둘 다 전폭)
+        self.filmstrip = FilmstripWidget()
+        p.addWidget(self.filmstrip, 0, 0, 1, 7)
+        p.addWidget(self.slider, 1, 0, 1, 7)
+        # 3행: behavior별 라벨 타임라인 (클릭 → 이동, 휠 → 줌)
+        self.ethogram = EthogramWidget(lambda: (self.labels, self.behaviors, self.total_frames, self.labels_gen))
+        p.addWidget(self.ethogram, 2, 0, 1, 7)
+        # 4행: 좌측 Speed, 가운데 Play(가로 확장), 우측 Frame/Time
+        p.addWidget(QLabel("Speed:"), 3, 0, 1, 1)
+        self.spin_speed = QDoubleSpinBox()
+        self.spin_speed.setDecimals(1)         # 0.1 단위
+        self.spin_speed.setRange(0.3, 5.0)     # 범위 0.3 ~ 5.0
+        self.spin_speed.setSingleStep(0.1)     # 스텝 0.1
+        self.spin_speed.setValue(1.0)          # 기본 1.0×
+        self.spin_speed.setSuffix("×")         # 표시: 배속 기호
+        self.spin_speed.setAccelerated(True)   # 화살표 꾹 누르면 가속
+        p.addWidget(self.spin_speed, 3, 1, 1, 1)
+        self.check_reverse = QCheckBox("Reverse")   # 역재생(녹화 중에는 사용 불가)
+        p.addWidget(self.check_reverse, 3, 2, 1, 1)
+        self.btn_play.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        p.addWidget(self.btn_play, 3, 3, 1, 2)
+        self.lbl_frame.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        self.lbl_time.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        p.addWidget(self.lbl_frame, 3, 5, 1, 1)
+        p.addWidget(self.lbl_time,  3, 6, 1, 1)
+        # 5행: 늦어질 때 정책 + 실제 배속
+        p.addWidget(QLabel("When behind:"), 4, 0, 1, 1)
+        self.cmb_lag = QComboBox()
+        self.cmb_lag.addItem("Drop frames", VideoThread.LAG_DROP)
+        self.cmb_lag.addItem("Slow down", VideoThread.LAG_SLOW)
+        p.addWidget(self.cmb_lag, 4, 1, 1, 1)
+        self.spin_ui_fps = QSpinBox()   # 화면 갱신 상한 (모니터 주사율보다 높아도 주사율까지만)
+        self.spin_ui_fps.setRange(10, 240)
+        self.spin_ui_fps.setValue(60)
+        self.spin_ui_fps.setPrefix("UI ≤ "); self.spin_ui_fps.setSuffix(" fps")
+        p.addWidget(self.spin_ui_fps, 4, 2, 1, 1)
+        self.lbl_rate = QLabel("")
+        p.addWidget(self.lbl_rate, 4, 3, 1, 2)
+        self.check_proxy = QCheckBox("Proxy mode")   # 저해상도 프록시로 scrub/고배속 재생
+        p.addWidget(self.check_proxy, 4, 5, 1, 2)
+        for col in (3,4):
+            p.setColumnStretch(col, 1)
+        for col in (0,1,2,5,6):
+            p.setColumnStretch(col, 0)
+        root.addWidget(self.g_play, 0)
+
+        # State
+        self.video_thread = None
+        self.indexer = None
+        self.timeline = FrameTimeline(30.0, 0)   # 프레임 ↔ 시각 (인덱스가 있으면 실제 pts)
+        self.folder_indexer = None
+        self.folder_meta = {}    # 파일 이름 → probe 메타데이터 (FolderIndexer)
+        self.proxy_builder = None
+        self.thumb_job = None
+        self.scrub_latency = deque(maxlen=50)   # 최근 scrub 요청→화면 지연(ms)
+        self.journal = None      # LabelJournal (현재 영상의 크래시 복구용 저널)
+        self.store = None        # ProjectStore (Project DB 모드일 때 폴더의 SQLite)
+        self.record_started_at = None
+        self.compactor = None
+        self.journal_timer = QTimer(self)
+        self.journal_timer.setInterval(JOURNAL_SYNC_MS)
+        self.journal_timer.timeout.connect(self._journal_tick)
+        self.journal_timer.start()
+        self._pending_frame = None   # 다음 _present에서 보여 줄 PooledFrame
+        self._last_present = 0.0
+        self.present_timer = QTimer(self)
+        self.present_timer.setSingleShot(True)
+        self.present_timer.timeout.connect(self._present)
+        self._target_size = None     # 디바운스 중인 표시 크기 (w, h)
+        self.target_size_timer = QTimer(self)
+        self.target_size_timer.setSingleShot(True)
+        self.target_size_timer.setInterval(self.TARGET_SIZE_DEBOUNCE_MS)
+        self.target_size_timer.timeout.connect(self._apply_view_target_size)
+        self.hud_timer = QTimer(self)
+        self.hud_timer.setInterval(500)
+        self.hud_timer.timeout.connect(self._update_hud)
+        self.video_loaded = False
+        self.video_folder = ""
+        self.current_video_path = None
+        self.current_frame_idx = 0
+        self.fps = 30.0
+        self.total_frames = 0
+        self.recording = False
+        self.record_start_frame = None
+        self.record_start_ms = None
+        self.record_total_ms = 0
+        self.record_limit_end_frame = None  # 제한 프레임
+        self._record_arming_pending = False
+        self._fit_initialized = False
+        self.data_modified = False
+
+        self.behaviors = []
+        self.labels = None              # BoutLabels (behavior별 bout 구간)
+        self.behavior_durations = []    # ms per behavior
+
+        # 4 input slots
+        self.slots = [{'key': None, 'behavior': None, 'ms': 0, 'pressed': False,
+                       'start_ms': 0, 'start_frame': 0, 'key_t': None} for _ in range(self.SLOTS)]
+        self.key_to_slot = {}  # (qt_key, scan) -> slot_idx
+        self.pending_key_capture = None
+
+        # Overlays (view 기준의 QLabel들)
+        self.overlay_labels = []
+        self._init_overlays()
+        # 뷰 리사이즈 감지 → 재배치
+        self.view.viewport().installEventFilter(self)
+
+        # Connect
+        self.btn_open_folder.clicked.connect(self.open_folder_dialog)
+        self.btn_load_video.clicked.connect(self.load_selected_video)
+        self.list_videos.itemDoubleClicked.connect(self.load_selected_video)
+        self.btn_play.clicked.connect(self.toggle_play_pause)
+        self.slider.sliderPressed.connect(self.on_slider_pressed)
+        self.slider.sliderReleased.connect(self.on_slider_released)
+        self.slider.sliderMoved.connect(self.on_slider_moved)
+
+        self.btn_set_behaviors.clicked.connect(self.define_behaviors)
+        self.check_record.stateChanged.connect(self.on_record_toggled)
+        self.btn_add_bm.clicked.connect(self.add_bookmark)
+        self.btn_go_bm.clicked.connect(self.jump_to_bookmark)
+        self.btn_del_bm.clicked.connect(self.delete_bookmark)
+        self.btn_import.clicked.connect(self.import_labels)
+        self.btn_export.clicked.connect(self.export_labels)
+        self.btn_preview.clicked.connect(self.preview_result)
+        self.btn_reliability.clicked.connect(self.compare_reliability)
+        self.check_hud.toggled.connect(self.on_hud_toggled)
+        self.btn_trace.clicked.connect(self.export_trace)
+        self.check_project.toggled.connect(self.on_project_toggled)
+        self.spin_speed.valueChanged.connect(self.on_speed_changed)
+        self.check_reverse.toggled.connect(self.on_reverse_toggled)
+        self.cmb_lag.currentIndexChanged.connect(self.on_lag_policy_changed)
+        self.check_proxy.toggled.connect(self.on_proxy_toggled)
+        self.filmstrip.frameRequested.connect(self.on_filmstrip_clicked)
+        self.ethogram.frameRequested.connect(self.on_filmstrip_clicked)
+        # 슬라이더 위에서도 썸네일 미리보기
+        self.slider.setMouseTracking(True)
+        self.slider.installEventFilter(self)
+
+        for idx, s in enumerate(self.slot_ui):
+            s['btn'].clicked.connect(lambda _, i=idx: self.start_capture(i))
+            s['cmb'].currentIndexChanged.connect(lambda _, i=idx: self.on_slot_behavior_changed(i))
+
+        self.update_ui_state()
+        # Enter 로 behaviors 확정
+        self.edit_behaviors.returnPressed.connect(self.btn_set_behaviors.click)
+        # Focus policy: MainWindow 기본 StrongFocus, 자식 위젯 NoFocus(입력칸만 예외)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.apply_no_focus()
+
+    def apply_no_focus(self):
+        for w in self.findChildren(QWidget):
+            if w is self.edit_behaviors:
+                w.setFocusPolicy(Qt.ClickFocus)   # ← 예외
+            else:
+                w.setFocusPolicy(Qt.NoFocus)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.activateWindow()
+        self.raise_()
+        # 메인 초기 포커스는 MainWindow로 유지(입력은 클릭 시 활성화)
+        self.setFocus(Qt.ActiveWindowFocusReason)
+
+    # view 리사이즈 시 오버레이 재배치
+    def eventFilter(self, obj, ev):
+        if obj is self.view.viewport() and ev.type() == QEvent.Resize:
+            self._position_overlays()
+        elif obj is self.slider and ev.type() == QEvent.MouseMove:
+            x = self.filmstrip.mapFromGlobal(ev.globalPos()).x()
+            self.filmstrip.show_preview(self.filmstrip.frame_at(x), ev.globalPos())
+        elif obj is self.slider and ev.type() == QEvent.Leave:
+            self.filmstrip.hide_preview()
+        return super().eventFilter(obj, ev)
+
+    def _guard_unsaved(self, reason_text: str) -> bool:
+        """
+        저장되지 않은 라벨이 있으면 경고를 띄워 진행 여부를 결정한다.
+        reason_text 예: 'load a new video', 'change behaviors'
+        return True → 계속 진행, False → 중단
+        """
+        if not getattr(self, 'data_modified', False):
+            return True
+        box = QMessageBox(self)
+        box.setWindowTitle("Unsaved labels")
+        box.setIcon(QMessageBox.Warning)
+        box.setText(f"There are unsaved label changes.\nDo you want to export them before you {reason_text}?")
+        btn_export  = box.addButton("Export now", QMessageBox.AcceptRole)
+        btn_discard = box.addButton("Continue without saving", QMessageBox.DestructiveRole)
+        btn_cancel  = box.addButton("Cancel", QMessageBox.RejectRole)
+        box.exec_()
+        clicked = box.clickedButton()
+        if clicked is btn_cancel:
+            return False
+        if clicked is btn_export:
+            # 사용자가 저장 대화상자에서 취소할 수도 있으므로, 저장 후 플래그 상태로 판단
+            self.export_labels()
+            return not self.data_modified
+        # 저장하지 않고 진행 → 변경 내용 폐기로 간주 (저널도 비움)
+        self._wait_compactor()
+        if self.journal:
+            self.journal.truncate()
+        self.data_modified = False
+        return True
+
+    # ---------- overlays ----------
+    def _init_overlays(self):
+        # view.viewport() 좌표계에 고정되는 라벨들
+        from PyQt5.QtWidgets import QLabel
+        self.overlay_labels = []
+        self._overlay_colors = [
+            "rgba(217,  99,  78, 180)", 
+            "rgba(242, 250,  97, 180)",
+            "rgba( 97, 250, 133, 180)",
+            "rgba(108, 152, 230, 180)",
+        ]
+        self._overlay_default_bg = "rgba(0,0,0,150)"
+        self._overlay_min_w = 100
+        self._overlay_base_w = 200
+        self._overlay_h = 44
+
+        for _ in range(self.SLOTS):
+            lab = QLabel("", self.view.viewport())
+            lab.setVisible(False)
+            lab.setAlignment(Qt.AlignCenter)
+            lab.setFixedSize(self._overlay_base_w, self._overlay_h)
+            lab.setStyleSheet("color: white; font-weight: 600; border-radius: 8px;")
+            self.overlay_labels.append(lab)
+        self.hud_label = QLabel("", self.view.viewport())
+        self.hud_label.setVisible(False)
+        self.hud_label.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.hud_label.setStyleSheet("background: rgba(0,0,0,170); color: #9f9; font-family: monospace;"
+                                     " font-size: 11px; padding: 4px; border-radius: 4px;")
+        self._position_overlays()
+
+    def _position_overlays(self):
+        # 뷰포트 상단에서 좌→우로 균등 간격 배치
+        vp = self.view.viewport()
+        w, h = vp.width(), vp.height()
+        margin = 10
+        gap = 8
+        if self.hud_label.isVisible():   # HUD는 좌하단
+            self.hud_label.adjustSize()
+            self.hud_label.move(margin, max(margin, h - margin - self.hud_label.height()))
+        n = len(self.overlay_labels)
+        if n == 0:
+            return
+        # 창이 작아도 겹치지 않도록, 가용폭에 맞춰 라벨 폭을 동적으로 축소
+        total_gap = gap * (n - 1)
+        max_w_for_each = (w - 2*margin - total_gap) / max(1, n)
+        labw = max(self._overlay_min_w, min(self._overlay_base_w, int(max_w_for_each)))
+        y = margin
+        xs = [margin + i*(labw + gap) for i in range(n)]
+        for i, lab in enumerate(self.overlay_labels):
+            # 색상 적용(1~4는 팔레트, 그 이후는 기본색)
+            bg = self._overlay_colors[i] if i < len(self._overlay_colors) else self._overlay_default_bg
+            lab.setStyleSheet(f"background: {bg}; color: white; font-weight: 700; border-radius: 8px;")
+            lab.setFixedSize(labw, self._overlay_h)
+            lab.move(int(xs[i]), y)
+
+    def on_hud_toggled(self, on: bool):
+        PERF.enabled = on   # 꺼져 있으면 계측 비용 없음
+        self.hud_label.setVisible(on)
+        if on:
+            self.hud_timer.start(); self._update_hud()
+        else:
+            self.hud_timer.stop()
+
+    def _update_hud(self):
+        rows = [f"{'stage':<15}{'n':>7}{'p50':>8}{'p95':>8}{'max':>8}  ms"]
+        for st, n, _mean, p50, p95, mx in PERF.summary():
+            rows.append(f"{st:<15}{n:>7}{p50:>8.2f}{p95:>8.2f}{mx:>8.1f}")
+        c = PERF.counters
+        rows.append(f"frames {c.get('frames', 0)}  dropped {c.get('frames dropped', 0)}  "
+                    f"late {c.get('frames late', 0)}  coalesced {c.get('frames coalesced', 0)}")
+        self.hud_label.setText("\n".join(rows))
+        self._position_overlays()
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Performance Trace", "mbti_trace.json", "Chrome Trace (*.json)")
+        if not path: return
+        if not path.lower().endswith(".json"): path += ".json"
+        try:
+            PERF.export_trace(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Export Trace", str(e)); return
+        n = sum(row[1] for row in PERF.summary())
+        hint = "" if PERF.enabled or n else "\n(Enable \"Perf HUD\" to record timings.)"
+        QMessageBox.information(self, "Export Trace", f"Saved {n} timed events to:\n{path}{hint}")
+
+    def _set_overlay_text(self, slot_idx, text):
+        self.overlay_labels[slot_idx].setText(text)
+
+    # ---------- UI states ----------
+    def _rec_info_labels(self):
+        """Recording 패널 내에서 정보 표시용 라벨들을 모아 반환"""
+        labels = []
+        # 총 시간 라벨(예: 'Total  (00:00)')가 있으면 포함
+        if hasattr(self, "lbl_rec_total_title"):
+            labels.append(self.lbl_rec_total_title)
+        # 슬롯 타이틀 라벨: slot_ui[i]['title'] 로 관리(없으면 무시)
+        if hasattr(self, "slot_ui"):
+            for s in self.slot_ui:
+                if 'title' in s:
+                    labels.append(s['title'])
+        return tuple(labels)
+
+    def _refresh_slot_title_styles(self, recording: bool = False):
+        """슬롯 타이틀 라벨의 색을 상태에 맞춰 갱신.
+           - behavior 미지정: 회색
+           - 그 외: 검정색(Recording/Idle 모두)"""
+        if not hasattr(self, "slot_ui"):
+            return
+        for i, s in enumerate(self.slot_ui):
+            lab = s.get('title')
+            if lab is None:
+                continue
+            bi = self.slots[i]['behavior'] if i < len(self.slots) else None
+            if bi is None:
+                lab.setStyleSheet("color: gray;")
+            else:
+                # 녹화 중에도 정보는 선명한 검정
+                lab.setStyleSheet("color: black;")
+        # 총 시간 라벨은 항상 검정
+        if hasattr(self, "lbl_rec_total_title"):
+            self.lbl_rec_total_title.setStyleSheet("color: black;")
+
+    def _set_group_enabled(self, group: QGroupBox, enabled: bool, exceptions: tuple = ()):
+        """
+        그룹 단위 enable/disable. exceptions가 있을 때는 그룹을 켜둔 채,
+        자식 위젯만 개별 제어(예외 위젯은 활성, 나머지는 비활성).
+        """
+        if not exceptions:
+            group.setEnabled(enabled)
+            for w in group.findChildren(QWidget):
+                w.setEnabled(enabled)
+            return
+        # 부분 비활성: 부모는 켠 상태에서 자식만 선별 제어
+        group.setEnabled(True)
+        ex_set = set(exceptions)
+        for w in group.findChildren(QWidget):
+            w.setEnabled(w in ex_set)
+
+    def update_ui_state(self):
+        """
+        상태표:
+          1) 초기: Video File만 enabled, 나머지(Playback 포함) disabled
+          2) 영상 로드: Video File + Behaviors enabled, 나머지 disabled
+          3) 영상+Behavior 모두: 기본적으로 모두 enabled 가능.
+             - rec False + 재생중 : Recording disabled
+             - rec False + 정지중 : 모든 영역 enabled
+             - rec True  + 재생중 : Recording, Bookmarks, Data, Playback(단 Play버튼 제외) disabled
+             - rec True  + 정지중 : Recording(단 체크박스 제외), Data disabled
+        """
+        video_loaded = self.video_loaded
+        beh_ready = bool(self.behaviors)
+        recording = self.recording
+        playing = getattr(self, 'is_playing', False)
+
+        # 1) 초기 상태
+        if not video_loaded:
+            self._set_group_enabled(self.g_file, True)
+            self._set_group_enabled(self.g_beh, False)
+            self._set_group_enabled(self.g_rec, False)
+            self._set_group_enabled(self.g_bm,  False)
+            self._set_group_enabled(self.g_data, False)
+            self._set_group_enabled(self.g_play, False)
+            return
+
+        # 2) 영상만 로드
+        if video_loaded and not beh_ready:
+            self._set_group_enabled(self.g_file, True)
+            self._set_group_enabled(self.g_beh, True)
+            self._set_group_enabled(self.g_rec, False)
+            self._set_group_enabled(self.g_bm,  False)
+            self._set_group_enabled(self.g_data, False, exceptions=(self.btn_import,))
+            self._set_group_enabled(self.g_play, False)
+            return
+
+        # 3) 영상+Behavior 준비됨 → 기본은 모두 enabled
+        self._set_group_enabled(self.g_file, True)
+        self._set_group_enabled(self.g_beh, True)
+        self._set_group_enabled(self.g_rec, True)
+        self._set_group_enabled(self.g_bm,  True)
+        self._set_group_enabled(self.g_data, True)
+        self._set_group_enabled(self.g_play, True)
+
+        self._refresh_slot_title_styles(recording=False)
+
+        # 추가 규칙
+        if not recording and playing:
+            # 녹화 off + 재생중 → Recording만 잠금
+            self._set_group_enabled(self.g_rec, False)
+            return
+        if not recording and not playing:
+            # 녹화 off + 정지중 → 모두 활성 (이미 반영)
+            return
+        if recording and playing:
+            # 녹화 on + 재생중 → Recording, Bookmarks, Data, Playback(Play 제외) 비활성
+            self._set_group_enabled(self.g_rec,  False, exceptions=self._rec_info_labels())
+            self._set_group_enabled(self.g_bm,   False)
+            self._set_group_enabled(self.g_data, False)
+            self._set_group_enabled(self.g_play, False, exceptions=(self.btn_play,))
+            self._refresh_slot_title_styles(recording=True)
+            return
+        if recording and not playing:
+            # 녹화 on + 정지중 → Recording(체크박스 2개만 예외), Data 비활성
+            self._set_group_enabled(self.g_rec,  False, exceptions=(self.check_record, self.check_overlay, self.check_hud, self.btn_trace) + self._rec_info_labels())
+            self._set_group_enabled(self.g_bm,   False) 
+            self._set_group_enabled(self.g_data, False)
+            self._refresh_slot_title_styles(recording=True)
+            return
+
+    # ---------- helpers ----------
+    def _fmt_ms(self, ms):
+        s = int(ms // 1000); return f"{s//60:02d}:{s%60:02d}"
+
+    def _set_total_label_text(self, ms):
+        self.lbl_rec_total_title.setText(f"Total  ({self._fmt_ms(ms)})")
+
+    def _update_slot_title(self, i, ms=None):
+        """슬롯 제목을 'Slot N (mm:ss)'로 갱신."""
+        sl = self.slots[i]
+        if ms is None:
+            ms = sl['ms']
+            if sl['pressed']:
+                ms += max(0, self._ms_now() - sl['start_ms'])
+        self.slot_ui[i]['title'].setText(f"Slot {i+1}  ({self._fmt_ms(ms)})")
+
+    def _frame_ms(self, frame):
+        return int(self.timeline.ms(frame))
+
+    def _slot_valid(self, i):
+        return (self.slots[i]['key'] is not None) and (self.slots[i]['behavior'] is not None)
+
+    def _rebuild_key_index(self):
+        self.key_to_slot.clear()
+        for i, sl in enumerate(self.slots):
+            if sl['key'] is not None:
+                self.key_to_slot[sl['key']] = i
+
+    def _key_to_slot(self, event):
+        """(qt_key, scan) 우선 매칭, 실패 시 qt_key만으로 fallback."""
+        ktuple = (event.key(), event.nativeScanCode())
+        idx = self.key_to_slot.get(ktuple)
+        if idx is not None:
+            return idx
+        qk = event.key()
+        for i, sl in enumerate(self.slots):
+            if sl['key'] and sl['key'][0] == qk:
+                return i
+        return None
+
+    # ---------- folder/video ----------
+    def open_folder_dialog(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Video Folder")
+        if not folder: return
+        self.set_video_folder(folder)
+
+    def set_video_folder(self, folder: str):
+        files = list_videos_in(folder)
+        self._stop_folder_indexer()
+        self.folder_meta = {}
+        self.list_videos.clear()
+        for f in files:
+            it = QListWidgetItem(f)
+            it.setData(Qt.UserRole, f)
+            self.list_videos.addItem(it)
+        self.video_folder = folder
+        self._open_store()
+        # 메타데이터(fps/길이/해상도/코덱/라벨 유무)는 백그라운드에서 채운다
+        self.folder_indexer = FolderIndexer(folder, files, parent=self)
+        self.folder_indexer.metaReady.connect(self.on_folder_meta)
+        self.folder_indexer.start()
+        if self.check_proxy.isChecked():
+            self._start_proxy_builder()
+
+    def _stop_folder_indexer(self):
+        if self.folder_indexer:
+            self.folder_indexer.stop(); self.folder_indexer.wait()
+            self.folder_indexer = None
+
+    @property
+    def labels(self):
+        return self._labels
+
+    @labels.setter
+    def labels(self, value):
+        """라벨 객체가 바뀔 때마다 세대 번호 증가 (ethogram 캐시 키)."""
+        self._labels = value
+        self.labels_gen = getattr(self, 'labels_gen', 0) + 1
+
+    @staticmethod
+    def _item_name(item) -> str:
+        return item.data(Qt.UserRole) or item.text()
+
+    def on_folder_meta(self, name: str, meta: dict):
+        if self.sender() is not self.folder_indexer:
+            return
+        self.folder_meta[name] = meta
+        for i in range(self.list_videos.count()):
+            it = self.list_videos.item(i)
+            if self._item_name(it) == name:
+                it.setText(f"{name}\n{format_video_meta(meta)}")
+                break
+
+    def load_selected_video(self):
+        if not self._guard_unsaved("load a new video"):
+            return
+        item = self.list_videos.currentItem()
+        if not item: return
+        name = self._item_name(item)
+        self.current_video_path = name
+        path = os.path.join(self.video_folder, name)
+        if self.video_thread:
+            self.video_thread.stop(); self.video_thread.wait(); self.video_thread = None
+        self._drop_pending_frame()
+        self._close_journal()
+        # 폴더 인덱스 메타데이터가 최신이면 재사용, 아니면 디코더를 여기서 한 번 열어 워커에 넘긴다
+        meta, src = self.folder_meta.get(name), None
+        if meta:
+            try:
+                if meta.get('sig') is not None and meta['sig'] != _file_sig(path):
+                    meta = None
+            except OSError:
+                meta = None
+        if not meta:
+            try:
+                src = FrameSource(path)
+            except RuntimeError as e:
+                QMessageBox.warning(self, "Error", str(e)); return
+            fps = src.get(cv2.CAP_PROP_FPS) or 30.0
+            frames = int(src.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
+            meta = {'fps': fps, 'frames': frames, 'duration': frames / fps,
+                    'width': int(src.get(cv2.CAP_PROP_FRAME_WIDTH)), 'height': int(src.get(cv2.CAP_PROP_FRAME_HEIGHT))}
+        self.video_thread = VideoThread(path, source=src, meta=meta)
+        # 키프레임/타임스탬프 인덱스: 캐시가 있으면 바로 적용(정확한 프레임 수), 없으면 백그라운드에서 생성
+        index = VideoIndex.load(path)
+        if index is not None:
+            self.timeline = FrameTimeline(meta['fps'], meta['frames'], index.pts_ms)
+            self.video_thread.set_keyframes(index.keyframes)
+            self.video_thread.set_timeline(self.timeline)
+        else:
+            self.timeline = FrameTimeline(meta['fps'], meta['frames'])
+        self.video_thread.frameReady.connect(self.on_frame_ready)
+        self.video_thread.finished.connect(self.on_video_finished)
+        self.video_thread.set_speed(self.spin_speed.value())
+        self.video_thread.set_direction(-1 if self.check_reverse.isChecked() else 1)
+        self.video_thread.set_lag_policy(self.cmb_lag.currentData())
+        self.video_thread.rateReport.connect(self.on_rate_report)
+        self.video_thread.scrubReady.connect(self.on_scrub_ready)
+        self.lbl_rate.setText("")
+        if self.check_proxy.isChecked():
+            self.video_thread.set_proxy(load_proxy(path) or "")
+            self.video_thread.set_use_proxy(self.view._zoom <= 1.0)
+            if self.proxy_builder:
+                self.proxy_builder.prioritize(path)
+        self.video_thread.start()
+        # 썸네일 필름스트립: 캐시가 있으면 즉시, 없으면 worker pool로 생성
+        self._stop_thumb_job()
+        self.filmstrip.clear()
+        self.thumb_job = ThumbnailJob(path, parent=self)
+        self.thumb_job.progress.connect(self.filmstrip.set_progress)
+        self.thumb_job.thumbsReady.connect(self.on_thumbs_ready)
+        self.thumb_job.start()
+        if self.indexer:
+            self.indexer.stop()
+            self.indexer = None
+        if index is None:
+            self.indexer = VideoIndexer(path, self)
+            self.indexer.indexReady.connect(self.on_index_ready)
+            self.indexer.start()
+
+        self.fps = meta['fps']
+        self.total_frames = self.timeline.total_frames
+        self.video_size = (meta['width'], meta['height'])
+
+        self.slider.setRange(0, max(0, self.total_frames - 1))
+        self.slider.setValue(0)
+        self.current_frame_idx = 0
+        self._fit_initialized = False
+        if self.video_size[0] > 0:
+            self.view.set_content_size(*self.video_size)   # → targetSizeChanged → 워커 축소 크기
+        self.update_time_labels(0)
+
+        self.video_loaded = True
+
+        # reset behaviors/flags when loading new video
+        self.behaviors = []
+        self.labels = None
+        self.behavior_durations = []
+        self.edit_behaviors.setEnabled(True)
+        # reset slots
+        for i, sl in enumerate(self.slots):
+            sl.update({'key': None, 'behavior': None, 'ms': 0, 'pressed': False, 'start_ms': 0, 'start_frame': 0})
+            self.slot_ui[i]['keylab'].setText("-")
+            self._update_slot_title(i, 0)
+            self.slot_ui[i]['cmb'].clear(); self.slot_ui[i]['cmb'].addItem("(None)")
+            if 'title' in self.slot_ui[i]:
+                self.slot_ui[i]['title'].setStyleSheet("color: gray;")
+        # 총 타이머 00:00
+        self.record_total_ms = 0
+        self._set_total_label_text(0)
+        self._rebuild_key_index()
+        # overlay reposition on first frame
+        self._position_overlays()
+        # request first frame
+        if self.video_thread: self.video_thread.seek(0)
+        self.data_modified = False
+        # 이전 세션의 사이드카(<stem>.mbti) + 저널이 있으면 바로 복원
+        self._restore_session(path)
+        self.apply_no_focus()
+        self.update_ui_state()
+        self._refresh_slot_title_styles(recording=False)
+
+    def _restore_session(self, video_path: str):
+        behaviors, labels, res = [], None, None
+        if self.store:
+            try:
+                res = self.store.load_labels(self.current_video_path)
+            except sqlite3.Error as e:
+                print("Project DB load error:", e)
+        sc = label_sidecar_path(video_path)
+        # DB가 꺼져 있을 때 내보낸 사이드카가 DB 행보다 새로우면 사이드카를 쓴다
+        if os.path.exists(sc) and (res is None or os.path.getmtime(sc) > res['updated']):
+            try:
+                res = read_label_sidecar(sc)
+            except Exception as e:
+                print("Sidecar load error:", e)
+        # 다른 영상 길이 → 자동 복원하지 않음(Import로 직접)
+        if res and res['total_frames'] == self.total_frames and res['behaviors']:
+            behaviors, labels = res['behaviors'], res['labels']
+        base = list(behaviors)
+        journal = LabelJournal(label_journal_path(video_path))
+        events, valid = 0, None
+        if os.path.exists(journal.autosave_path):   # 저장되지 않은 변경의 스냅샷 → 저장본 대신 기준으로
+            try:
+                snap = read_label_sidecar(journal.autosave_path)
+                if snap['total_frames'] == self.total_frames and snap['behaviors']:
+                    behaviors, labels = snap['behaviors'], snap['labels']
+                    events += 1
+            except Exception as e:
+                print("Autosave load error:", e)
+        for p in (journal.old_path, journal.path):
+            if not os.path.exists(p):
+                continue
+            try:
+                behaviors, labels, n, end = LabelJournal.replay(p, behaviors, labels, self.total_frames)
+            except OSError as e:
+                print("Journal replay error:", e); continue
+            events += n
+            if p == journal.path:
+                valid = end
+        if behaviors:
+            self.edit_behaviors.setText(", ".join(behaviors))
+            self._apply_behaviors(behaviors)
+            if labels.total_frames != self.total_frames:
+                labels = labels.resized(self.total_frames)
+            self.labels = labels
+            self.behavior_durations = self._label_ms()
+        try:
+            journal.open(self.behaviors, self.total_frames, valid)
+            self.journal = journal
+        except OSError as e:
+            print("Journal open error:", e)   # 읽기 전용 폴더 등 → 저널 없이 진행
+        if events or behaviors != base:
+            self.data_modified = True
+            QMessageBox.information(self, "Recovered",
+                                    "Unsaved labels from the previous session were recovered.\nExport to keep them.")
+            self._checkpoint(wait=True)
+
+    # ---------- label journal ----------
+    def _mark(self, bi: int, s: int, e: int, value: int = 1):
+        """라벨 변경은 여기로: 메모리 반영 + 저널 기록."""
+        self.labels.set_range(bi, s, e, value)
+        self.ethogram.invalidate_frames(bi, min(s, e), max(s, e))
+        if self.journal:
+            self.journal.set_range(bi, s, e, value)
+
+    def _journal_tick(self):
+        if not self.journal:
+            return
+        try:
+            self.journal.sync_in_background()
+            if self.journal.size() > JOURNAL_COMPACT_BYTES:
+                self._checkpoint()
+        except OSError as e:
+            print("Journal error:", e)
+
+    def _wait_compactor(self):
+        if self.compactor:
+            self.compactor.wait()
+            if self.compactor.error:
+                print("Journal compaction error:", self.compactor.error)
+            self.compactor = None
+
+    def _checkpoint(self, wait: bool = False):
+        """저널을 회전하고 현재 라벨 스냅샷을 백그라운드에서 autosave로 기록.
+        저장본(<stem>.mbti, 프로젝트 DB)은 Export/저장 때만 쓴다. wait=True면 끝날 때까지 기다림."""
+        if not self.journal or not self.labels:
+            return
+        if self.compactor and self.compactor.isRunning() and not wait:
+            return
+        self._wait_compactor()
+        old = self.journal.rotate()
+        self.compactor = LabelCompactor(self.journal.autosave_path, old, self.current_video_path,
+                                        self.fps, self.behaviors, self.labels.copy(), self)
+        self.compactor.start()
+        if wait:
+            self._wait_compactor()
+
+    # ---------- project DB ----------
+    def _open_store(self):
+        if self.store:
+            self.store.close()
+            self.store = None
+        if not (self.check_project.isChecked() and self.video_folder):
+            return
+        try:
+            self.store = ProjectStore.for_folder(self.video_folder)
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Project DB", f"Cannot open project database:\n{e}")
+            self.check_project.setChecked(False)
+
+    def on_project_toggled(self, on: bool):
+        self._open_store()
+        if self.store and self.video_loaded and not self.data_modified:
+            self._store_labels()   # 저장된 상태만 (저장 안 된 변경은 Export 때)
+
+    def _store_labels(self):
+        """현재 라벨 상태를 프로젝트 DB에 반영 (저장/Export 때만 → DB에는 저장된 상태만 있다)."""
+        if not (self.store and self.labels and self.behaviors and self.current_video_path):
+            return
+        try:
+            self.store.save_labels(self.current_video_path, self.fps, self.behaviors, self.labels, self.timeline)
+        except sqlite3.Error as e:
+            print("Project DB save error:", e)
+
+    def _close_journal(self):
+        self._wait_compactor()
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+
+    def on_index_ready(self, path: str, index):
+        if self.video_thread and self.video_thread.video_path == path:
+            self.video_thread.set_keyframes(index.keyframes)
+            self._apply_timeline(FrameTimeline(self.fps, self.total_frames, index.pts_ms))
+
+    def _apply_timeline(self, timeline):
+        """실제 타임스탬프로 교체. 컨테이너 추정 프레임 수와 다르면 슬라이더/라벨/저널도 맞춘다."""
+        self.timeline = timeline
+        self.video_thread.set_timeline(timeline)
+        n = timeline.total_frames
+        if n != self.total_frames:
+            self.total_frames = n
+            self.slider.setRange(0, max(0, n - 1))
+            if self.filmstrip.strip is not None:
+                self.filmstrip.set_strip(self.filmstrip.strip, n)
+            if self.labels is not None:
+                self.labels = self.labels.resized(n)
+                if self.journal:
+                    self.journal.declare(self.behaviors, n)
+        if self.labels is not None:
+            self.behavior_durations = self._label_ms()
+        self.update_time_labels(self.current_frame_idx)
+
+    def _label_ms(self):
+        """behavior별 라벨 시간(ms, 실제 프레임 시각 기준)."""
+        return [int(round(self.timeline.total_ms(self.labels.bout_table(bi))))
+                for bi in range(self.labels.n_behaviors)]
+
+    # ---------- playback ----------
+    def toggle_play_pause(self):
+        if not self.video_loaded or not self.video_thread: return
+        if getattr(self, 'is_playing', False):
+            self.video_thread.pause(); self.is_playing = False; self.btn_play.setText("Play")
+        else:
+            if self.check_reverse.isChecked():
+                if self.current_frame_idx <= 0:
+                    self.video_thread.seek(self.total_frames - 1)
+            elif self.current_frame_idx >= max(0, self.total_frames - 1):
+                self.video_thread.seek(0)
+            self.video_thread.play(); self.is_playing = True; self.btn_play.setText("Pause")
+        self.update_ui_state()
+
+    def on_slider_pressed(self):
+        self._scrub_target = None
+        if self.video_thread and getattr(self, 'is_playing', False):
+            self.video_thread.pause()
+
+    def on_slider_moved(self, value):
+        if not self.video_loaded or not self.video_thread: return
+        if self.recording and self.record_start_frame is not None and value < self.record_start_frame:
+            value = self.record_start_frame
+        if self.recording and any(sl['pressed'] for sl in self.slots):
+            return
+        # 드래그 중엔 빠른 근사 화면만(최신 요청만 처리됨), 정확한 seek은 놓을 때 한 번
+        self._scrub_target = int(value)
+        self.video_thread.scrub(int(value))
+
+    def on_slider_released(self):
+        if not self.video_thread: return
+        if getattr(self, '_scrub_target', None) is not None:
+            self.video_thread.seek(self._scrub_target)
+            self._scrub_target = None
+        if getattr(self, 'is_playing', False):
+            self.video_thread.play()
+
+    def on_scrub_ready(self, frame, frame_index: int, t_request: float):
+        ms = (time.monotonic() - t_request) * 1000.0
+        self._drop_pending_frame()   # 재생 중 받아 둔 이전 프레임이 scrub 화면을 덮지 않게
+        self._show_frame(frame)
+        self.current_frame_idx = frame_index
+        self.update_time_labels(frame_index)
+        self.filmstrip.set_position(frame_index)
+        self.ethogram.set_position(frame_index)
+        self.scrub_latency.append(ms)
+        now = time.perf_counter()
+        PERF.record("scrub", now - ms / 1000.0, now)   # t_request는 monotonic 기준
+        med = sorted(self.scrub_latency)[len(self.scrub_latency) // 2]
+        self.lbl_rate.setText(f"Scrub: {ms:.0f} ms (median {med:.0f} ms)")
+
+    def _show_frame(self, frame):
+        """PooledFrame을 화면에 올리고 release. return 원본 기준 크기 (w, h)."""
+        size = self.video_size if self.video_size[0] > 0 else (frame.image.width(), frame.image.height())
+        # 축소된 프레임도 씬에서는 원본 크기를 차지하도록 (뷰 배율/줌 계산은 원본 기준 그대로)
+        self.pix_item.setScale(size[0] / max(1, frame.image.width()))
+        with PERF.span("pixmap"):
+            pm = QPixmap.fromImage(frame.image)   # 여기서 한 번 복사 → 버퍼 반납
+        self.pix_item.setPixmap(pm)
+        frame.release()
+        self.scene.setSceneRect(self.pix_item.sceneBoundingRect())
+        return size
+
+    def on_frame_ready(self, frame, frame_index: int):
+        """데이터 경로: 현재 위치, 라벨 기록, 제한시간 확인은 프레임마다.
+        화면 갱신(픽스맵/슬라이더/라벨/타이머)은 _present로 모아 화면 주사율(또는 상한)로만."""
+        t_in = time.perf_counter()
+        self.current_frame_idx = frame_index
+        if frame is not None:   # None = 재생 시계가 화면만 드롭한 프레임(라벨/위치는 그대로 갱신)
+            if frame.emitted:
+                PERF.record("signal queue", frame.emitted, t_in)
+            if self._pending_frame is not None:
+                self._pending_frame.release()   # 아직 안 보여 준 이전 프레임은 건너뜀
+                PERF.count("frames coalesced")
+            self._pending_frame = frame
+        self._schedule_present()
+        # 기준(시작 프레임/시각/제한프레임)을 확정
+        if self.recording and self._record_arming_pending:
+            self.record_start_frame = self.current_frame_idx
+            self.record_start_ms = self._ms_now()
+            if self.spin_limit.value() > 0:
+                end_ms = self.timeline.ms(self.record_start_frame) + self.spin_limit.value() * 60000
+                self.record_limit_end_frame = self.timeline.frame_at(end_ms)
+            else:
+                self.record_limit_end_frame = None
+            self._set_total_label_text(0)
+            self._record_arming_pending = False
+
+        # 현재 프레임의 behavior를 0으로 초기화
+        # 눌려있는(slot.pressed) 슬롯의 behavior만 1로 설정
+        if (self.recording and getattr(self, 'is_playing', False)
+                and self.behaviors and self.labels
+                and 0 <= frame_index < self.total_frames):
+            # 이번 세션에서 측정할 행동 컬럼(슬롯에 지정된 것들): 눌린 슬롯만 1, 나머지 0
+            for sl in self.slots:
+                bi = sl['behavior']
+                if bi is not None:
+                    v = 1 if sl['pressed'] else 0
+                    if self.labels.get(bi, frame_index) != v:   # 바뀔 때만 저널에 남김
+                        self._mark(bi, frame_index, frame_index, v)
+                    if v and sl.get('key_t'):
+                        PERF.record("key→label", sl['key_t'])   # 키 누름 → 첫 라벨 기록
+                        sl['key_t'] = None
+            self.data_modified = True
+        
+        # 제한시간 도달 시 자동 정지
+        if (self.recording and
+            self.record_limit_end_frame is not None and
+            frame_index >= self.record_limit_end_frame):
+            if self.video_thread:
+                self.video_thread.pause()
+                self.is_playing = False
+            # 체크박스 해제 → stop_recording() 호출
+            self.check_record.blockSignals(True)
+            self.check_record.setChecked(False)
+            self.check_record.blockSignals(False)
+            self.stop_recording()
+        PERF.record("on_frame_ready", t_in)
+
+    # ---------- presentation (coalesced) ----------
+    def _present_interval_ms(self) -> float:
+        screen = QApplication.primaryScreen()
+        hz = screen.refreshRate() if screen else 60.0
+        return 1000.0 / max(1.0, min(hz or 60.0, float(self.spin_ui_fps.value())))
+
+    def _schedule_present(self):
+        if self.present_timer.isActive():
+            return
+        wait = self._last_present + self._present_interval_ms() / 1000.0 - time.monotonic()
+        self.present_timer.start(max(0, int(wait * 1000)))
+
+    def _drop_pending_frame(self):
+        self.present_timer.stop()
+        if self._pending_frame is not None:
+            self._pending_frame.release()
+            self._pending_frame = None
+
+    def _present(self):
+        """마지막으로 받은 프레임/위치만 화면에 반영."""
+        with PERF.span("present"):
+            self._present_now()
+
+    def _present_now(self):
+        self._last_present = time.monotonic()
+        frame_index = self.current_frame_idx
+        frame, self._pending_frame = self._pending_frame, None
+        if frame is not None:
+            size = self._show_frame(frame)
+            if not self._fit_initialized:
+                # 새 영상 첫 프레임에서만 뷰 기준 100% 적용
+                self.view.set_content_size(*size)
+                self.view.reset_to_100()
+                self._position_overlays()
+                self._fit_initialized = True
+        self.slider.blockSignals(True); self.slider.setValue(frame_index); self.slider.blockSignals(False)
+        self.filmstrip.set_position(frame_index)
+        self.ethogram.set_position(frame_index)
+        self.update_time_labels(frame_index)
+
+        # recording timers live update
+        if self.recording and self.record_start_ms is not None:
+            running = max(0, self._ms_now() - self.record_start_ms)
+            self._set_total_label_text(running)
+            # per-slot display (include ongoing press)
+            for i, sl in enumerate(self.slots):
+                disp = sl['ms']
+                if sl['pressed']:
+                    disp += max(0, self._ms_now() - sl['start_ms'])
+                self._update_slot_title(i, disp)
+
+    def on_video_finished(self):
+        self.is_playing = False
+        self.btn_play.setText("Play")
+        # 레코딩 중이면 안전하게 종료 + 체크박스 해제
+        if self.recording:
+            self.check_record.blockSignals(True)
+            self.check_record.setChecked(False)
+            self.check_record.blockSignals(False)
+            self.stop_recording()
+        self.update_ui_state()
+
+    def update_time_labels(self, frame_index: int):
+        self.lbl_frame.setText(f"Frame: {frame_index:04d} / {self.total_frames:04d}")
+        if self.total_frames:
+            tot_s = int(self.timeline.duration_ms() / 1000)
+            cur_s = int(self.timeline.ms(frame_index) / 1000)
+            self.lbl_time.setText(f"Time: {cur_s//60:02d}:{cur_s%60:02d} / {tot_s//60:02d}:{tot_s%60:02d}")
+        else:
+            self.lbl_time.setText("Time: --:-- / --:--")
+
+    def on_speed_changed(self, value):
+        v = float(value)
+        if self.video_thread:
+            self.video_thread.set_speed(v)
+
+    def on_view_target_size(self, w: int, h: int):
+        if not self.video_thread:
+            return
+        # 확대해서 보는 중엔 원본만
+        self.video_thread.set_use_proxy(self.check_proxy.isChecked() and self.view._zoom <= 1.0)
+        # 휠 한 번의 연속 줌/리사이즈는 마지막 크기만 적용 (캐시 폐기는 한 번)
+        self._target_size = (w, h)
+        if not self.video_loaded:
+            self._apply_view_target_size()
+        else:
+            self.target_size_timer.start()
+
+    def _apply_view_target_size(self):
+        if not self.video_thread or self._target_size is None:
+            return
+        self.video_thread.set_target_size(*self._target_size)
+        self._target_size = None
+        if self.video_loaded and not getattr(self, 'is_playing', False):
+            self.video_thread.seek(self.current_frame_idx)   # 정지 화면도 새 해상도로
+
+    # ---------- filmstrip ----------
+    def _stop_thumb_job(self):
+        if self.thumb_job:
+            self.thumb_job.stop(); self.thumb_job.wait()
+            self.thumb_job = None
+
+    def on_thumbs_ready(self, video_path: str, strip):
+        if self.current_video_path and video_path == os.path.join(self.video_folder, self.current_video_path):
+            self.filmstrip.set_strip(strip, self.total_frames)
+            self.filmstrip.set_position(self.current_frame_idx)
+            self.ethogram.set_position(self.current_frame_idx)
+
+    def on_filmstrip_clicked(self, frame: int):
+        if not self.video_loaded or not self.video_thread or not self.slider.isEnabled(): return
+        if self.recording and self.record_start_frame is not None and frame < self.record_start_frame:
+            frame = self.record_start_frame
+        if self.recording and any(sl['pressed'] for sl in self.slots):
+            return
+        self.video_thread.seek(frame)
+
+    # ---------- proxy ----------
+    def _folder_video_paths(self):
+        return [os.path.join(self.video_folder, self._item_name(self.list_videos.item(i)))
+                for i in range(self.list_videos.count())]
+
+    def _start_proxy_builder(self):
+        self._stop_proxy_builder()
+        paths = self._folder_video_paths()
+        if not paths:
+            return
+        self.proxy_builder = ProxyBuilder(paths, self)
+        self.proxy_builder.progress.connect(self.on_proxy_progress)
+        self.proxy_builder.proxyReady.connect(self.on_proxy_ready)
+        self.proxy_builder.finished.connect(lambda: self.check_proxy.setText("Proxy mode"))
+        if self.current_video_path:
+            self.proxy_builder.prioritize(os.path.join(self.video_folder, self.current_video_path))
+        self.proxy_builder.start()
+
+    def _stop_proxy_builder(self):
+        if self.proxy_builder:
+            self.proxy_builder.stop(); self.proxy_builder.wait()
+            self.proxy_builder = None
+        self.check_proxy.setText("Proxy mode")
+
+    def on_proxy_toggled(self, checked):
+        if checked:
+            self._start_proxy_builder()
+        else:
+            self._stop_proxy_builder()
+        if self.video_thread:
+            if checked and self.current_video_path:
+                self.video_thread.set_proxy(load_proxy(os.path.join(self.video_folder, self.current_video_path)) or "")
+            self.video_thread.set_use_proxy(checked and self.view._zoom <= 1.0)
+
+    def on_proxy_progress(self, video_path: str, pct: int):
+        self.check_proxy.setText(f"Proxy mode (building {os.path.basename(video_path)} {pct}%)")
+
+    def on_proxy_ready(self, video_path: str, proxy: str):
+        if (self.video_thread and self.current_video_path
+                and os.path.abspath(video_path) == os.path.abspath(os.path.join(self.video_folder, self.current_video_path))):
+            self.video_thread.set_proxy(proxy)
+
+    def on_lag_policy_changed(self, _):
+        if self.video_thread:
+            self.video_thread.set_lag_policy(self.cmb_lag.currentData())
+
+    def on_rate_report(self, achieved: float, requested: float, dropped: int):
+        text = f"Rate: {achieved:.2f}× / {requested:.1f}×"
+        if dropped:
+            text += f"  ({dropped} frames not drawn)"
+        self.lbl_rate.setText(text)
+
+    def on_reverse_toggled(self, checked):
+        # 녹화는 정방향에서만: 시간/구간 계산이 진행 방향을 전제로 함
+        if checked and self.recording:
+            self.check_reverse.blockSignals(True)
+            self.check_reverse.setChecked(False)
+            self.check_reverse.blockSignals(False)
+            return
+        if self.video_thread:
+            self.video_thread.set_direction(-1 if checked else 1)
+
+    # ---------- behaviors ----------
+    def define_behaviors(self):
+        if not self.video_loaded: return
+        # 가드: 기존 behavior가 있고 저장되지 않은 변경이 있으면 확인
+        if self.behaviors and not self._guard_unsaved("change behaviors"):
+            return
+        text = self.edit_behaviors.text().strip()
+        if not text: return
+        names = []
+        for t in [s.strip() for s in text.split(',') if s.strip()]:
+            if t not in names: names.append(t)
+        self._apply_behaviors(names)
+        if self.journal:
+            self.journal.declare(names, self.total_frames, reset=True)
+
+        # prepare overlays text to match slot behavior name at press time (dynamic)
+        QMessageBox.information(self, "Behaviors Set", "Behaviors defined. Assign physical keys per slot.")
+        self.update_ui_state()
+        self._refresh_slot_title_styles(recording=self.recording)
+
+    def _apply_behaviors(self, names):
+        """behavior 목록 확정 → 빈 라벨 + 슬롯/타이머 초기화 (확인창 없음)."""
+        self.behaviors = list(names)
+        n = len(names)
+        self.labels = BoutLabels(n, self.total_frames)
+        self.behavior_durations = [0]*n
+
+        # populate slot combos with "(None) + behaviors"  + 슬롯 상태 초기화
+        for s in self.slot_ui:
+            s['cmb'].blockSignals(True)
+            s['cmb'].clear(); s['cmb'].addItem("(None)")
+            s['cmb'].addItems(self.behaviors)
+            s['cmb'].blockSignals(False)
+        for i, sl in enumerate(self.slots):
+            # behavior만 리셋(키는 유지), 시간/표시 초기화
+            sl['behavior'] = None
+            sl['ms'] = 0
+            sl['pressed'] = False
+            self._update_slot_title(i, 0)
+            if 'title' in self.slot_ui[i]:
+                self.slot_ui[i]['title'].setStyleSheet("color: gray;")
+            self._set_overlay_text(i, "")
+            self.overlay_labels[i].hide()
+            # 콤보 (None)으로 고정
+            self.slot_ui[i]['cmb'].blockSignals(True)
+            self.slot_ui[i]['cmb'].setCurrentIndex(0)
+            self.slot_ui[i]['cmb'].blockSignals(False)
+        # 총 타이머 00:00
+        self.record_total_ms = 0
+        self._set_total_label_text(0)
+
+        # enable export/preview only when there is data later
+        self.btn_preview.setEnabled(True)
+        self.btn_export.setEnabled(True)
+
+    def on_slot_behavior_changed(self, slot_idx: int):
+        """슬롯의 behavior 콤보가 바뀌었을 때: 중복 가드 + 색 갱신."""
+        if slot_idx < 0 or slot_idx >= len(self.slot_ui):
+            return
+        cmb = self.slot_ui[slot_idx]['cmb']
+        text = cmb.currentText().strip()
+
+        # "(None)" 처리
+        if text == "(None)":
+            sl = self.slots[slot_idx]
+            # 진행 중이면 즉시 중단/오버레이 off
+            if sl.get('pressed'):
+                sl['pressed'] = False
+                if self.check_overlay.isChecked():
+                    self.overlay_labels[slot_idx].hide()
+            # behavior 해제 + 시간 리셋
+            sl['behavior'] = None
+            sl['ms'] = 0
+            # 색: 미지정 → 회색
+            if 'title' in self.slot_ui[slot_idx]:
+                self.slot_ui[slot_idx]['title'].setStyleSheet("color: gray;")
+                self._update_slot_title(slot_idx, 0)
+            # 오버레이 텍스트도 정리
+            self._set_overlay_text(slot_idx, "")
+            return
+
+        # 문자열을 behaviors 인덱스로 매핑
+        try:
+            bi = self.behaviors.index(text)
+        except ValueError:
+            # 정의되지 않은 이름이 들어왔다면 안전하게 해제
+            cmb.setCurrentIndex(0)
+            return
+
+        # 중복 행동 가드: 다른 슬롯이 이미 같은 behavior를 사용 중이면 금지
+        for i, sl in enumerate(self.slots):
+            if i != slot_idx and sl.get('behavior') == bi:
+                QMessageBox.warning(self, "Duplicate behavior",
+                                    f"'{text}' is already assigned to Slot {i+1}.")
+                cmb.blockSignals(True)
+                cmb.setCurrentIndex(0)  # (None)으로 되돌림
+                cmb.blockSignals(False)
+                # 회색으로 반영
+                if 'title' in self.slot_ui[slot_idx]:
+                    self.slot_ui[slot_idx]['title'].setStyleSheet("color: gray;")
+                self.slots[slot_idx]['behavior'] = None
+                self._set_overlay_text(slot_idx, "")
+                return
+
+        # 정상 할당: 슬롯에 behavior 인덱스 저장
+        sl = self.slots[slot_idx]
+        # 진행 중이면 즉시 중단/오버레이 off
+        if sl.get('pressed'):
+            sl['pressed'] = False
+            if self.check_overlay.isChecked():
+                self.overlay_labels[slot_idx].hide()
+        sl['behavior'] = bi
+        sl['ms'] = 0
+        # 색: 지정됨 → 검정
+        if 'title' in self.slot_ui[slot_idx]:
+            self.slot_ui[slot_idx]['title'].setStyleSheet("color: black;")
+            self._update_slot_title(slot_idx, 0)
+        # 오버레이 텍스트 갱신
+        self._set_overlay_text(slot_idx, text)
+        # 상태에 맞춰 다른 라벨 색도 재정렬(녹화 중/아닐 때 규칙 유지)
+        self._refresh_slot_title_styles(recording=self.recording)
+        # 필요 시 UI 상태 갱신
+        self.update_ui_state()
+
+    # ---------- capture (per-slot & multi) ----------
+    def start_capture(self, slot_idx):
+        self.check_record.setEnabled(False)
+        if self.recording:
+            QMessageBox.information(self, "Locked", "Cannot capture keys during recording.")
+            return
+        self.pending_key_capture = slot_idx
+        self.slot_ui[slot_idx]['keylab'].setText("Press any key...")
+        self.activateWindow(); self.raise_()
+        self.setFocus(Qt.ActiveWindowFocusReason)
+        self.grabKeyboard()
+
+    # ---------- recording ----------
+    def on_record_toggled(self, state):
+        if state == Qt.Checked:
+            if not self.start_recording():
+                # 시작 실패 시 체크 되돌림
+                self.check_record.setChecked(False)
+        else:
+            self.stop_recording()
+        self.update_ui_state()
+
+    def _validate_recording_ready(self):
+        # behavior가 선택된 슬롯만 검사
+        beh_slots = [i for i in range(self.SLOTS) if self.slots[i]['behavior'] is not None]
+        if not beh_slots:
+            QMessageBox.warning(self, "Invalid", "Select at least one behavior for a slot.")
+            return False
+        # 선택된 behavior 슬롯은 반드시 키가 있어야 함
+        missing = [i+1 for i in beh_slots if self.slots[i]['key'] is None]
+        if missing:
+            QMessageBox.warning(self, "Invalid", f"Slots with a behavior must have a physical key (check slots: {missing}).")
+            return False
+        # 중복 체크(선택된 behavior 슬롯끼리만)
+        keys = [self.slots[i]['key'] for i in beh_slots]
+        if len(set(keys)) != len(keys):
+            QMessageBox.warning(self, "Invalid", "Duplicate physical keys across behavior-assigned slots.")
+            return False
+        behs = [self.slots[i]['behavior'] for i in beh_slots]
+        if len(set(behs)) != len(behs):
+            QMessageBox.warning(self, "Invalid", "Behaviors must be unique across slots.")
+            return False
+        return True
+
+    def start_recording(self):
+        self.update_ui_state()
+        if not self.behaviors:
+            QMessageBox.warning(self, "No Behaviors", "Define behaviors first.")
+            return False
+        if not self._validate_recording_ready():
+            return False
+
+        selected_beh_indices = [sl['behavior'] for sl in self.slots if sl['behavior'] is not None]
+        already_labeled = []
+        for bi in selected_beh_indices:
+            # 해당 행동 컬럼에 1이 한 번이라도 있으면 과거 라벨 존재로 간주
+            if bi is not None and self.labels.any(bi):
+                already_labeled.append(bi)
+        if already_labeled:
+            names = ", ".join(self.behaviors[bi] for bi in sorted(set(already_labeled)))
+            box = QMessageBox(self)
+            box.setWindowTitle("Confirm re-measure")
+            box.setIcon(QMessageBox.Warning)
+            box.setText(f"The following behaviors already have labels:\n{names}\n\n"
+                        "Continuing will overwrite these behaviors on frames you pass during this session.\n"
+                        "Do you want to continue?")
+            btn_yes = box.addButton("Continue", QMessageBox.AcceptRole)
+            btn_cancel = box.addButton("Cancel", QMessageBox.RejectRole)
+            box.exec_()
+            if box.clickedButton() is btn_cancel:
+                return False
+
+        # reset timers
+        self.record_total_ms = 0
+        self._set_total_label_text(0)
+        for i, sl in enumerate(self.slots):
+            sl['ms'] = 0
+            self._update_slot_title(i, 0)
+
+        # 녹화는 정방향 재생만 허용
+        if self.check_reverse.isChecked():
+            self.check_reverse.setChecked(False)
+
+        # mark state
+        self.recording = True
+        self.record_started_at = time.time()
+        # 바로 고정하지 않고, 다음 on_frame_ready에서 확정
+        self.record_start_frame = None
+        self.record_start_ms = None
+        self.record_limit_end_frame = None
+        self._record_arming_pending = True
+
+        self._rebuild_key_index()
+        self.update_ui_state()
+        return True
+
+    def stop_recording(self):
+        if not self.recording: return
+        # finalize any pressed slots
+        any_finalized = False
+        for i, sl in enumerate(self.slots):
+            if sl['pressed'] and sl['behavior'] is not None:
+                bi = sl['behavior']
+                end_ms = self._ms_now()
+                dur = max(0, end_ms - sl['start_ms'])
+                sl['ms'] += dur
+                self.behavior_durations[bi] += dur
+                self._mark(bi, sl['start_frame'], self.current_frame_idx)
+                sl['pressed'] = False
+                if self.check_overlay.isChecked():
+                    self.overlay_labels[i].hide()
+                any_finalized = True
+            # update UI time
+            self._update_slot_title(i)
+
+        # keep total timer label (do not reset)
+        if self.record_start_ms is not None:
+            self.record_total_ms = max(0, self._ms_now() - self.record_start_ms)
+            self._set_total_label_text(self.record_total_ms)
+
+        self.recording = False
+        self._record_arming_pending = False
+        self.record_limit_end_frame = None
+        if any_finalized:
+            self.data_modified = True
+        if self.store and self.record_start_frame is not None:
+            try:
+                self.store.add_session(self.current_video_path, self.record_start_frame, self.current_frame_idx,
+                                       self.record_started_at, time.time())
+            except sqlite3.Error as e:
+                print("Project DB session error:", e)
+        self.update_ui_state()
+
+    def _ms_now(self):
+        # use frame timestamps for stability with video timing
+        return self._frame_ms(self.current_frame_idx) if self.total_frames else int(time.time()*1000)
+
+    # ---------- bookmarks ----------
+    def add_bookmark(self):
+        f = int(self.current_frame_idx)
+        mm, ss = divmod(int(self.timeline.ms(f) / 1000), 60)
+        text = f"Frame {f} ({mm:02d}:{ss:02d})"
+        # 중복 방지: 데이터(UserRole)로 비교
+        for i in range(self.list_bookmarks.count()):
+            it = self.list_bookmarks.item(i)
+            if it.data(Qt.UserRole) == f:
+                return
+        it = QListWidgetItem(text)
+        it.setData(Qt.UserRole, f)
+        self.list_bookmarks.addItem(it)
+
+    def jump_to_bookmark(self):
+        item = self.list_bookmarks.currentItem()
+        if not item or not self.video_thread: return
+        # 저장된 프레임 번호를 직접 사용(파싱 불필요)
+        frame = item.data(Qt.UserRole)
+        if frame is None:
+            # 구버전 북마크(문자열만 저장) 호환
+            parts = item.text().split()
+            try: frame = int(parts[1])
+            except: return
+        # 녹화 중엔 시작 프레임 이전으로 점프 금지(설계대로 클램프)
+        if self.recording and self.record_start_frame is not None:
+            frame = max(frame, self.record_start_frame)
+        # 범위 보정 후 실제 점프
+        frame = max(0, min(int(frame), self.total_frames - 1))
+        self.video_thread.seek(frame)
+
+    def delete_bookmark(self):
+        for it in self.list_bookmarks.selectedItems():
+            self.list_bookmarks.takeItem(self.list_bookmarks.row(it))
+
+    # ---------- preview/import/export (lightweight CSV) ----------
+    def preview_result(self):
+        if not self.behaviors or not self.labels:
+            QMessageBox.information(self, "Preview", "No data to preview.")
+            return
+        dlg = QDialog(self); dlg.setWindowTitle("Preview Result")
+        dlg.setMinimumSize(900, 600)
+        v = QVBoxLayout(dlg)
+        meta = QWidget(dlg)
+        meta.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        meta_v = QVBoxLayout(meta); meta_v.setContentsMargins(0,0,0,0)
+        # 상단 요약
+        video_name = self._item_name(self.list_videos.currentItem()) if self.list_videos.currentItem() else "N/A"
+        hdr = QLabel(f"<b>Video:</b> {video_name} &nbsp;&nbsp; "
+                     f"<b>Frames:</b> {self.total_frames} &nbsp;&nbsp; "
+                     f"<b>FPS:</b> {self.fps:.2f}")
+        meta_v.addWidget(hdr)
+        lines = []
+        totals, totals_ms = self.labels.totals(), self._label_ms()
+        for i, name in enumerate(self.behaviors):
+            lines.append(f"{name}: {totals[i]} frames (~{totals_ms[i] / 1000.0:.2f}s)")
+        meta_v.addWidget(QLabel("<b>Totals per behavior</b><br>" + "<br>".join(lines)))
+        
+        # 하단 테이블: 0..last 모든 프레임 (가상 모델 → 보이는 셀만 그때그때 읽음)
+        opts = QHBoxLayout()
+        opts.addWidget(QLabel(f"All frames: 0 .. {self.total_frames-1}"))
+        opts.addStretch(1)
+        chk_bouts = QCheckBox("Bouts only")
+        opts.addWidget(chk_bouts)
+        meta_v.addLayout(opts)
+        v.addWidget(meta, 0)  # stretch 0 → 메타는 그대로, 아래 테이블만 늘어남
+        table = QTableView(dlg)
+        frame_model = LabelTableModel(self.labels, self.behaviors, table)
+        bout_model = None  # 체크했을 때 처음 생성
+        # 작은 폰트/행높이/스크롤
+        small_font = table.font(); small_font.setPointSize(9)
+        table.setFont(small_font)
+        table.verticalHeader().setDefaultSectionSize(16)  # 행 높이
+        table.setAlternatingRowColors(True)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+
+        def use_model(model):
+            table.setModel(model)
+            # 첫 컬럼은 내용 기준, 나머지는 스트레치
+            hh = table.horizontalHeader()
+            hh.setSectionResizeMode(0, QHeaderView.ResizeToContents)
+            for c in range(1, model.columnCount()):
+                hh.setSectionResizeMode(c, QHeaderView.Stretch)
+
+        def on_bouts_toggled(checked):
+            nonlocal bout_model
+            if checked and bout_model is None:
+                bout_model = BoutTableModel(self.labels, self.behaviors, self.timeline, table)
+            use_model(bout_model if checked else frame_model)
+        chk_bouts.toggled.connect(on_bouts_toggled)
+        use_model(frame_model)
+        # 테이블은 가로/세로 모두 Expanding
+        table.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        table.setMinimumHeight(240)
+        v.addWidget(table, 1)  # stretch 1 → 세로 여유를 전부 테이블이 가져감
+        dlg.resize(1000, 700)
+        dlg.exec_()
+
+    def compare_reliability(self):
+        """현재 라벨을 다른 채점자의 라벨 파일(들)과 비교."""
+        if not self.behaviors or not self.labels:
+            QMessageBox.information(self, "Reliability", "No data to compare.")
+            return
+        paths, _ = QFileDialog.getOpenFileNames(self, "Compare with other raters", self.video_folder or "",
+                                                "Label Files (*.csv *.mbti);;CSV Files (*.csv);;MBTI Labels (*.mbti)")
+        if not paths: return
+        current = {'behaviors': list(self.behaviors), 'labels': self.labels, 'total_frames': self.total_frames}
+        try:
+            rows = compare_raters([current] + [read_label_file(p) for p in paths])
+        except Exception as e:
+            QMessageBox.critical(self, "Reliability", str(e)); return
+        if not rows:
+            QMessageBox.warning(self, "Reliability", "No behavior names in common.")
+            return
+        video_name = self.current_video_path or "N/A"
+        dlg = QDialog(self); dlg.setWindowTitle("Inter-rater Reliability")
+        v = QVBoxLayout(dlg)
+        v.addWidget(QLabel(f"<b>Video:</b> {video_name} &nbsp;&nbsp; <b>Raters:</b> current + "
+                           f"{', '.join(os.path.basename(p) for p in paths)} &nbsp;&nbsp; "
+                           f"<b>Tolerance:</b> {RELIABILITY_TOLERANCE} frames"))
+        table = QTableView(dlg)
+        table.setModel(RowsTableModel(RELIABILITY_HEADER[1:], [reliability_row(video_name, r)[1:] for r in rows], table))
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        v.addWidget(table, 1)
+        dlg.resize(1000, 400)
+        dlg.exec_()
+
+    def import_labels(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Labels", "",
+                                              "Label Files (*.csv *.mbti *.sqlite);;CSV Files (*.csv);;"
+                                              "MBTI Labels (*.mbti);;MBTI Project (*.sqlite)")
+        if not path: return
+        if path.lower().endswith((".mbti", ".sqlite")):
+            try:
+                if path.lower().endswith(".sqlite"):
+                    store = ProjectStore(path)
+                    try:
+                        res = store.load_labels(self.current_video_path)
+                    finally:
+                        store.close()
+                    if res is None:
+                        QMessageBox.warning(self, "Import", f"No labels for '{self.current_video_path}' in this project.")
+                        return
+                else:
+                    res = read_label_sidecar(path)
+            except Exception as e:
+                QMessageBox.critical(self, "Import Failed", str(e)); return
+            res['skipped'] = sum(1 for bi in range(len(res['behaviors']))
+                                 for s, e in res['labels'].bouts(bi) if e >= self.total_frames)
+            if res['total_frames'] != self.total_frames:
+                # 프레임 수가 다르면 현재 영상 범위로 잘라 맞춤
+                res['labels'] = res['labels'].resized(self.total_frames)
+        else:
+            worker = LabelImportWorker(path, self.total_frames, self)
+            if not self._run_with_progress(worker, "Importing labels...", "Import"):
+                return
+            if worker.error:
+                QMessageBox.critical(self, "Import Failed", worker.error); return
+            res = worker.result
+        if not res['behaviors']:
+            QMessageBox.warning(self, "Invalid", "No header 'Frame,...' found.")
+            return
+        # 로드된 영상과 맞는지 확인(fps / 범위 밖 프레임)
+        issues = []
+        if res['fps'] is not None and self.fps and abs(res['fps'] - self.fps) > 0.01:
+            issues.append(f"File fps {res['fps']:g} differs from video fps {self.fps:g}.")
+        if res['skipped']:
+            issues.append(f"{res['skipped']} row(s)/bout(s) outside frames 0..{self.total_frames-1} will be skipped.")
+        if issues:
+            ans = QMessageBox.question(self, "Import Labels", "\n".join(issues) + "\n\nImport anyway?",
+                                       QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if ans != QMessageBox.Yes:
+                return
+        behs = res['behaviors']
+        dup = next((b for i, b in enumerate(behs) if b in behs[:i]), None)
+        if dup is not None:
+            QMessageBox.warning(self, "Invalid", f"Duplicate behavior name '{dup}' in file.")
+            return
+        # define behaviors if different
+        self.edit_behaviors.setText(", ".join(behs))
+        self.define_behaviors()
+        if self.behaviors != behs:
+            return  # 사용자가 취소
+        lab = res['labels']
+        self.labels = lab if isinstance(lab, BoutLabels) else BoutLabels.from_matrix(lab)
+        # 저장본(사이드카/DB)은 Export 때만 바꾼다 → 가져온 라벨은 저장 안 된 변경 (크래시 대비 autosave)
+        self.data_modified = True
+        self._checkpoint(wait=True)
+
+    def _run_with_progress(self, worker, text: str, title: str) -> bool:
+        """worker(QThread: progress 시그널, cancel(), cancelled)를 모달 진행 대화상자와 함께 실행.
+        GUI는 계속 응답하고, 호출자는 완료까지 기다린다. 취소되면 False."""
+        dlg = QProgressDialog(text, "Cancel", 0, 100, self)
+        dlg.setWindowTitle(title)
+        dlg.setWindowModality(Qt.WindowModal)
+        dlg.setMinimumDuration(0)
+        dlg.setAutoClose(False); dlg.setAutoReset(False)
+        worker.progress.connect(dlg.setValue)
+        worker.finished.connect(dlg.accept)
+        dlg.canceled.connect(worker.cancel)
+        worker.start()
+        dlg.exec_()
+        worker.wait()
+        return not worker.cancelled
+
+    def export_labels(self):
+        if not self.behaviors or not self.labels:
+            QMessageBox.information(self, "Export", "No data to export.")
+            return
+        if self.current_video_path:
+            stem = os.path.splitext(os.path.basename(self.current_video_path))[0]
+            default_name = f"{stem}_labels.csv"
+            folder = self.video_folder if self.video_folder else os.path.dirname(self.current_video_path)
+            initial = os.path.join(folder, default_name)
+        else:
+            default_name = "labels.csv"
+            folder = self.video_folder if self.video_folder else os.getcwd()
+            initial = os.path.join(folder, default_name)
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export CSV", initial, "CSV Files (*.csv);;MBTI Labels (*.mbti);;MBTI Project (*.sqlite)"
+        )
+        if not path: return
+        if path.lower().endswith(".sqlite"):
+            # 프로젝트 DB에는 이 영상의 라벨만 추가/교체 (덮어쓰기 확인 불필요)
+            try:
+                store = ProjectStore(path)
+                try:
+                    store.save_labels(self.current_video_path, self.fps, self.behaviors, self.labels, self.timeline)
+                finally:
+                    store.close()
+            except sqlite3.Error as e:
+                QMessageBox.critical(self, "Export Failed", str(e)); return
+            if self.store and self.journal and os.path.abspath(path) == os.path.abspath(self.store.path):
+                self._wait_compactor()
+                self.journal.truncate()   # 현재 프로젝트 DB가 저장본
+            QMessageBox.information(self, "Export", "Exported.")
+            self.data_modified = False
+            return
+        if os.path.exists(path):
+            box = QMessageBox(self)
+            box.setWindowTitle("Overwrite file?")
+            box.setIcon(QMessageBox.Warning)
+            box.setText(f"'{os.path.basename(path)}' already exists.\nDo you want to overwrite it?")
+            btn_yes = box.addButton("Overwrite", QMessageBox.AcceptRole)
+            btn_no  = box.addButton("Cancel", QMessageBox.RejectRole)
+            box.exec_()
+            if box.clickedButton() is btn_no:
+                return
+        video_name = self._item_name(self.list_videos.currentItem()) if self.list_videos.currentItem() else "N/A"
+        if path.lower().endswith(".mbti"):
+            # 네이티브 포맷만 저장 (CSV 없이)
+            try:
+                self._wait_compactor()
+                write_label_sidecar(path, video_name, self.fps, self.behaviors, self.labels)
+                if os.path.abspath(path) == os.path.abspath(
+                        label_sidecar_path(os.path.join(self.video_folder, self.current_video_path))):
+                    self._store_labels()   # 복원은 DB를 먼저 보므로 함께 갱신
+                    if self.journal:
+                        self.journal.truncate()
+            except Exception as e:
+                QMessageBox.critical(self, "Export Failed", str(e)); return
+            QMessageBox.information(self, "Export", "Exported.")
+            self.data_modified = False
+            return
+        # 총계(초/프레임)
+        totals_frames = self.labels.totals()
+        totals_seconds = [round(ms / 1000.0, 3) for ms in self._label_ms()]
+        header = [f"Video name,{video_name}",
+                  f"Video fps,{self.fps}",
+                  "Total seconds," + ",".join(str(x) for x in totals_seconds),
+                  "Total frames,"  + ",".join(str(x) for x in totals_frames),
+                  # 헤더 + 프레임별 표
+                  "Frame," + ",".join(self.behaviors)]
+        worker = LabelExportWorker(path, header, self.labels.copy(), self)
+        cancelled = not self._run_with_progress(worker, "Exporting labels...", "Export")
+        if worker.error:
+            QMessageBox.critical(self, "Export Failed", worker.error)
+        elif not cancelled:
+            # CSV는 교환용, 다음 세션 복원은 영상 옆 <stem>.mbti 사이드카로
+            if self.video_folder and self.current_video_path:
+                self._save_sidecar(os.path.join(self.video_folder, self.current_video_path), video_name)
+            QMessageBox.information(self, "Export", "Exported.")
+            self.data_modified = False
+
+    def _save_sidecar(self, video_path: str, video_name: str):
+        try:
+            self._wait_compactor()
+            write_label_sidecar(label_sidecar_path(video_path), video_name, self.fps, self.behaviors, self.labels)
+            self._store_labels()
+            if self.journal:
+                self.journal.truncate()   # 사이드카가 현재 상태를 모두 담음
+        except Exception as e:
+            print("Sidecar save error:", e)
+
+    # ---------- key events ----------
+    def keyPressEvent(self, event):
+        k = event.key()
+        # ---- Arrow keys: 1 frame step (allow auto-repeat) ----
+        if k in (Qt.Key_Left, Qt.Key_Right):
+            # 슬라이더가 비활성화면 방향키도 비활성
+            if self.video_loaded and self.video_thread and self.slider.isEnabled():
+                # 슬롯 키가 눌린 중엔(라벨링 충돌 방지) 스텝 금지
+                if not any(sl['pressed'] for sl in self.slots):
+                    delta = 1 if k == Qt.Key_Right else -1
+                    new_frame = max(0, min(self.total_frames - 1, self.current_frame_idx + delta))
+                    self.video_thread.seek(new_frame)
+            return
+
+        # ---- 기타 키는 자동반복 무시 ----
+        if event.isAutoRepeat():
+            return
+
+        # 1) capture mode has priority
+        if self.pending_key_capture is not None:
+            self.check_record.setEnabled(False)
+            idx = self.pending_key_capture
+            # ESC로 캡처 취소
+            if event.key() == Qt.Key_Escape:
+                self.pending_key_capture = None
+                self.slot_ui[idx]['keylab'].setText("-")
+                self.releaseKeyboard()
+                self.check_record.setEnabled(True)
+                return
+            qt_key, scan = event.key(), event.nativeScanCode()
+            if qt_key in (Qt.Key_Left, Qt.Key_Right, Qt.Key_Space):
+                QMessageBox.warning(self, "Not allowed", "Left/Right arrows and Space is are reserved for frame control.")
+                self.slot_ui[idx]['keylab'].setText("Press any key...")
+                return
+            key_id = (qt_key, scan)
+            # 다른 슬롯과 중복 물리키 금지
+            if any(sl['key'] == key_id for n, sl in enumerate(self.slots) if n != idx):
+                QMessageBox.warning(self, "Invalid", "This physical key is already used by another slot.")
+                # 캡처 유지: 안내 문구 갱신
+                self.slot_ui[idx]['keylab'].setText("Press any key...")
+                return
+            # 저장 및 UI 갱신
+            self.slots[idx]['key'] = key_id
+            key_name = QKeySequence(qt_key).toString() or str(qt_key)
+            self.slot_ui[idx]['keylab'].setText(f"{key_name}")
+            # 종료 처리
+            self.pending_key_capture = None
+            self.releaseKeyboard()
+            self._rebuild_key_index()
+            self.check_record.setEnabled(True)
+            return
+
+        # 2) slot press handling (recording)
+        slot_idx = self._key_to_slot(event)
+        if slot_idx is not None and self.recording:
+            sl = self.slots[slot_idx]
+            bi = sl['behavior']
+            if bi is not None and not sl['pressed']:
+                sl['pressed'] = True
+                sl['key_t'] = time.perf_counter()
+                sl['start_ms'] = self._ms_now()
+                sl['start_frame'] = self.current_frame_idx
+                # overlay on with behavior text
+                if self.check_overlay.isChecked():
+                    self._set_overlay_text(slot_idx, self.behaviors[bi])
+                    self.overlay_labels[slot_idx].show()
+            return
+
+        # 3) globals
+        if k == Qt.Key_Space:
+            if not self.btn_play.isEnabled():
+                return
+            self.toggle_play_pause(); return
+
+        super().keyPressEvent(event)
+
+    def keyReleaseEvent(self, event):
+        if event.isAutoRepeat(): return
+        slot_idx = self._key_to_slot(event)
+        if slot_idx is not None and self.recording:
+            sl = self.slots[slot_idx]
+            bi = sl['behavior']
+            if bi is not None and sl['pressed']:
+                sl['pressed'] = False
+                end_ms = self._ms_now()
+                dur = max(0, end_ms - sl['start_ms'])
+                sl['ms'] += dur
+                self.behavior_durations[bi] += dur
+                self._mark(bi, sl['start_frame'], self.current_frame_idx)
+                if self.check_overlay.isChecked():
+                    self.overlay_labels[slot_idx].hide()
+                # update UI time
+                self._update_slot_title(slot_idx)
+                self.data_modified = True
+            return
+        super().keyReleaseEvent(event)
+
+    # ---------- close ----------
+    def closeEvent(self, e):
+        self._close_journal()
+        if self.store:
+            self.store.close(); self.store = None
+        self._stop_folder_indexer()
+        self._stop_proxy_builder()
+        self._stop_thumb_job()
+        self.filmstrip.hide_preview()
+        if self.indexer:
+            self.indexer.stop(); self.indexer.wait()
+        if self.video_thread:
+            self.video_thread.stop(); self.video_thread.wait()
+        self._drop_pending_frame()
+        e.accept()
+
+
+# ------------------------------ Batch Summary (headless) ------------------------------
+SUMMARY_HEADER = ["File", "Video", "FPS", "Total frames", "Behavior",
+                  "Frames", "Seconds", "Bouts", "Mean bout (s)", "Longest bout (s)"]
+
+def is_label_csv(path: str) -> bool:
+    """라벨 CSV인지 첫 줄로 판단 ('Video name,...' 또는 'Frame,...').
+    이 도구가 쓴 요약/신뢰도 CSV 등은 제외된다."""
+    try:
+        with open(path, 'rb') as fp:
+            first = fp.readline(4096).decode('utf-8', 'replace').lstrip('\ufeff')
+    except OSError:
+        return False
+    return first.split(',', 1)[0].strip().lower() in ("video name", "frame")
+
+
+def find_label_files(paths):
+    """폴더/파일 목록 → 라벨 파일(.mbti, 라벨 CSV). 같은 영상의 <stem>.mbti가 있으면 <stem>_labels.csv는 중복이라 뺀다.
+    폴더 안의 CSV는 헤더가 라벨 형식인 것만 (직접 지정한 파일은 그대로)."""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            for f in sorted(os.listdir(p)):
+                fp = os.path.join(p, f)
+                if not os.path.isfile(fp):
+                    continue
+                if f.lower().endswith('.mbti') or (f.lower().endswith('.csv') and is_label_csv(fp)):
+                    files.append(fp)
+        else:
+            files.append(p)
+    have = {os.path.splitext(f)[0] for f in files if f.lower().endswith('.mbti')}
+    return [f for f in files if not (f.lower().endswith('_labels.csv') and f[:-len('_labels.csv')] in have)]
+
+
+def label_file_names(paths, files):
+    """표에 쓸 파일 이름: 스캔한 경로들의 공통 상위 폴더 기준 상대 경로
+    (r1/a.mbti와 r2/a.mbti가 구분되도록. 폴더 하나면 파일 이름 그대로)."""
+    dirs = [os.path.abspath(p if os.path.isdir(p) else os.path.dirname(p) or ".") for p in paths]
+    try:
+        root = os.path.commonpath(dirs) if dirs else os.getcwd()
+    except ValueError:   # 서로 다른 드라이브
+        return {f: os.path.abspath(f) for f in files}
+    return {f: os.path.relpath(os.path.abspath(f), root) for f in files}
+
+
+def read_label_file(path: str):
+    """.mbti 또는 CSV → dict(video, fps, total_frames, behaviors, labels)."""
+    if path.lower().endswith('.mbti'):
+        return read_label_sidecar(path)
+    res = read_label_csv(path)
+    res['total_frames'] = res['labels'].total_frames
+    return res
+
+
+def summarize_label_file(path: str, display: str = None):
+    """라벨 파일 하나 → behavior별 요약 행 목록. (worker process에서 실행, Qt 불필요)
+    display는 File 열에 쓸 이름(없으면 파일 이름).
+    옆에 영상과 타임스탬프 인덱스가 있으면 실제 프레임 시각으로, 없으면 fps로 초를 계산한다."""
+    res = read_label_file(path)
+    fps, labels = res['fps'], res['labels']
+    pts = None
+    if res['video']:
+        video_path = os.path.join(os.path.dirname(path), res['video'])
+        index = VideoIndex.load(video_path) if os.path.exists(video_path) else None
+        if index is not None and len(index.pts_ms) >= res['total_frames']:
+            pts = index.pts_ms
+    timeline = FrameTimeline(fps, res['total_frames'], pts) if (fps or pts is not None) else None
+    rows = []
+    for bi, name in enumerate(res['behaviors']):
+        bouts = labels.bout_table(bi)
+        frames = int((bouts[:, 1] - bouts[:, 0] + 1).sum()) if len(bouts) else 0
+        if timeline is not None:
+            lens = [timeline.span_ms(s, e) / 1000.0 for s, e in bouts]
+            secs = [round(sum(lens), 3), round(sum(lens) / len(lens), 3) if lens else 0.0, round(max(lens, default=0.0), 3)]
+        else:
+            secs = ["", "", ""]
+        rows.append([display or os.path.basename(path), res['video'] or "", fps if fps is not None else "",
+                     res['total_frames'], name, frames, secs[0], len(bouts), secs[1], secs[2]])
+    return rows
+
+
+def summarize_labels(paths, out_path: str = None, workers: int = None):
+    """라벨 파일들을 process pool로 요약해 한 표(CSV)로. out_path가 없으면 stdout. return 실패한 파일 수."""
+    files = find_label_files(paths)
+    names = label_file_names(paths, files)
+    results, failed = {}, 0
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = {f: ex.submit(summarize_label_file, f, names[f]) for f in files}
+        for i, (f, fut) in enumerate(futures.items(), 1):
+            try:
+                results[f] = fut.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{i}/{len(files)}] {f}: {e}", file=sys.stderr)
+    if out_path:
+        tmp = out_path + ".part"
+        fp = open(tmp, 'w', encoding='utf-8', newline='')
+    else:
+        fp = sys.stdout
+    try:
+        w = csv.writer(fp, lineterminator="\n")
+        w.writerow(SUMMARY_HEADER)
+        for f in files:
+            w.writerows(results.get(f, ()))
+    finally:
+        if out_path:
+            fp.close()
+    if out_path:
+        os.replace(tmp, out_path)
+    print(f"Summarized {len(files) - failed} of {len(files)} label file(s).", file=sys.stderr)
+    return failed
+
+
+def reliability_for_files(video: str, paths, tolerance: int = RELIABILITY_TOLERANCE):
+    """같은 영상을 채점한 라벨 파일들 → 일치도 행 목록. (worker process에서 실행)"""
+    return [reliability_row(video, r) for r in compare_raters([read_label_file(p) for p in paths], tolerance)]
+
+
+def reliability_batch(paths, out_path: str = None, workers: int = None, tolerance: int = RELIABILITY_TOLERANCE):
+    """rater별 폴더/파일들을 영상 이름으로 묶어 process pool에서 비교. return 실패한 영상 수."""
+    groups = {}
+    for f in find_label_files(paths):
+        video = None
+        try:
+            if f.lower().endswith('.mbti'):
+                video = read_label_sidecar(f)['video']
+            else:
+                with open(f, 'r', encoding='utf-8') as fp:
+                    for ln in fp:
+                        key, _, val = ln.strip().partition(',')
+                        if key.strip().lower() == "video name":
+                            video = val
+                        if key.strip().lower() in ("video name", "frame"):
+                            break
+        except (OSError, ValueError, UnicodeDecodeError):
+            pass
+        if not video:   # 이름이 없으면 파일 이름으로 (<stem>_labels.csv → <stem>)
+            video = os.path.splitext(os.path.basename(f))[0]
+            video = video[:-len('_labels')] if video.endswith('_labels') else video
+        groups.setdefault(video, []).append(f)
+    pairs = {v: fs for v, fs in groups.items() if len(fs) >= 2}
+    for v, fs in groups.items():
+        if len(fs) < 2:
+            print(f"{v}: only one label set ({fs[0]}), skipped.", file=sys.stderr)
+    results, failed = {}, 0
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = {v: ex.submit(reliability_for_files, v, fs, tolerance) for v, fs in pairs.items()}
+        for v, fut in futures.items():
+            try:
+                results[v] = fut.result()
+            except Exception as e:
+                failed += 1
+                print(f"{v}: {e}", file=sys.stderr)
+    fp = open(out_path, 'w', encoding='utf-8', newline='') if out_path else sys.stdout
+    try:
+        w = csv.writer(fp, lineterminator="\n")
+        w.writerow(RELIABILITY_HEADER)
+        for v in sorted(results):
+            w.writerows(results[v])
+    finally:
+        if out_path:
+            fp.close()
+    print(f"Compared {len(results)} video(s).", file=sys.stderr)
+    return failed
+
+
+def query_project(db_path: str, behavior=None, start_s=None, end_s=None, video=None, out_path: str = None):
+    """프로젝트 DB에서 구간과 겹치는 bout을 CSV로. db_path는 .sqlite 파일 또는 영상 폴더."""
+    if os.path.isdir(db_path):
+        db_path = os.path.join(db_path, PROJECT_DB_NAME)
+    if not os.path.exists(db_path):
+        print(f"No project database: {db_path}", file=sys.stderr)
+        return 1
+    store = ProjectStore(db_path)
+    try:
+        rows = store.query_bouts(behavior, start_s, end_s, video)
+    finally:
+        store.close()
+    fp = open(out_path, 'w', encoding='utf-8', newline='') if out_path else sys.stdout
+    try:
+        w = csv.writer(fp, lineterminator="\n")
+        w.writerow(["Video", "Behavior", "Start frame", "End frame", "Start (s)", "End (s)"])
+        w.writerows((v, b, s, e, round(ss, 3), round(es, 3)) for v, b, s, e, ss, es in rows)
+    finally:
+        if out_path:
+            fp.close()
+    print(f"{len(rows)} bout(s) in {len({r[0] for r in rows})} video(s).", file=sys.stderr)
+    return 0
+
+
+CLI_FLAGS = ('--summarize', '--query', '--reliability', '-h', '--help')
+
+def cli_main(argv):
+    p = argparse.ArgumentParser(prog="MBTI.py", description="Headless batch tools. Run without options for the GUI.")
+    mode = p.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--summarize', nargs='+', metavar='PATH',
+                      help="label files (.mbti/.csv) or folders to summarize per behavior")
+    mode.add_argument('--query', metavar='DB', help="project database (.sqlite or video folder) to query bouts from")
+    mode.add_argument('--reliability', nargs='+', metavar='PATH',
+                      help="label files or per-rater folders; files for the same video are compared")
+    p.add_argument('-o', '--output', metavar='CSV', help="output table (default: stdout)")
+    p.add_argument('-j', '--jobs', type=int, default=None, help="worker processes (default: CPU count)")
+    p.add_argument('--tolerance', type=int, default=RELIABILITY_TOLERANCE, metavar='FRAMES',
+                   help="--reliability: onset/offset match window (default: %(default)s)")
+    p.add_argument('--behavior', help="--query: only this behavior")
+    p.add_argument('--video', help="--query: only this video")
+    p.add_argument('--from', dest='start_s', type=float, metavar='SEC', help="--query: bouts ending after SEC")
+    p.add_argument('--to', dest='end_s', type=float, metavar='SEC', help="--query: bouts starting before SEC")
+    args = p.parse_args(argv)
+    if args.reliability:
+        return 1 if reliability_batch(args.reliability, args.output, args.jobs, args.tolerance) else 0
+    if args.query:
+        return query_project(args.query, args.behavior, args.start_s, args.end_s, args.video, args.output)
+    return 1 if summarize_labels(args.summarize, args.output, args.jobs) else 0
+
+
+if __name__ == "__main__":
+    if any(a.split('=', 1)[0] in CLI_FLAGS for a in sys.argv[1:]):
+        sys.exit(cli_main(sys.argv[1:]))
+    app = QApplication(sys.argv)
+    m = MainWindow()
+    m.showMaximized()
+    sys.exit(app.exec_())